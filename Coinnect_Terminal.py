@@ -14,6 +14,7 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 from bill_handler.python.pi_bill_handler import PiBillHandler
 from coin_handler.python.coin_handler_serial import CoinHandlerSerial
+from coin_handler.python.device_registry import DeviceRegistry
 from demo.coin_to_bill_converter import convert_coins_to_bills
 from demo.bill_to_coin_converter import convert_bill_to_coin
 from demo.bill_to_bill_converter import convert_bill_to_bills
@@ -65,7 +66,10 @@ class CoinnectTerminal:
         
         # Initialize handlers
         print("\n[1/3] Initializing Coin Handler (and Shared Serial)...")
-        self.coin_handler = CoinHandlerSerial()
+        # one link per attached board; coin module and bill sorter may be separate Arduinos
+        self.devices = DeviceRegistry()
+        self.devices.discover()
+        self.coin_handler = self.devices.coin_handler()
         # Explicitly open connection once at startup
         if self.coin_handler.open():
              print("[CoinnectTerminal] Coin Handler Serial Opened Successfully.")
@@ -73,7 +77,7 @@ class CoinnectTerminal:
              print("[CoinnectTerminal] WARNING: Failed to open Coin Handler Serial.")
         
         print("[2/3] Initializing Bill Handler...")
-        self.bill_handler = PiBillHandler(serial_manager=self.coin_handler)
+        self.bill_handler = PiBillHandler(**self.devices.bill_handler_kwargs(self.coin_handler))
         
         print("[3/3] Registering Bill Dispenser (20 Peso)...")
         # Register dispenser as done in test_coin_to_bill_full.py
@@ -106,6 +110,7 @@ class CoinnectTerminal:
         except:
             pass
         self.bill_handler.cleanup()
+        self.devices.close()
         print("Cleanup complete.")
 
     def on_coin_inserted(self, denom, count, total):
@@ -244,18 +249,24 @@ class CoinnectTerminal:
             self.coin_insertion_done.clear()
             self.total_coin_inserted = 0
             
-            self.coin_handler.add_callback(self.on_coin_inserted)
-            self.coin_handler.add_reached_callback(self.on_coins_finalized)
-            
-            # Reset session counters to track this specific transaction
-            self.coin_handler.session_counts = {k: 0 for k in self.coin_handler.session_counts}
-            self.coin_handler.total_value = 0
+            # Callbacks live only for this insertion; removed when the block exits
+            with self.coin_handler.session() as session:
+                session.add_callback(self.on_coin_inserted)
+                session.add_reached_callback(self.on_coins_finalized)
+                
+                # Reset session counters to track this specific transaction
+                self.coin_handler.session_counts = {k: 0 for k in self.coin_handler.session_counts}
+                self.coin_handler.total_value = 0
 
-            self.coin_handler.start_accepting(self.required_amount)
+                self.coin_handler.start_accepting(self.required_amount)
+                
+                inserted = self.coin_insertion_done.wait(timeout=COIN_INSERTION_TIMEOUT)
+                self.coin_handler.stop_accepting()
+                if inserted:
+                    time.sleep(0.5)
             
-            if not self.coin_insertion_done.wait(timeout=COIN_INSERTION_TIMEOUT):
+            if not inserted:
                 print("\n[TIMEOUT] Coin insertion timed out.")
-                self.coin_handler.stop_accepting()
                 
                 # Refund logic
                 if self.total_coin_inserted > 0:
@@ -268,9 +279,6 @@ class CoinnectTerminal:
                     print("\n[INFO] No coins inserted. Returning to menu.")
                     
                 return
-
-            self.coin_handler.stop_accepting()
-            time.sleep(0.5)
             
             excess = self.total_coin_inserted - self.required_amount
             amount_to_dispense = selected_amount + excess
@@ -468,16 +476,17 @@ class CoinnectTerminal:
         self.coin_handler.session_counts = {k: 0 for k in self.coin_handler.session_counts}
         self.coin_handler.total_value = 0
         
-        self.coin_handler.add_callback(self.on_coin_inserted)
-        self.coin_handler.add_reached_callback(self.on_coins_finalized)
-        
-        self.coin_handler.start_accepting(self.required_fee)
-        
-        if not self.coin_insertion_done.wait(timeout=COIN_INSERTION_TIMEOUT):
-            print("\n[TIMEOUT] Coin insertion timed out.")
-        
-        self.coin_handler.stop_accepting()
-        time.sleep(0.5)
+        with self.coin_handler.session() as session:
+            session.add_callback(self.on_coin_inserted)
+            session.add_reached_callback(self.on_coins_finalized)
+            
+            self.coin_handler.start_accepting(self.required_fee)
+            
+            if not self.coin_insertion_done.wait(timeout=COIN_INSERTION_TIMEOUT):
+                print("\n[TIMEOUT] Coin insertion timed out.")
+            
+            self.coin_handler.stop_accepting()
+            time.sleep(0.5)
 
     def dispense_items(self, bill_breakdown, coin_breakdown):
         # Dispense Bills
@@ -504,18 +513,19 @@ class CoinnectTerminal:
                 print(f"  [DONE] Successfully dispensed {denom} x{qty}")
                 dispense_done_event.set()
                 
-            self.coin_handler.add_dispense_callback(on_dispense_ack)
-            self.coin_handler.add_dispense_done_callback(on_dispense_done)
-            
-            for denom, qty in coin_breakdown.items():
-                print(f"  Requesting dispense: {denom} x{qty}...")
-                dispense_done_event.clear()
-                self.coin_handler.dispense(denom, qty)
-                
-                if not dispense_done_event.wait(timeout=15):
-                    print(f"  [TIMEOUT] Dispense timed out for {denom} x{qty}")
+            with self.coin_handler.session() as session:
+                session.add_dispense_callback(on_dispense_ack)
+                session.add_dispense_done_callback(on_dispense_done)
                 
-                time.sleep(1)
+                for denom, qty in coin_breakdown.items():
+                    print(f"  Requesting dispense: {denom} x{qty}...")
+                    dispense_done_event.clear()
+                    self.coin_handler.dispense(denom, qty)
+                    
+                    if not dispense_done_event.wait(timeout=15):
+                        print(f"  [TIMEOUT] Dispense timed out for {denom} x{qty}")
+                    
+                    time.sleep(1)
         
         print("\n" + "=" * 60)
         print("TRANSACTION COMPLETE!")
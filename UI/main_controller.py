@@ -12,6 +12,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from bill_handler.python.pi_bill_handler import *
 from coin_handler.python.coin_handler_serial import *
+from coin_handler.python.device_registry import DeviceRegistry
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -21,8 +22,10 @@ class MainWindow(QMainWindow):
         uic.loadUi(ui_path, self)
 
         # --- Shared handlers created once ---
-        self.bill_handler = PiBillHandler()
-        self.coin_handler = CoinHandlerSerial()
+        self.devices = DeviceRegistry()
+        self.devices.discover()
+        self.coin_handler = self.devices.coin_handler()
+        self.bill_handler = PiBillHandler(**self.devices.bill_handler_kwargs(self.coin_handler))
 
         # --- Register Bill Dispensers for each denomination ---
         # Each dispenser has 2 motors and 1 IR sensor
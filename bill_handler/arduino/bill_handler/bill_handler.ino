@@ -93,8 +93,69 @@ void moveToBin(int index) {
   Serial.println("[Aligned]");
 }
 
+// --- Link speed negotiation ---
+// Boots at BOOT_BAUD; the Pi asks BAUD?, requests BAUD:<rate> and confirms
+// with PING at the new rate. Without that PING we fall back to BOOT_BAUD.
+// Protocol: coin_handler/python/serial_link.py
+const long BOOT_BAUD = 9600;
+const long SUPPORTED_BAUDS[] = {9600, 57600, 115200};
+const int NUM_BAUDS = sizeof(SUPPORTED_BAUDS) / sizeof(SUPPORTED_BAUDS[0]);
+const unsigned long BAUD_CONFIRM_MS = 2000;
+bool baudConfirmPending = false;
+unsigned long baudSwitchTime = 0;
+
+// Reported to the Pi's device registry (ID?): role and command capabilities
+const char* DEVICE_ID = "ID:bill_sorter:SORT,HOME";
+
+bool handle_link_command(String &cmd) {
+  if (cmd.equalsIgnoreCase("ID?")) {
+    Serial.println(DEVICE_ID);
+    return true;
+  }
+  if (cmd.equalsIgnoreCase("PING")) {
+    baudConfirmPending = false;
+    Serial.println("PONG");
+    return true;
+  }
+  if (cmd.equalsIgnoreCase("BAUD?")) {
+    Serial.print("BAUDS:");
+    for (int i = 0; i < NUM_BAUDS; i++) {
+      if (i > 0) Serial.print(",");
+      Serial.print(SUPPORTED_BAUDS[i]);
+    }
+    Serial.println();
+    return true;
+  }
+  if (cmd.startsWith("BAUD:")) {
+    long rate = cmd.substring(5).toInt();
+    for (int i = 0; i < NUM_BAUDS; i++) {
+      if (SUPPORTED_BAUDS[i] == rate) {
+        Serial.print("ACK:BAUD:");
+        Serial.println(rate);
+        Serial.flush();
+        Serial.end();
+        Serial.begin(rate);
+        baudConfirmPending = true;
+        baudSwitchTime = millis();
+        return true;
+      }
+    }
+    Serial.println("ERR:Unsupported baud");
+    return true;
+  }
+  return false;
+}
+
+void check_baud_confirm() {
+  if (baudConfirmPending && millis() - baudSwitchTime > BAUD_CONFIRM_MS) {
+    Serial.end();
+    Serial.begin(BOOT_BAUD);
+    baudConfirmPending = false;
+  }
+}
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(BOOT_BAUD);
   pinMode(TRIG_PIN, OUTPUT);
   pinMode(ECHO_PIN, INPUT);
 
@@ -102,9 +163,11 @@ void setup() {
 }
 
 void loop() {
+  check_baud_confirm();
   if (Serial.available()) {
     String input = Serial.readStringUntil('\n');
     input.trim();
+    if (handle_link_command(input)) return;
     if (input == "HOME") {
       moveToBin(0);
     }
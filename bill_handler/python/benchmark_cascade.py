@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark the colour cascade against the full denomination CNN.
+
+On a labelled set (one subfolder per denom label, e.g. scans/100php/*.jpg),
+fits the cascade on every other image (or uses the saved color_cascade.json
+with --saved), then for each margin threshold reports:
+  - share of bills the cascade short-circuits
+  - cascade accuracy on those bills and agreement with the CNN on them
+  - end-to-end accuracy and mean latency of cascade+CNN vs CNN alone
+
+    python bill_handler/python/benchmark_cascade.py --images scans/denom --roi
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(SCRIPT_DIR, "..", "..")))
+
+from bill_handler.python.color_cascade import DEFAULT_CASCADE_FILE, ColorCascade, iter_labelled
+from bill_handler.python.preprocess import load_calibration
+
+DENOM_MODEL = os.path.join(SCRIPT_DIR, "..", "models", "denom-cls-v2_ncnn_model")
+THRESHOLDS = (0.1, 0.2, 0.3, 0.35, 0.4, 0.5, 0.6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Colour cascade vs CNN benchmark")
+    parser.add_argument("--images", required=True)
+    parser.add_argument("--saved", action="store_true", help=f"use {DEFAULT_CASCADE_FILE} instead of fitting")
+    parser.add_argument("--roi", action="store_true", help="crop to the ROI in camera_calibration.json")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    roi = load_calibration()["roi"] if args.roi else None
+    samples = list(iter_labelled(args.images, roi))
+    if not samples:
+        raise SystemExit(f"no labelled images in {args.images}")
+
+    if args.saved:
+        cascade = ColorCascade.load()
+        if cascade is None:
+            raise SystemExit(f"{DEFAULT_CASCADE_FILE} missing")
+        evaluation = samples
+    else:
+        cascade = ColorCascade()
+        cascade.fit((label, img) for i, (label, _, img) in enumerate(samples) if i % 2 == 0)
+        evaluation = [s for i, s in enumerate(samples) if i % 2 == 1]
+
+    cnn = None
+    try:
+        from bill_handler.python.ncnn_classifier import NcnnClassifier
+        cnn = NcnnClassifier(DENOM_MODEL)
+        cnn.classify(evaluation[0][2])  # warm-up
+    except Exception as e:
+        print("CNN unavailable, reporting cascade vs ground truth only:", e)
+
+    rows = []
+    for label, path, img in evaluation:
+        t = time.perf_counter()
+        c_label, margin = cascade.classify(img)
+        c_ms = (time.perf_counter() - t) * 1000.0
+        n_label, n_ms = None, 0.0
+        if cnn is not None:
+            t = time.perf_counter()
+            n_label, _ = cnn.classify(img)
+            n_ms = (time.perf_counter() - t) * 1000.0
+        rows.append((label, c_label, margin, c_ms, n_label, n_ms))
+
+    n = len(rows)
+    cnn_only_ms = sum(r[5] for r in rows) / n
+    cnn_acc = sum(r[4] == r[0] for r in rows) / n if cnn else None
+    print(f"\n{n} evaluation images, cascade {np.mean([r[3] for r in rows]):.2f} ms/bill"
+          + (f", CNN {cnn_only_ms:.1f} ms/bill, CNN accuracy {cnn_acc * 100:.1f}%" if cnn else ""))
+    print("=" * 84)
+    print(f"{'margin':>7}{'short %':>9}{'casc acc %':>12}{'agree CNN %':>13}{'e2e acc %':>11}{'mean ms':>9}{'saved ms':>10}")
+    report = []
+    for threshold in THRESHOLDS:
+        short = [r for r in rows if r[1] is not None and r[2] >= threshold]
+        casc_acc = sum(r[1] == r[0] for r in short) / len(short) if short else 0.0
+        agree = sum(r[1] == r[4] for r in short) / len(short) if (short and cnn) else None
+        # end to end: cascade answer when confident, CNN (or nothing) otherwise
+        e2e_correct = sum(
+            (r[1] == r[0]) if (r[1] is not None and r[2] >= threshold) else (r[4] == r[0])
+            for r in rows
+        )
+        mean_ms = sum(r[3] + (0.0 if (r[1] is not None and r[2] >= threshold) else r[5]) for r in rows) / n
+        entry = {
+            "margin": threshold,
+            "short_circuit": len(short) / n,
+            "cascade_accuracy": casc_acc,
+            "agreement_with_cnn": agree,
+            "e2e_accuracy": e2e_correct / n,
+            "mean_ms": mean_ms,
+            "saved_ms": cnn_only_ms - mean_ms if cnn else None,
+        }
+        report.append(entry)
+        agree_s = f"{agree * 100:.1f}" if agree is not None else "-"
+        saved_s = f"{entry['saved_ms']:.1f}" if cnn else "-"
+        print(f"{threshold:>7.2f}{entry['short_circuit'] * 100:>9.1f}{casc_acc * 100:>12.1f}{agree_s:>13}"
+              f"{entry['e2e_accuracy'] * 100:>11.1f}{mean_ms:>9.1f}{saved_s:>10}")
+    print("=" * 84)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"images": n, "cnn_ms": cnn_only_ms, "cnn_accuracy": cnn_acc, "thresholds": report}, f, indent=2)
+        print("wrote", args.json)
+
+
+if __name__ == "__main__":
+    main()
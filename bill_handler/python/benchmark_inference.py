@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark the bill classifier backends (direct ncnn vs ultralytics YOLO).
+
+Each backend runs in its own subprocess so import cost and memory are measured
+in isolation. Reported per backend and model: import time, model load time,
+first (cold) inference, steady-state latency percentiles and process RSS.
+
+    python bill_handler/python/benchmark_inference.py
+    python bill_handler/python/benchmark_inference.py --image bill.jpg --iterations 50 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, "..", ".."))
+MODELS_DIR = os.path.join(SCRIPT_DIR, "..", "models")
+MODELS = {
+    "uv": os.path.join(MODELS_DIR, "uv_cls_v2_ncnn_model"),
+    "denom": os.path.join(MODELS_DIR, "denom-cls-v2_ncnn_model"),
+}
+BACKENDS = ("ncnn", "ultralytics")
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux /proc; falls back to peak RSS)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def load_frame(image_path):
+    import numpy as np
+    if image_path:
+        import cv2
+        frame = cv2.imread(image_path)
+        if frame is None:
+            raise SystemExit(f"cannot read {image_path}")
+        return frame
+    # camera-sized noise frame; latency does not depend on content
+    return np.random.default_rng(0).integers(0, 255, size=(720, 1280, 3), dtype=np.uint8)
+
+
+def run_backend(backend, image_path, iterations):
+    """Runs inside the worker subprocess; returns a result dict."""
+    result = {"backend": backend, "rss_start_mb": rss_mb(), "models": {}}
+    t = time.perf_counter()
+    if backend == "ncnn":
+        sys.path.insert(0, PROJECT_ROOT)
+        from bill_handler.python.ncnn_classifier import NcnnClassifier
+        import cv2  # noqa: F401  (counted in import time like ultralytics' own)
+
+        def load(path):
+            return NcnnClassifier(path)
+
+        def infer(model, frame):
+            return model.classify(frame)
+    else:
+        from ultralytics import YOLO
+        import cv2
+
+        def load(path):
+            return YOLO(path, task="classify")
+
+        def infer(model, frame):
+            # same call PiBillHandler.run_inference makes
+            r = model.predict(cv2.resize(frame, (480, 480)), verbose=False)[0]
+            return model.names[int(r.probs.top1)], float(r.probs.top1conf)
+    result["import_s"] = time.perf_counter() - t
+
+    frame = load_frame(image_path)
+    for name, path in MODELS.items():
+        t = time.perf_counter()
+        model = load(path)
+        load_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        label, conf = infer(model, frame)
+        first_s = time.perf_counter() - t
+
+        times = []
+        for _ in range(iterations):
+            t = time.perf_counter()
+            infer(model, frame)
+            times.append(time.perf_counter() - t)
+        result["models"][name] = {
+            "load_s": load_s,
+            "first_ms": first_s * 1000.0,
+            "p50_ms": percentile(times, 50) * 1000.0,
+            "p90_ms": percentile(times, 90) * 1000.0,
+            "max_ms": max(times) * 1000.0 if times else 0.0,
+            "label": str(label),
+            "conf": conf,
+        }
+    result["rss_end_mb"] = rss_mb()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bill classifier backends")
+    parser.add_argument("--backend", choices=BACKENDS + ("all",), default="all")
+    parser.add_argument("--image", help="BGR image to classify (default: synthetic 1280x720 frame)")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.image, args.iterations)))
+        return
+
+    backends = BACKENDS if args.backend == "all" else (args.backend,)
+    results = []
+    for backend in backends:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", backend, "--iterations", str(args.iterations)]
+        if args.image:
+            cmd += ["--image", args.image]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            err = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+            print(f"[{backend}] failed: {err}")
+            results.append({"backend": backend, "error": err})
+            continue
+        results.append(json.loads(lines[-1]))
+
+    print("\n" + "=" * 88)
+    print(f"{'backend':<12}{'model':<7}{'import s':>9}{'load s':>8}{'first ms':>10}{'p50 ms':>9}{'p90 ms':>9}{'RSS MB':>9}  top1")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<12}{'-':<7}  {r['error']}")
+            continue
+        for name, m in r["models"].items():
+            print(f"{r['backend']:<12}{name:<7}{r['import_s']:>9.2f}{m['load_s']:>8.2f}{m['first_ms']:>10.1f}"
+                  f"{m['p50_ms']:>9.1f}{m['p90_ms']:>9.1f}{r['rss_end_mb']:>9.0f}  {m['label']} ({m['conf']:.2f})")
+    print("=" * 88)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"iterations": args.iterations, "image": args.image, "results": results}, f, indent=2)
+        print("wrote", args.json)
+
+
+if __name__ == "__main__":
+    main()
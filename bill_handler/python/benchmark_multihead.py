@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fused multi-head model against the two-model setup.
+
+On held-out paired captures (same layout as train_multihead.py) runs
+  - two models: uv_cls_v2 on the UV image + denom-cls-v2 on the white image
+  - fused:      bill_multihead on both images in one pass
+and reports accuracy per task, latency (mean/p50/p90 per bill) and weight
+size (a proxy for resident memory). With --json the report is written to a
+file for the PR / deployment notes.
+
+    python bill_handler/python/benchmark_multihead.py --data pairs_test/ --roi --json multihead_report.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(SCRIPT_DIR, "..", "..")))
+
+from bill_handler.python.ncnn_classifier import MultiHeadClassifier, NcnnClassifier
+from bill_handler.python.preprocess import crop, load_calibration
+from bill_handler.python.train_multihead import DEFAULT_EXPORT, MODELS_DIR, iter_pairs
+
+UV_MODEL = os.path.join(MODELS_DIR, "uv_cls_v2_ncnn_model")
+DENOM_MODEL = os.path.join(MODELS_DIR, "denom-cls-v2_ncnn_model")
+
+
+def weights_mb(*model_dirs):
+    return sum(os.path.getsize(os.path.join(d, "model.ncnn.bin")) for d in model_dirs) / 1e6
+
+
+def latency_row(times):
+    ms = sorted(t * 1000.0 for t in times)
+    return {"mean_ms": float(np.mean(ms)), "p50_ms": ms[len(ms) // 2], "p90_ms": ms[min(len(ms) - 1, int(len(ms) * 0.9))]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fused vs two-model bill classifier benchmark")
+    parser.add_argument("--data", required=True)
+    parser.add_argument("--multihead", default=DEFAULT_EXPORT)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--roi", action="store_true", help="crop to the ROI in camera_calibration.json")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    import cv2
+
+    roi = load_calibration()["roi"] if args.roi else None
+    samples = []
+    for auth, denom, uv_path, white_path in iter_pairs(args.data):
+        uv, white = cv2.imread(uv_path), cv2.imread(white_path)
+        if uv is not None and white is not None:
+            samples.append((auth, denom, np.ascontiguousarray(crop(uv, roi)), np.ascontiguousarray(crop(white, roi))))
+    if not samples:
+        raise SystemExit(f"no uv/white pairs under {args.data}")
+
+    uv_model = NcnnClassifier(UV_MODEL, num_threads=args.threads)
+    denom_model = NcnnClassifier(DENOM_MODEL, num_threads=args.threads)
+    fused = MultiHeadClassifier(args.multihead, num_threads=args.threads)
+    # warm-up
+    uv_model.classify(samples[0][2])
+    denom_model.classify(samples[0][3])
+    fused.classify(samples[0][2], samples[0][3])
+
+    results = {"two_models": {"auth": 0, "denom": 0, "times": []}, "fused": {"auth": 0, "denom": 0, "times": []}}
+    for auth, denom, uv, white in samples:
+        t = time.perf_counter()
+        (a_label, _), (d_label, _) = uv_model.classify(uv), denom_model.classify(white)
+        results["two_models"]["times"].append(time.perf_counter() - t)
+        results["two_models"]["auth"] += a_label == auth
+        results["two_models"]["denom"] += d_label == denom
+
+        t = time.perf_counter()
+        (a_label, _), (d_label, _) = fused.classify(uv, white)
+        results["fused"]["times"].append(time.perf_counter() - t)
+        results["fused"]["auth"] += a_label == auth
+        results["fused"]["denom"] += d_label == denom
+
+    n = len(samples)
+    sizes = {"two_models": weights_mb(UV_MODEL, DENOM_MODEL), "fused": weights_mb(args.multihead)}
+    report = {}
+    print(f"\n{n} pairs")
+    print("=" * 78)
+    print(f"{'setup':<12}{'auth acc %':>12}{'denom acc %':>13}{'mean ms':>10}{'p50 ms':>9}{'p90 ms':>9}{'weights MB':>12}")
+    for setup, r in results.items():
+        row = {"auth_accuracy": r["auth"] / n, "denom_accuracy": r["denom"] / n, "weights_mb": sizes[setup]}
+        row.update(latency_row(r["times"]))
+        report[setup] = row
+        print(f"{setup:<12}{row['auth_accuracy'] * 100:>12.1f}{row['denom_accuracy'] * 100:>13.1f}"
+              f"{row['mean_ms']:>10.1f}{row['p50_ms']:>9.1f}{row['p90_ms']:>9.1f}{row['weights_mb']:>12.2f}")
+    print("=" * 78)
+    speedup = report["two_models"]["mean_ms"] / report["fused"]["mean_ms"]
+    print(f"fused is {speedup:.2f}x the two-model speed")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"pairs": n, "setups": report, "speedup": speedup}, f, indent=2)
+        print("wrote", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Headless per-stage latency benchmark of the bill classifiers over recorded frames.
+
+test_uv_model.py / test_denom_model.py need a camera and a person at the
+kiosk. This script runs on any Linux box over a folder of saved frames. The
+folder holds full camera frames, as CameraService delivers them. Optionally
+they sit in <label>/ subfolders for accuracy, and in uv/ and denom/
+subfolders to give each model its own frames. Each scan is split into the
+stages PiBillHandler goes through:
+
+  decode      JPEG/PNG bytes -> BGR (file I/O is done up front, not timed)
+  roi_resize  ROI crop + resize to the model input
+  preprocess  BGR HWC -> model input (ncnn: RGB CHW float; ultralytics: its own transforms)
+  forward     the network itself
+  postprocess output blob -> probability vector, top-1
+  labels      class index -> label -> denomination
+
+For ultralytics, preprocess/forward/postprocess come from Results.speed. The
+rest of predict() (argument handling, Results objects) is reported as
+"overhead".
+
+Backends: "ncnn" (NcnnClassifier, fp32), "ncnn-<variant>" (quantize_models.py
+output, e.g. ncnn-int8), "ultralytics" (the ncnn export through YOLO, as the
+"ultralytics" model_backend runs it) and "ultralytics-pt" (the .pt weights on
+torch). Every backend x thread count runs in its own subprocess.
+
+    python bill_handler/python/benchmark_stages.py --frames recorded/ --roi --json stages.json
+    python bill_handler/python/benchmark_stages.py --frames recorded/ --backends ncnn ncnn-int8 --threads 1 2 4
+    python bill_handler/python/benchmark_stages.py --frames recorded/ --baseline stages.json   # exit 1 on regression
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, "..", ".."))
+sys.path.append(PROJECT_ROOT)
+
+from bill_handler.python.benchmark_inference import MODELS, percentile, rss_mb
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+STAGES = ("decode", "roi_resize", "preprocess", "forward", "postprocess", "labels", "overhead")
+DEFAULT_BACKENDS = ("ncnn", "ncnn-int8", "ultralytics")
+
+
+def load_frames(root):
+    """(path, label, encoded bytes) for every image under root; label is the parent folder name, if any."""
+    frames = []
+    for dirpath, _, files in os.walk(root):
+        label = os.path.basename(dirpath) if os.path.normpath(dirpath) != os.path.normpath(root) else None
+        for f in sorted(files):
+            if f.lower().endswith(IMAGE_EXTS):
+                path = os.path.join(dirpath, f)
+                with open(path, "rb") as fh:
+                    frames.append((path, label, fh.read()))
+    return frames
+
+
+def frames_for(root, model):
+    sub = os.path.join(root, model)
+    return load_frames(sub if os.path.isdir(sub) else root)
+
+
+def label_to_denom(label):
+    # same mapping as PiBillHandler._label_to_denom
+    try:
+        return int(label)
+    except Exception:
+        digits = "".join(ch for ch in str(label) if ch.isdigit())
+        return int(digits) if digits else None
+
+
+def summarize(times):
+    ms = [t * 1000.0 for t in times]
+    if not ms:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p90_ms": 0.0, "max_ms": 0.0}
+    return {"mean_ms": float(np.mean(ms)), "p50_ms": percentile(ms, 50), "p90_ms": percentile(ms, 90), "max_ms": max(ms)}
+
+
+# ----- worker side (one backend, one thread count) -----
+def ncnn_runner(model_dir, threads):
+    from bill_handler.python.ncnn_classifier import NcnnClassifier
+
+    clf = NcnnClassifier(model_dir, num_threads=threads)
+    pre = clf.preprocessor
+
+    def run(roi_frame, stamp):
+        src = pre.resize(roi_frame)
+        stamp("roi_resize")
+        pre.convert(src)
+        stamp("preprocess")
+        out = clf.forward()
+        stamp("forward")
+        probs = np.array(out, dtype=np.float32).reshape(-1)
+        idx = int(np.argmax(probs))
+        conf = float(probs[idx])
+        stamp("postprocess")
+        return clf.names.get(idx, str(idx)), conf
+
+    return run
+
+
+def ultralytics_runner(model_path, threads):
+    import torch
+    from ultralytics import YOLO
+
+    from bill_handler.python.preprocess import Preprocessor
+
+    torch.set_num_threads(threads)
+    model = YOLO(model_path, task="classify")
+    pre = Preprocessor((480, 480), layout="hwc_bgr")  # same buffer PiBillHandler.inference_probs feeds
+
+    def run(roi_frame, stamp):
+        img = pre(roi_frame)
+        stamp("roi_resize")
+        t = time.perf_counter()
+        result = model.predict(img, verbose=False)[0]
+        wall = time.perf_counter() - t
+        t = time.perf_counter()
+        probs = np.asarray(result.probs.data.cpu().numpy(), dtype=np.float32).reshape(-1)
+        idx = int(np.argmax(probs))
+        conf = float(probs[idx])
+        convert = time.perf_counter() - t
+        stamp.mark()  # predict() is split up from its own speed report below
+        speed = {k: (v or 0.0) / 1000.0 for k, v in (result.speed or {}).items()}
+        reported = speed.get("preprocess", 0.0) + speed.get("inference", 0.0) + speed.get("postprocess", 0.0)
+        stamp.add("preprocess", speed.get("preprocess", 0.0))
+        stamp.add("forward", speed.get("inference", 0.0))
+        stamp.add("postprocess", speed.get("postprocess", 0.0) + convert)
+        stamp.add("overhead", max(0.0, wall - reported))
+        return model.names[idx], conf
+
+    return run
+
+
+class StageClock:
+    """Accumulates time since the previous stamp into the named stage."""
+
+    def __init__(self):
+        self.times = {s: [] for s in STAGES}
+        self._current = {}
+        self._last = 0.0
+
+    def begin(self):
+        self._current = {}
+        self._last = time.perf_counter()
+
+    def __call__(self, stage):
+        now = time.perf_counter()
+        self._current[stage] = self._current.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def mark(self):
+        """Restart the interval without charging it to a stage."""
+        self._last = time.perf_counter()
+
+    def add(self, stage, seconds):
+        self._current[stage] = self._current.get(stage, 0.0) + seconds
+
+    def end(self):
+        for stage, t in self._current.items():
+            self.times[stage].append(t)
+        return sum(self._current.values())
+
+
+def run_config(backend, threads, frames_root, models, roi, iterations, warmup):
+    """Runs inside the worker subprocess; returns a result dict."""
+    import cv2
+
+    from bill_handler.python.ncnn_classifier import variant_path
+    from bill_handler.python.preprocess import crop
+
+    result = {"backend": backend, "threads": threads, "models": {}}
+    for name in models:
+        frames = frames_for(frames_root, name)
+        if not frames:
+            result["models"][name] = {"error": "no frames"}
+            continue
+        if backend == "ultralytics-pt":
+            path = MODELS[name][: -len("_ncnn_model")] + ".pt"
+        elif backend.startswith("ncnn-"):
+            path = variant_path(MODELS[name], backend[len("ncnn-"):])
+        else:
+            path = MODELS[name]
+        if not os.path.exists(path):
+            result["models"][name] = {"error": f"missing {path}"}
+            continue
+
+        t = time.perf_counter()
+        run = (ultralytics_runner if backend.startswith("ultralytics") else ncnn_runner)(path, threads)
+        load_s = time.perf_counter() - t
+
+        clock = StageClock()
+        decoded = cv2.imdecode(np.frombuffer(frames[0][2], np.uint8), cv2.IMREAD_COLOR)
+        for _ in range(warmup):
+            clock.begin()
+            run(crop(decoded, roi), clock)
+        clock = StageClock()
+
+        totals, top1, correct, labelled = [], [], 0, 0
+        for i in range(iterations):
+            for _, label, data in frames:
+                clock.begin()
+                frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                clock("decode")
+                if frame is None:
+                    clock.begin()
+                    continue
+                predicted, conf = run(crop(frame, roi), clock)
+                label_to_denom(predicted)
+                clock("labels")
+                totals.append(clock.end())
+                if i == 0:
+                    top1.append(str(predicted))
+                    if label is not None:
+                        labelled += 1
+                        correct += str(predicted) == label
+        result["models"][name] = {
+            "path": os.path.relpath(path, PROJECT_ROOT),
+            "frames": len(top1),
+            "load_s": load_s,
+            "stages": {s: summarize(clock.times[s]) for s in STAGES if clock.times[s]},
+            "total": summarize(totals),
+            "accuracy": (correct / labelled) if labelled else None,
+            "top1": top1,
+        }
+    result["rss_mb"] = rss_mb()
+    return result
+
+
+# ----- report -----
+def host_info():
+    info = {"platform": platform.platform(), "machine": platform.machine(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "numpy": np.__version__}
+    try:
+        import ncnn
+        info["ncnn"] = getattr(ncnn, "__version__", "unknown")
+    except Exception:
+        info["ncnn"] = None
+    return info
+
+
+def add_agreement(results):
+    """Top-1 agreement of every config with the first successful one (normally ncnn fp32 at the lowest thread count)."""
+    reference = {}
+    for r in results:
+        for name, m in r.get("models", {}).items():
+            if "top1" in m:
+                reference.setdefault(name, m["top1"])
+    for r in results:
+        for name, m in r.get("models", {}).items():
+            ref = reference.get(name)
+            if "top1" in m and ref and len(ref) == len(m["top1"]):
+                m["agreement"] = sum(a == b for a, b in zip(ref, m["top1"])) / len(ref)
+            m.pop("top1", None)
+
+
+def find_regressions(report, baseline, tolerance, floor_ms=0.5):
+    """Stages (and totals) whose p50 grew by more than `tolerance` (fraction) and floor_ms over the baseline."""
+    old = {
+        (r["backend"], r["threads"], name): m
+        for r in baseline.get("results", []) for name, m in r.get("models", {}).items() if "total" in m
+    }
+    regressions = []
+    for r in report["results"]:
+        for name, m in r.get("models", {}).items():
+            prev = old.get((r["backend"], r["threads"], name))
+            if prev is None or "total" not in m:
+                continue
+            rows = [("total", m["total"], prev["total"])]
+            rows += [(s, v, prev["stages"][s]) for s, v in m["stages"].items() if s in prev.get("stages", {})]
+            for stage, now, was in rows:
+                if now["p50_ms"] > was["p50_ms"] * (1.0 + tolerance) and now["p50_ms"] - was["p50_ms"] > floor_ms:
+                    regressions.append({"backend": r["backend"], "threads": r["threads"], "model": name,
+                                        "stage": stage, "baseline_p50_ms": was["p50_ms"], "p50_ms": now["p50_ms"]})
+    return regressions
+
+
+def print_report(results):
+    print("\n" + "=" * 104)
+    print(f"{'backend':<16}{'thr':>4} {'model':<6}" + "".join(f"{s[:10]:>11}" for s in STAGES) + f"{'total':>9}{'acc %':>7}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<16}{r['threads']:>4}  {r['error']}")
+            continue
+        for name, m in r["models"].items():
+            if "error" in m:
+                print(f"{r['backend']:<16}{r['threads']:>4} {name:<6}  {m['error']}")
+                continue
+            cells = "".join(f"{m['stages'][s]['p50_ms']:>11.2f}" if s in m["stages"] else f"{'-':>11}" for s in STAGES)
+            acc = f"{m['accuracy'] * 100:.1f}" if m["accuracy"] is not None else "-"
+            print(f"{r['backend']:<16}{r['threads']:>4} {name:<6}{cells}{m['total']['p50_ms']:>9.2f}{acc:>7}")
+    print("=" * 104)
+    print("p50 per stage in ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage bill classifier benchmark over recorded frames")
+    parser.add_argument("--frames", required=True, help="recorded frames (optionally <label>/ and uv|denom/ subfolders)")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=sorted(MODELS))
+    parser.add_argument("--backends", nargs="+", default=list(DEFAULT_BACKENDS),
+                        help="ncnn, ncnn-<variant>, ultralytics, ultralytics-pt")
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--iterations", type=int, default=3, help="passes over the frames")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--roi", action="store_true", help="crop to the ROI in camera_calibration.json")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="earlier --json report; exit 1 when a stage regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 growth over the baseline (0.2 = 20%%)")
+    parser.add_argument("--worker", nargs=2, metavar=("BACKEND", "THREADS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    roi = None
+    if args.roi:
+        from bill_handler.python.preprocess import load_calibration
+        roi = load_calibration()["roi"]
+
+    if args.worker:
+        backend, threads = args.worker[0], int(args.worker[1])
+        print(json.dumps(run_config(backend, threads, args.frames, args.models, roi, args.iterations, args.warmup)))
+        return
+
+    if not load_frames(args.frames):
+        raise SystemExit(f"no frames under {args.frames}")
+
+    results = []
+    for backend in args.backends:
+        for threads in args.threads:
+            cmd = [sys.executable, os.path.abspath(__file__), "--frames", args.frames, "--models", *args.models,
+                   "--iterations", str(args.iterations), "--warmup", str(args.warmup),
+                   "--worker", backend, str(threads)]
+            if args.roi:
+                cmd.append("--roi")
+            print(f"[{backend} x{threads}] running...")
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+            if proc.returncode != 0 or not lines:
+                err = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+                print(f"[{backend} x{threads}] failed: {err}")
+                results.append({"backend": backend, "threads": threads, "error": err})
+                continue
+            results.append(json.loads(lines[-1]))
+    add_agreement(results)
+    print_report(results)
+
+    report = {"host": host_info(), "frames": args.frames, "roi": roi, "iterations": args.iterations,
+              "results": results}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        report["baseline"] = args.baseline
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['backend']} x{r['threads']} {r['model']} {r['stage']}: "
+                  f"p50 {r['baseline_p50_ms']:.2f} -> {r['p50_ms']:.2f} ms")
+        if not regressions:
+            print(f"no regressions against {args.baseline} (tolerance {args.tolerance * 100:.0f}%)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print("wrote", args.json)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
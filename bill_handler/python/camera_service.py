@@ -0,0 +1,275 @@
+"""
+CameraService - long-lived camera capture for bill scanning.
+
+Opening a V4L2 device and letting auto-exposure settle costs hundreds of
+milliseconds, and the first frame after open is often stale. CameraService
+keeps the device open and grabs continuously on a background thread into a
+small ring buffer of (timestamp, frame) pairs:
+
+    camera = CameraService(0)
+    camera.start()
+    ts, frame = camera.latest()                 # freshest frame, no waiting
+    ts, frame = camera.frame_after(t_led_on)    # first frame grabbed after t_led_on
+    ts, frame, settle_s = camera.wait_settled(t_led_on)   # first frame with stable brightness
+
+Timestamps are capture times: the driver's buffer timestamp when it is on
+the monotonic clock (V4L2), else the moment the read began, never the moment
+it returned. With the driver timestamp, a frame exposed before the LED came
+on is stamped before it. Without one, a slow read no longer pushes the stamp
+late, but a frame that was already waiting in the driver's queue when the
+read began still carries that later read time. wait_settled(min_change=...)
+covers that case by waiting for the brightness to actually move.
+
+Frames are handed out by reference, never copied. Every grab produces a new
+array, so a frame you hold is never overwritten by the grabber; treat it as
+read-only since other callers may hold the same frame.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+from .preprocess import crop
+
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+
+def _open_v4l2(device, width, height, fps):
+    cap = cv2.VideoCapture(device)
+    if not cap.isOpened():
+        return cap
+    # keep the driver queue short so grabbed frames are current
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    return cap
+
+
+class CameraService:
+    def __init__(
+        self,
+        device=0,
+        buffer_size: int = 4,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        fps: Optional[int] = None,
+        capture_factory: Optional[Callable] = None,  # () -> VideoCapture-like (read/isOpened/release)
+        max_read_failures: int = 10,
+    ):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.capture_factory = capture_factory
+        self.max_read_failures = max_read_failures
+
+        self._frames = deque(maxlen=max(1, buffer_size))  # (monotonic ts, frame)
+        self._cond = threading.Condition()
+        self._start_lock = threading.Lock()  # model loader and first capture may both start us
+        self._cap = None
+        self._thread = None
+        self._running = False
+
+        self.frames_grabbed = 0
+        self.read_failures = 0
+        self.reopens = 0
+        self.open_s = 0.0
+
+    # ----- lifecycle -----
+    def _open(self):
+        started = time.monotonic()
+        if self.capture_factory is not None:
+            cap = self.capture_factory()
+        elif cv2 is not None:
+            cap = _open_v4l2(self.device, self.width, self.height, self.fps)
+        else:
+            print("[CameraService] OpenCV not available.")
+            return None
+        self.open_s = time.monotonic() - started
+        if cap is None or not cap.isOpened():
+            print(f"[CameraService] camera {self.device} failed to open")
+            return None
+        print(f"[CameraService] camera {self.device} open in {self.open_s:.2f}s")
+        return cap
+
+    def start(self, first_frame_timeout_s: float = 3.0) -> bool:
+        """Open the device and start grabbing. True once the first frame is in the buffer."""
+        with self._start_lock:
+            if not self.is_running:
+                self._cap = self._open()
+                if self._cap is None:
+                    return False
+                self._running = True
+                self._thread = threading.Thread(target=self._grab_loop, name="CameraService-grab", daemon=True)
+                self._thread.start()
+        return self.frame_after(0.0, timeout_s=first_frame_timeout_s)[1] is not None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        if self._cap is not None:
+            try:
+                self._cap.release()
+            except Exception:
+                pass
+            self._cap = None
+        with self._cond:
+            self._frames.clear()
+            self._cond.notify_all()
+
+    # ----- grabber thread -----
+    def _grab_loop(self):
+        failures = 0
+        while self._running:
+            started = time.monotonic()  # read() blocks until the frame is delivered, after it was exposed
+            try:
+                ret, frame = self._cap.read()
+            except Exception as e:
+                print("[CameraService] read error:", e)
+                ret, frame = False, None
+            if not self._running:
+                break
+            if not ret or frame is None:
+                self.read_failures += 1
+                failures += 1
+                if failures >= self.max_read_failures:
+                    # camera unplugged or wedged: reopen instead of spinning
+                    failures = 0
+                    self._reopen()
+                else:
+                    time.sleep(0.01)
+                continue
+            failures = 0
+            ts = self._capture_time(started)
+            with self._cond:
+                self._frames.append((ts, frame))
+                self.frames_grabbed += 1
+                self._cond.notify_all()
+
+    def _capture_time(self, read_started: float) -> float:
+        """
+        Driver timestamp of the frame just read if it is plausible on our clock,
+        else read_started (an upper bound only for frames not already queued).
+        """
+        if cv2 is not None:
+            try:
+                ms = self._cap.get(cv2.CAP_PROP_POS_MSEC)
+            except Exception:
+                ms = 0
+            # V4L2 stamps buffers with CLOCK_MONOTONIC; other backends report stream position
+            if ms and read_started - 1.0 <= ms / 1000.0 <= time.monotonic():
+                return ms / 1000.0
+        return read_started
+
+    def _reopen(self):
+        print("[CameraService] too many failed reads; reopening camera")
+        try:
+            self._cap.release()
+        except Exception:
+            pass
+        cap = None
+        while self._running and cap is None:
+            cap = self._open()
+            if cap is None:
+                time.sleep(1.0)
+        if cap is not None:
+            self._cap = cap
+            self.reopens += 1
+
+    # ----- consumers -----
+    def latest(self) -> Tuple[Optional[float], Optional[object]]:
+        """Freshest (timestamp, frame) in the buffer, or (None, None)."""
+        with self._cond:
+            if not self._frames:
+                return None, None
+            return self._frames[-1]
+
+    def frame_after(self, ts: float, timeout_s: float = 1.0) -> Tuple[Optional[float], Optional[object]]:
+        """
+        Oldest buffered frame grabbed after `ts` (time.monotonic()), waiting up to
+        timeout_s for one to arrive. Use it after switching a light or moving the
+        bill so the frame is guaranteed to show the new state.
+        """
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            while True:
+                for frame_ts, frame in self._frames:
+                    if frame_ts > ts:
+                        return frame_ts, frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return None, None
+                self._cond.wait(remaining)
+
+    def wait_settled(
+        self,
+        ts: float,
+        timeout_s: float = 1.0,
+        tolerance: float = 0.02,
+        stable_frames: int = 2,
+        roi=None,
+        min_change: float = 0.0,
+    ) -> Tuple[Optional[float], Optional[object], Optional[float]]:
+        """
+        After a light switches at `ts`, follow the frames grabbed since then and
+        return the first one whose mean brightness changed by less than
+        `tolerance` (relative) over `stable_frames` consecutive frames, i.e.
+        LED rise and auto-exposure are done. With min_change > 0 the brightness
+        must first move that much (relative) away from the last frame before
+        `ts`, so frames still in the pipeline from before the switch cannot
+        pass as settled. Returns (frame_ts, frame, settle_s)
+        with settle_s = frame_ts - ts; settle_s is None when brightness did not
+        settle within timeout_s, in which case the newest frame is returned.
+        """
+        deadline = ts + timeout_s
+        last_ts, last_frame, prev_mean, stable = ts, None, None, 0
+        baseline = None
+        if min_change > 0:
+            with self._cond:
+                before = [f for frame_ts, f in self._frames if frame_ts <= ts]
+            if before:
+                baseline = float(crop(before[-1], roi)[::4, ::4].mean())
+        while True:
+            frame_ts, frame = self.frame_after(last_ts, timeout_s=max(0.0, deadline - time.monotonic()))
+            if frame is None:
+                return (last_ts if last_frame is not None else None), last_frame, None
+            mean = float(crop(frame, roi)[::4, ::4].mean())
+            if baseline is not None and abs(mean - baseline) >= min_change * max(baseline, 1.0):
+                baseline = None  # the switch is visible; from here on wait for stability
+            if baseline is None and prev_mean is not None and abs(mean - prev_mean) <= tolerance * max(prev_mean, 1.0):
+                stable += 1
+                if stable >= stable_frames:
+                    return frame_ts, frame, frame_ts - ts
+            else:
+                stable = 0
+            last_ts, last_frame, prev_mean = frame_ts, frame, mean
+            if frame_ts >= deadline:
+                return frame_ts, frame, None
+
+    def stats(self) -> dict:
+        with self._cond:
+            buffered = len(self._frames)
+            newest = self._frames[-1][0] if self._frames else None
+        return {
+            "running": self.is_running,
+            "frames_grabbed": self.frames_grabbed,
+            "read_failures": self.read_failures,
+            "reopens": self.reopens,
+            "buffered": buffered,
+            "newest_age_s": (time.monotonic() - newest) if newest is not None else None,
+            "open_s": self.open_s,
+        }
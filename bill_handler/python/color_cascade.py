@@ -0,0 +1,153 @@
+"""
+ColorCascade - colour-histogram pre-classifier for bill denominations.
+
+Philippine notes have distinct dominant colours (20 orange, 50 red, 100
+mauve, 200 green, 500 yellow, 1000 blue). The cascade shrinks the bill ROI to
+64x64, builds a saturation-weighted hue/value histogram, and compares it with
+one prototype histogram per denomination (Bhattacharyya distance). When the
+best class beats the runner-up by a clear margin the CNN is skipped;
+otherwise the caller runs the full classifier.
+
+    margin = (d_second - d_best) / d_second     # 0 = tie, 1 = perfect match
+
+Prototypes are fitted from labelled scans (folders named after the denom
+model's labels, e.g. scans/100php/*.jpg):
+
+    python -m bill_handler.python.color_cascade fit --images scans/denom
+    python bill_handler/python/benchmark_cascade.py --images scans/denom
+"""
+
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+DEFAULT_CASCADE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", "color_cascade.json")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class ColorCascade:
+    def __init__(self, hue_bins: int = 24, value_bins: int = 4, size: int = 64, min_saturation: int = 40):
+        self.hue_bins = hue_bins
+        self.value_bins = value_bins
+        self.size = size
+        self.min_saturation = min_saturation
+        self.prototypes: Dict[str, np.ndarray] = {}
+        # reused per call
+        self._small = np.empty((size, size, 3), dtype=np.uint8)
+        self._hsv = np.empty((size, size, 3), dtype=np.uint8)
+
+    @property
+    def ready(self) -> bool:
+        return len(self.prototypes) >= 2
+
+    def features(self, frame) -> np.ndarray:
+        """L1-normalised hue x value histogram of saturated pixels (float32)."""
+        cv2.resize(frame, (self.size, self.size), dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2HSV, dst=self._hsv)
+        mask = cv2.inRange(self._hsv, (0, self.min_saturation, 0), (180, 255, 255))
+        hist = cv2.calcHist([self._hsv], [0, 2], mask, [self.hue_bins, self.value_bins], [0, 180, 0, 256])
+        hist = hist.reshape(-1)
+        total = float(hist.sum())
+        if total <= 0:
+            return hist  # grey / empty frame: all distances equal -> zero margin
+        return hist / total
+
+    def classify(self, frame) -> Tuple[Optional[str], float]:
+        """(label, margin). margin near 0 means "ask the CNN"."""
+        if not self.ready:
+            return None, 0.0
+        feat = self.features(frame)
+        if not feat.any():
+            return None, 0.0
+        dists = sorted(
+            (cv2.compareHist(feat, proto, cv2.HISTCMP_BHATTACHARYYA), label)
+            for label, proto in self.prototypes.items()
+        )
+        (d1, best), (d2, _) = dists[0], dists[1]
+        margin = (d2 - d1) / d2 if d2 > 0 else 0.0
+        return best, float(margin)
+
+    # ----- fitting / persistence -----
+    def fit(self, samples) -> Dict[str, int]:
+        """samples: iterable of (label, bgr_image). Prototype = mean histogram per label."""
+        sums, counts = {}, {}
+        for label, img in samples:
+            feat = self.features(img)
+            if not feat.any():
+                continue
+            sums[label] = sums.get(label, 0) + feat
+            counts[label] = counts.get(label, 0) + 1
+        self.prototypes = {label: (sums[label] / counts[label]).astype(np.float32) for label in sums}
+        return counts
+
+    def save(self, path: str = DEFAULT_CASCADE_FILE):
+        data = {
+            "hue_bins": self.hue_bins,
+            "value_bins": self.value_bins,
+            "size": self.size,
+            "min_saturation": self.min_saturation,
+            "prototypes": {label: proto.tolist() for label, proto in self.prototypes.items()},
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CASCADE_FILE) -> Optional["ColorCascade"]:
+        if cv2 is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            cascade = cls(data["hue_bins"], data["value_bins"], data["size"], data["min_saturation"])
+            cascade.prototypes = {k: np.asarray(v, dtype=np.float32) for k, v in data["prototypes"].items()}
+            return cascade
+        except Exception as e:
+            print(f"[ColorCascade] Error loading {path}: {e}")
+            return None
+
+
+def iter_labelled(folder, roi=None):
+    """(label, path, image) for images in label-named subfolders."""
+    from .preprocess import crop
+
+    for label in sorted(os.listdir(folder)):
+        sub = os.path.join(folder, label)
+        if not os.path.isdir(sub):
+            continue
+        for f in sorted(os.listdir(sub)):
+            if f.lower().endswith(IMAGE_EXTS):
+                img = cv2.imread(os.path.join(sub, f))
+                if img is not None:
+                    yield label, os.path.join(sub, f), np.ascontiguousarray(crop(img, roi))
+
+
+def _main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit the colour-histogram cascade")
+    parser.add_argument("command", choices=["fit"])
+    parser.add_argument("--images", required=True, help="folder with one subfolder per denom label")
+    parser.add_argument("--out", default=DEFAULT_CASCADE_FILE)
+    parser.add_argument("--roi", action="store_true", help="crop to the ROI in camera_calibration.json")
+    args = parser.parse_args()
+
+    from .preprocess import load_calibration
+
+    roi = load_calibration()["roi"] if args.roi else None
+    cascade = ColorCascade()
+    counts = cascade.fit((label, img) for label, _, img in iter_labelled(args.images, roi))
+    cascade.save(args.out)
+    print(f"fitted {len(counts)} classes {counts} -> {args.out}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,731 @@
+"""
+InferenceServer - one process owns the bill classifiers and serves every acceptor.
+
+With several acceptors (or a dual-camera head) on one Pi, each PiBillHandler
+would otherwise load its own copy of the models and run them in its own
+threads, all competing for the same four cores. The server loads each model
+once and listens on a Unix socket. A batching thread takes the first queued
+request and waits up to max_wait_ms for more, at most max_batch in total. It
+runs them per model and answers each request on its own connection. Only
+models with a real predict_batch gain from company; the ncnn exports run a
+batch frame by frame. The wait therefore defaults to 0 unless every model
+can batch. This is
+the local, offline counterpart of embedded/send_image.py.
+
+Wire format (both directions): 8-byte header ">II" = (json length, payload
+length), then the JSON header, then the raw payload. A predict request sends
+the frame bytes as the payload with {"op": "predict", "model", "shape", "dtype"};
+the reply carries {"probs", "batch", "queue_ms"}. Requests carry an "id" and
+may be pipelined; replies can come back in any order.
+
+By default the client does not send frame bytes over the socket. It copies
+the ROI into one of a few shared-memory slots it owns and sends only the
+slot name ({"shm": name}). The server maps the slot once per connection and
+wraps it in an ndarray without copying. inference_worker.py runs the server
+as a supervised child process on top of this.
+
+    python -m bill_handler.python.inference_server --metrics inference_metrics.json
+    python -m bill_handler.python.inference_server --stats     # query a running server
+
+    handler = PiBillHandler(inference_server=DEFAULT_SOCKET_PATH)
+
+Metrics (queue depth, batch sizes, queue wait and per-model batch latency)
+are returned by the "stats" op and optionally dumped to a JSON file.
+"""
+
+import itertools
+import json
+import os
+import queue
+import signal
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except Exception:
+    shared_memory = None
+
+from coin_handler.python.serial_metrics import LatencyHistogram
+
+DEFAULT_SOCKET_PATH = "/tmp/coinnect_inference.sock"
+BATCH_WAIT_MS = 5.0  # default wait for batch company when the models really batch
+_HEADER = struct.Struct(">II")  # json length, payload length
+
+
+# ----- framing -----
+def send_message(sock, header: dict, payload=b""):
+    data = json.dumps(header).encode("utf-8")
+    view = memoryview(payload).cast("B") if len(payload) else b""
+    sock.sendall(_HEADER.pack(len(data), len(view)) + data)
+    if len(view):
+        sock.sendall(view)  # frame bytes go straight from the array, no intermediate copy
+
+
+def _recv_exact(sock, n: int) -> bytearray:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        r = sock.recv_into(view[got:], n - got)
+        if not r:
+            raise ConnectionError("socket closed")
+        got += r
+    return buf
+
+
+def recv_message(sock):
+    json_len, payload_len = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, json_len))
+    payload = _recv_exact(sock, payload_len) if payload_len else None
+    return header, payload
+
+
+_owned_segments = set()  # shm names created by clients in this process
+
+
+def _attach_shm(name):
+    """Map a client's segment; the client owns it, so this process must never unlink it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _owned_segments:  # same-process client: the registration is the client's
+            try:
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+        return shm
+
+
+# ----- server -----
+class _Request:
+    __slots__ = ("client", "id", "model", "frame", "received")
+
+    def __init__(self, client, rid, model, frame):
+        self.client = client
+        self.id = rid
+        self.model = model
+        self.frame = frame
+        self.received = time.monotonic()
+
+
+class _Client:
+    def __init__(self, conn):
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.segments = {}  # shm name -> SharedMemory mapped for this client
+        self.retired = []  # segments the client replaced; closed once no frame view is left
+
+    def frame(self, header, payload):
+        """ndarray for a predict request: a view of the client's shm slot, or of the payload bytes."""
+        for old in header.get("shm_retired", ()):
+            segment = self.segments.pop(old, None)
+            if segment is not None:
+                self.retired.append(segment)
+        if self.retired:
+            self._close_retired()
+        name = header.get("shm")
+        if name is None:
+            return np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+        segment = self.segments.get(name)
+        if segment is None:
+            segment = self.segments[name] = _attach_shm(name)
+        return np.ndarray(header["shape"], dtype=header["dtype"], buffer=segment.buf)
+
+    def _close_retired(self):
+        alive = []
+        for segment in self.retired:
+            try:
+                segment.close()
+            except BufferError:
+                alive.append(segment)  # the last batch still holds a view; retry on the next request
+        self.retired = alive
+
+    def close(self):
+        for segment in list(self.segments.values()) + self.retired:
+            try:
+                segment.close()
+            except Exception:
+                pass  # a view is still alive in a batch; the mapping goes with the process
+        self.segments, self.retired = {}, []
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+    def reply(self, header):
+        try:
+            with self.send_lock:
+                send_message(self.conn, header)
+        except OSError:
+            pass  # client went away; its reader thread cleans up
+
+
+class InferenceServer:
+    def __init__(
+        self,
+        models: Dict[str, Callable[[], object]],  # name -> loader returning a predict_probs model
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        max_batch: int = 4,
+        max_wait_ms: Optional[float] = None,  # wait for batch company; None = BATCH_WAIT_MS if every model batches, else 0
+    ):
+        self.loaders = models
+        self.socket_path = socket_path
+        self.max_batch = max(1, max_batch)
+        self.max_wait_ms = max_wait_ms
+        self.max_wait_s = max(0.0, max_wait_ms or 0.0) / 1000.0
+        self.models: Dict[str, object] = {}
+
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._sock = None
+        self._running = False
+        self._threads = []
+        self._clients = set()
+        self._stopped = threading.Event()
+
+        # metrics
+        self.started_at = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.max_queue_depth = 0
+        self.queue_wait = LatencyHistogram()
+        self.batch_latency: Dict[str, LatencyHistogram] = {}
+        self._metrics_lock = threading.Lock()
+        self._dump_stop = threading.Event()
+
+    # ----- lifecycle -----
+    def start(self):
+        for name, loader in self.loaders.items():
+            t = time.monotonic()
+            model = loader()
+            probe = np.zeros((480, 480, 3), dtype=np.uint8)
+            self._predict_batch(model, [probe])  # warm-up before the first client arrives
+            self.models[name] = model
+            self.batch_latency[name] = LatencyHistogram()
+            print(f"[InferenceServer] {name} ready in {time.monotonic() - t:.2f}s")
+        if self.max_wait_ms is None:
+            # a per-frame loop costs the same batched or not: waiting would only add latency
+            batching = bool(self.models) and all(hasattr(m, "predict_batch") for m in self.models.values())
+            self.max_wait_s = BATCH_WAIT_MS / 1000.0 if batching else 0.0
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # stale socket from a previous run
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.socket_path)
+        self._sock.listen(16)
+        self._running = True
+        self._stopped.clear()
+        for target, name in ((self._accept_loop, "InferenceServer-accept"), (self._batch_loop, "InferenceServer-batch")):
+            th = threading.Thread(target=target, name=name, daemon=True)
+            th.start()
+            self._threads.append(th)
+        print(f"[InferenceServer] listening on {self.socket_path} "
+              f"(max batch {self.max_batch}, wait {self.max_wait_s * 1000:.1f} ms)")
+
+    def serve_forever(self):
+        self.start()
+        try:
+            self._stopped.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._dump_stop.set()
+        try:
+            self._sock.close()
+        except Exception:
+            pass
+        for client in list(self._clients):
+            try:
+                client.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for th in self._threads:
+            th.join(timeout=2.0)
+        self._threads = []
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._stopped.set()
+
+    # ----- connections -----
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            client = _Client(conn)
+            self._clients.add(client)
+            threading.Thread(target=self._client_loop, args=(client,), name="InferenceServer-client", daemon=True).start()
+
+    def _client_loop(self, client):
+        try:
+            while self._running:
+                header, payload = recv_message(client.conn)
+                op = header.get("op")
+                if op == "predict":
+                    try:
+                        frame = client.frame(header, payload)
+                    except Exception as e:
+                        client.reply({"id": header.get("id"), "ok": False, "error": f"bad frame: {e}"})
+                        continue
+                    depth = self._queue.qsize() + 1
+                    with self._metrics_lock:
+                        self.requests += 1
+                        self.max_queue_depth = max(self.max_queue_depth, depth)
+                    self._queue.put(_Request(client, header.get("id"), header.get("model"), frame))
+                elif op == "models":
+                    names = {name: {str(k): v for k, v in dict(getattr(m, "names", {}) or {}).items()}
+                             for name, m in self.models.items()}
+                    client.reply({"id": header.get("id"), "ok": True, "models": names})
+                elif op == "ping":
+                    client.reply({"id": header.get("id"), "ok": True, "pid": os.getpid()})
+                elif op == "stats":
+                    client.reply({"id": header.get("id"), "ok": True, "stats": self.snapshot()})
+                else:
+                    client.reply({"id": header.get("id"), "ok": False, "error": f"unknown op {op!r}"})
+        except (ConnectionError, OSError):
+            pass
+        except Exception as e:
+            print("[InferenceServer] client error:", e)
+        finally:
+            self._clients.discard(client)
+            client.close()
+
+    # ----- batching -----
+    def _batch_loop(self):
+        while self._running:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = first.received + self.max_wait_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    # past the budget: still take whatever is already queued, just don't wait
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    @staticmethod
+    def _predict_batch(model, frames):
+        if hasattr(model, "predict_batch"):
+            return model.predict_batch(frames)
+        # the exported ncnn graphs take one image per extract: run the batch back to back on the warm net
+        return [model.predict_probs(frame) for frame in frames]
+
+    def _run_batch(self, batch):
+        started = time.monotonic()
+        groups: Dict[str, list] = {}
+        for req in batch:
+            groups.setdefault(req.model, []).append(req)
+        with self._metrics_lock:
+            self.batches += 1
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for req in batch:
+                self.queue_wait.record(started - req.received)
+
+        for name, reqs in groups.items():
+            model = self.models.get(name)
+            if model is None:
+                self._fail(reqs, f"unknown model {name!r}")
+                continue
+            t = time.monotonic()
+            try:
+                results = self._predict_batch(model, [r.frame for r in reqs])
+            except Exception as e:
+                print(f"[InferenceServer] {name} batch failed:", e)
+                self._fail(reqs, str(e))
+                continue
+            with self._metrics_lock:
+                self.batch_latency[name].record(time.monotonic() - t)
+            for req, probs in zip(reqs, results):
+                req.client.reply({
+                    "id": req.id,
+                    "ok": True,
+                    "probs": np.asarray(probs, dtype=np.float32).reshape(-1).tolist(),
+                    "batch": len(reqs),
+                    "queue_ms": (started - req.received) * 1000.0,
+                })
+
+    def _fail(self, reqs, error):
+        with self._metrics_lock:
+            self.errors += len(reqs)
+        for req in reqs:
+            req.client.reply({"id": req.id, "ok": False, "error": error})
+
+    # ----- reporting -----
+    def snapshot(self) -> dict:
+        with self._metrics_lock:
+            sizes = dict(self.batch_sizes)
+            batched = sum(size * n for size, n in sizes.items())
+            return {
+                "at": time.time(),
+                "uptime_s": time.time() - self.started_at,
+                "clients": len(self._clients),
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch": (batched / self.batches) if self.batches else 0.0,
+                "max_wait_ms": self.max_wait_s * 1000.0,
+                "batch_sizes": {str(k): v for k, v in sorted(sizes.items())},
+                "queue_wait": self.queue_wait.as_dict(),
+                "batch_latency": {name: hist.as_dict() for name, hist in self.batch_latency.items()},
+            }
+
+    def dump(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    def start_periodic_dump(self, path, interval_s=30.0):
+        self._dump_stop.clear()
+
+        def loop():
+            while not self._dump_stop.wait(interval_s):
+                try:
+                    self.dump(path)
+                except Exception as e:
+                    print("[InferenceServer] metrics dump failed:", e)
+
+        threading.Thread(target=loop, name="InferenceServer-dump", daemon=True).start()
+
+
+# ----- client -----
+class _ShmSlots:
+    """Shared-memory frame buffers owned by a client, one per in-flight request."""
+
+    def __init__(self, count: int = 4):
+        self._free = []
+        self._all = []
+        self._retired = []  # names replaced by a larger slot; the server is told to unmap them
+        self._lock = threading.Lock()
+        self._available = threading.Semaphore(count)
+
+    def acquire(self, nbytes: int, timeout_s: float):
+        if not self._available.acquire(timeout=timeout_s):
+            raise TimeoutError("no free shared-memory slot")
+        with self._lock:
+            slot = self._free.pop() if self._free else None
+            if slot is not None and slot.size < nbytes:
+                self._all.remove(slot)
+                self._retired.append(slot.name)
+                _owned_segments.discard(slot.name)
+                slot.close()
+                slot.unlink()
+                slot = None
+            if slot is None:
+                try:
+                    slot = shared_memory.SharedMemory(create=True, size=nbytes)
+                except Exception:
+                    self._available.release()
+                    raise
+                self._all.append(slot)
+                _owned_segments.add(slot.name)
+        return slot
+
+    def release(self, slot):
+        with self._lock:
+            if slot not in self._all:
+                return  # closed with the client
+            self._free.append(slot)
+        self._available.release()
+
+    def take_retired(self) -> list:
+        """Names of replaced segments not yet reported to the server."""
+        with self._lock:
+            names, self._retired = self._retired, []
+        return names
+
+    def close(self):
+        with self._lock:
+            for slot in self._all:
+                _owned_segments.discard(slot.name)
+                try:
+                    slot.close()
+                    slot.unlink()
+                except Exception:
+                    pass
+            self._all, self._free = [], []
+
+
+class InferenceClient:
+    """
+    Connection to an InferenceServer. Thread-safe; concurrent calls (UV and
+    denomination threads) are pipelined on one socket so the server can batch them.
+
+    wait_ready: optional callable(timeout_s) -> bool (InferenceWorker.wait_ready);
+    when the connection drops, the client waits for the restarted server and
+    retries the request until timeout_s * 6 has passed.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        timeout_s: float = 5.0,
+        use_shared_memory: bool = True,
+        slots: int = 4,
+        wait_ready: Optional[Callable[[float], bool]] = None,
+    ):
+        self.socket_path = socket_path
+        self.timeout_s = timeout_s
+        self.wait_ready = wait_ready
+        self._slots = _ShmSlots(slots) if (use_shared_memory and shared_memory is not None) else None
+        self._sock = None
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._held: Dict[int, object] = {}  # request id -> shm slot of a timed-out request the server may still read
+        self._ids = itertools.count(1)
+        self.reconnects = 0
+
+    def connect(self):
+        with self._lock:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.socket_path)
+                self._sock = sock
+                threading.Thread(target=self._read_loop, args=(sock,), name="InferenceClient-read", daemon=True).start()
+        return self._sock
+
+    def _read_loop(self, sock):
+        try:
+            while True:
+                header, payload = recv_message(sock)
+                with self._lock:
+                    future = self._pending.pop(header.get("id"), None)
+                    late_slot = self._held.pop(header.get("id"), None)
+                if future is not None:
+                    future.set_result((header, payload))
+                if late_slot is not None:
+                    self._slots.release(late_slot)  # the server is done with it
+        except Exception as e:
+            with self._lock:
+                if self._sock is sock:
+                    self._sock = None
+                pending, self._pending = self._pending, {}
+                held, self._held = self._held, {}
+            for future in pending.values():
+                future.set_exception(ConnectionError(f"inference server connection lost: {e}"))
+            for slot in held.values():
+                self._slots.release(slot)
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def request(self, header: dict, payload=b"", hold=None):
+        """
+        Send one request and wait for its reply. `hold` is the shm slot the
+        request reads from: on a TimeoutError the client keeps it out of use
+        until the server answers that request or the connection resets.
+        """
+        deadline, lost = time.monotonic() + self.timeout_s * 6, False
+        while True:
+            try:
+                reply = self._request_once(header, payload, hold)
+            except ConnectionError as e:
+                if self.wait_ready is None:
+                    raise
+                print("[InferenceClient]", e, "- waiting for the worker to come back")
+                # a worker still exiting can look ready for a moment: keep going until the deadline
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.wait_ready(remaining):
+                    raise
+                lost = True
+                continue
+            if lost:
+                self.reconnects += 1
+            return reply
+
+    def _request_once(self, header: dict, payload=b"", hold=None):
+        try:
+            sock = self.connect()
+        except OSError as e:
+            raise ConnectionError(f"inference server unreachable: {e}")
+        rid = next(self._ids)
+        header["id"] = rid
+        future = Future()
+        with self._lock:
+            if self._sock is not sock:
+                # the read loop reset the connection after connect(); nothing would answer
+                raise ConnectionError("inference server connection lost")
+            self._pending[rid] = future
+            try:
+                send_message(sock, header, payload)
+            except OSError as e:
+                self._pending.pop(rid, None)
+                raise ConnectionError(f"inference server send failed: {e}")
+        try:
+            reply, data = future.result(timeout=self.timeout_s)
+        except FutureTimeoutError:
+            with self._lock:
+                self._pending.pop(rid, None)
+                quarantined = hold is not None and self._sock is sock
+                if quarantined:
+                    self._held[rid] = hold
+            if hold is not None and not quarantined:
+                self._slots.release(hold)  # connection already reset: the server has let go of it
+            raise TimeoutError(f"no reply from inference server within {self.timeout_s}s")
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "inference server error"))
+        return reply, data
+
+    def predict_probs(self, model: str, frame) -> np.ndarray:
+        header = {"op": "predict", "model": model, "shape": list(frame.shape), "dtype": str(frame.dtype)}
+        if self._slots is None:
+            frame = np.ascontiguousarray(frame)  # an ROI view is copied once here, then sent from the array
+            reply, _ = self.request(header, frame)
+            return np.asarray(reply["probs"], dtype=np.float32)
+
+        slot = self._slots.acquire(frame.nbytes, self.timeout_s)
+        owned = True
+        try:
+            # the only copy: ROI view -> shared segment; the server maps the same pages
+            np.copyto(np.ndarray(frame.shape, dtype=frame.dtype, buffer=slot.buf), frame)
+            header["shm"] = slot.name
+            retired = self._slots.take_retired()
+            if retired:
+                header["shm_retired"] = retired  # the server closes its mapping of the old segments
+            reply, _ = self.request(header, hold=slot)
+        except TimeoutError:
+            owned = False  # the server may still be reading the frame; request() hands the slot back later
+            raise
+        finally:
+            if owned:
+                self._slots.release(slot)
+        return np.asarray(reply["probs"], dtype=np.float32)
+
+    def ping(self) -> int:
+        """Server pid."""
+        return self.request({"op": "ping"})[0]["pid"]
+
+    def models(self) -> Dict[str, Dict[int, str]]:
+        reply, _ = self.request({"op": "models"})
+        return {name: {int(k): v for k, v in names.items()} for name, names in reply["models"].items()}
+
+    def stats(self) -> dict:
+        return self.request({"op": "stats"})[0]["stats"]
+
+    def close(self):
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+                sock.close()
+            except OSError:
+                pass
+        if self._slots is not None:
+            self._slots.close()
+
+
+class RemoteClassifier:
+    """One server-side model behind the NcnnClassifier interface (predict_probs / classify / names)."""
+
+    def __init__(self, client: InferenceClient, name: str, names: Optional[Dict[int, str]] = None):
+        self.client = client
+        self.name = name
+        self.names = names if names is not None else client.models()[name]
+
+    def predict_probs(self, frame) -> np.ndarray:
+        return self.client.predict_probs(self.name, frame)
+
+    def classify(self, frame):
+        probs = self.predict_probs(frame)
+        idx = int(np.argmax(probs))
+        return self.names.get(idx, str(idx)), float(probs[idx])
+
+
+# ----- CLI -----
+class _YoloBatchClassifier:
+    """ultralytics model that classifies a whole batch in one predict call."""
+
+    def __init__(self, path):
+        from ultralytics import YOLO
+
+        self.model = YOLO(path, task="classify")
+        self.names = dict(self.model.names)
+
+    def predict_batch(self, frames):
+        results = self.model.predict(list(frames), verbose=False)
+        return [r.probs.data.cpu().numpy().astype(np.float32).reshape(-1) for r in results]
+
+    def predict_probs(self, frame):
+        return self.predict_batch([frame])[0]
+
+
+def default_loaders(backend: str = "ncnn", uv_path=None, denom_path=None, threads: int = 4) -> Dict[str, Callable]:
+    from .ncnn_classifier import NcnnClassifier
+    from .preprocess import load_calibration
+
+    models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
+    paths = {
+        "uv": uv_path or os.path.join(models_dir, "uv_cls_v2_ncnn_model"),
+        "denom": denom_path or os.path.join(models_dir, "denom-cls-v2_ncnn_model"),
+    }
+    if backend == "ultralytics":
+        return {name: (lambda p=p: _YoloBatchClassifier(p)) for name, p in paths.items()}
+    interpolation = load_calibration()["interpolation"]
+    return {name: (lambda p=p: NcnnClassifier(p, num_threads=threads, interpolation=interpolation))
+            for name, p in paths.items()}
+
+
+def _main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared bill-classifier inference server")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH)
+    parser.add_argument("--backend", choices=("ncnn", "ultralytics"), default="ncnn")
+    parser.add_argument("--uv-model")
+    parser.add_argument("--denom-model")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--max-batch", type=int, default=4)
+    parser.add_argument("--max-wait-ms", type=float, default=None,
+                        help=f"default: {BATCH_WAIT_MS:g} if every model batches, else 0")
+    parser.add_argument("--metrics", help="dump metrics JSON to this file")
+    parser.add_argument("--metrics-interval", type=float, default=30.0)
+    parser.add_argument("--stats", action="store_true", help="print the stats of a running server and exit")
+    args = parser.parse_args()
+
+    if args.stats:
+        client = InferenceClient(args.socket)
+        print(json.dumps(client.stats(), indent=2))
+        client.close()
+        return
+
+    server = InferenceServer(
+        default_loaders(args.backend, args.uv_model, args.denom_model, args.threads),
+        socket_path=args.socket, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+    )
+    if args.metrics:
+        server.start_periodic_dump(args.metrics, args.metrics_interval)
+    # InferenceWorker stops us with SIGTERM: shut down cleanly (socket removed, last metrics dump)
+    signal.signal(signal.SIGTERM, lambda *_: server._stopped.set())
+    server.serve_forever()
+    if args.metrics:
+        server.dump(args.metrics)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,160 @@
+"""
+InferenceWorker - runs the bill classifiers in a supervised child process.
+
+Pre/post-processing around the ncnn calls holds the GIL. Inside the UI
+process it competes with the Qt event loop, the serial reader thread and
+the QThread workers, which shows up as UI jank and late serial reads. The
+worker starts inference_server in a fresh interpreter. It is a new process,
+not a fork of the Qt process. Frames reach it through the client's
+shared-memory slots (see inference_server.py), so nothing is pickled.
+
+A supervisor thread restarts the worker when it exits unexpectedly, with
+exponential backoff. Clients built with wait_ready=worker.wait_ready block
+until the new worker is listening and then retry, so a crash costs one
+slow scan instead of a dead kiosk.
+
+    worker = InferenceWorker()
+    worker.start()
+    client = InferenceClient(worker.socket_path, wait_ready=worker.wait_ready)
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+
+class InferenceWorker:
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        server_args: Optional[List[str]] = None,  # extra inference_server CLI args (--backend, --threads, ...)
+        command: Optional[List[str]] = None,  # full command; overrides the default server invocation
+        ready_timeout_s: float = 60.0,
+        max_backoff_s: float = 10.0,
+    ):
+        self.socket_path = socket_path or f"/tmp/coinnect_inference_{os.getpid()}.sock"
+        self.command = command or [
+            sys.executable, "-m", "bill_handler.python.inference_server",
+            "--socket", self.socket_path, *(server_args or []),
+        ]
+        self.ready_timeout_s = ready_timeout_s
+        self.max_backoff_s = max_backoff_s
+
+        self.proc: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self.last_exit_code = None
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._supervisor = None
+
+    def _spawn(self):
+        env = dict(os.environ)
+        # `python -m bill_handler...` needs the project root; cwd stays the caller's (config files live there)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (PROJECT_ROOT, env.get("PYTHONPATH")) if p)
+        self._ready.clear()
+        self.proc = subprocess.Popen(self.command, env=env)
+        print(f"[InferenceWorker] started pid {self.proc.pid}")
+
+    def _probe(self) -> bool:
+        """The server only binds its socket once the models are loaded and warm."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    def _wait_listening(self, timeout_s: float) -> bool:
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline and not self._stopping.is_set():
+            if self.proc is None or self.proc.poll() is not None:
+                return False
+            if self._probe():
+                self._ready.set()
+                return True
+            time.sleep(0.05)
+        return False
+
+    def start(self) -> bool:
+        """Spawn the worker and wait until it serves. False if it did not come up."""
+        self._stopping.clear()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # do not mistake a dead worker's socket for a live one
+        self._spawn()
+        ok = self._wait_listening(self.ready_timeout_s)
+        if not ok:
+            print("[InferenceWorker] worker did not come up within", self.ready_timeout_s, "s")
+        self._supervisor = threading.Thread(target=self._supervise, name="InferenceWorker-supervise", daemon=True)
+        self._supervisor.start()
+        return ok
+
+    def _supervise(self):
+        backoff = 0.5
+        while not self._stopping.is_set():
+            code = self.proc.wait()
+            if self._stopping.is_set():
+                break
+            self.last_exit_code = code
+            self._ready.clear()
+            print(f"[InferenceWorker] worker exited with code {code}; restarting in {backoff:.1f}s")
+            if self._stopping.wait(backoff):
+                break
+            self.restarts += 1
+            self._spawn()
+            if self._wait_listening(self.ready_timeout_s):
+                backoff = 0.5  # healthy again
+            else:
+                backoff = min(backoff * 2, self.max_backoff_s)
+
+    def wait_ready(self, timeout_s: float) -> bool:
+        """Block until the (possibly restarted) worker is listening."""
+        deadline = time.monotonic() + timeout_s
+        while not self._stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._ready.wait(remaining):
+                return False
+            # a crash may not have been noticed by the supervisor yet
+            proc = self.proc
+            if proc is not None and proc.poll() is None and self._probe():
+                return True
+            time.sleep(0.05)
+        return False
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def stats(self) -> dict:
+        return {
+            "pid": self.proc.pid if self.proc else None,
+            "ready": self.is_ready,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+        }
+
+    def stop(self, timeout_s: float = 5.0):
+        self._stopping.set()
+        self._ready.clear()
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=timeout_s)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        if self._supervisor is not None and self._supervisor is not threading.current_thread():
+            self._supervisor.join(timeout=timeout_s)
+        if os.path.exists(self.socket_path):
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
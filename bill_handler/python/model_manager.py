@@ -0,0 +1,235 @@
+"""
+ModelManager - picks up new model versions while the kiosk keeps running.
+
+PiBillHandler loads its classifiers once, so before this class a model update
+meant restarting the whole app. ModelManager polls the model directories the
+handler loaded from. A directory's version is the content hash of its model
+files (model_registry.content_hash, cached per file mtime/size, so a poll
+costs a few stat calls). When a version changes and stays the same for two
+polls, so that a copy still in progress is not picked up, the new version
+is loaded and checked on the manager thread. The kiosk keeps scanning with
+the current model meanwhile. A version that loads and passes its check is
+staged. The owner swaps it in with swap_pending() at a point where no
+model is in use: PiBillHandler does this between transactions.
+
+The replaced version stays loaded. rollback() stages it again for an
+instant switch back, and marks the version on disk as rejected, so it is not
+reloaded until the files change again. A version that fails to load or
+fails its check is rejected the same way and never swapped in.
+
+Deploy a model so that the watched path switches from the old files to the
+new ones in one step. Renaming a directory onto an existing one does not do
+that (mv new_dir uv_cls_v2_ncnn_model moves new_dir inside it), so make the
+watched path a symlink to a versioned directory and swap the link:
+
+    cp -r export/ models/uv_v3                   # next to the live version
+    ln -sfn uv_v3 models/uv_cls_v2_ncnn_model.tmp
+    mv -T models/uv_cls_v2_ncnn_model.tmp models/uv_cls_v2_ncnn_model
+
+In-place overwrites of the model files also work: a half-copied version
+changes again before the next poll and is not loaded. A replaced version is
+handed to `release` once it is two swaps back; with the model registry that
+unloads it.
+
+    manager = ModelManager({"uv": uv_dir}, load=load, check=check, current={"uv": uv_model})
+    manager.start()
+    ...
+    manager.swap_pending(apply)   # between transactions: apply(slot, model) for each staged version
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .model_registry import content_hash
+
+
+class ModelVersion:
+    __slots__ = ("slot", "path", "digest", "model", "loaded_at", "load_s")
+
+    def __init__(self, slot, path, digest, model, load_s=0.0):
+        self.slot = slot
+        self.path = path
+        self.digest = digest
+        self.model = model
+        self.loaded_at = time.time()
+        self.load_s = load_s
+
+    def as_dict(self) -> dict:
+        return {"path": self.path, "version": self.digest[:12], "loaded_at": self.loaded_at, "load_s": self.load_s}
+
+
+class ModelManager:
+    def __init__(
+        self,
+        paths: Dict[str, str],  # slot name -> model directory (or file) to watch
+        load: Callable[[str, str], object],  # (slot, path) -> loaded model
+        check: Optional[Callable[[str, object], None]] = None,  # (slot, model); warm up, raise if unusable
+        current: Optional[Dict[str, object]] = None,  # models already loaded from paths
+        release: Optional[Callable[[object], None]] = None,  # hand back a model that is no longer kept
+        poll_s: float = 5.0,
+        on_staged: Optional[Callable[[], None]] = None,  # called from the manager thread after staging
+    ):
+        self.paths = dict(paths)
+        self.load = load
+        self.check = check
+        self.release = release
+        self.poll_s = poll_s
+        self.on_staged = on_staged
+
+        self.current: Dict[str, ModelVersion] = {}
+        self.previous: Dict[str, ModelVersion] = {}
+        self._pending: Dict[str, ModelVersion] = {}
+        self._seen: Dict[str, str] = {}  # slot -> digest at the previous poll
+        self._rejected: Dict[str, str] = {}  # slot -> digest not to load again
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"polls": 0, "loads": 0, "failures": 0, "swaps": 0, "rollbacks": 0}
+
+        for slot, path in self.paths.items():
+            digest = self._digest(path)
+            self._seen[slot] = digest
+            if current and current.get(slot) is not None and digest:
+                self.current[slot] = ModelVersion(slot, path, digest, current[slot])
+
+    @staticmethod
+    def _digest(path) -> Optional[str]:
+        try:
+            return content_hash(path)
+        except OSError:
+            return None  # missing, or mid-rename
+
+    # ----- watching -----
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ModelManager", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.poll_once()
+            except Exception as e:
+                print("[ModelManager] poll failed:", e)
+
+    def poll_once(self) -> List[str]:
+        """Check every path once; returns the slots staged by this poll."""
+        staged = []
+        self.stats["polls"] += 1
+        for slot, path in self.paths.items():
+            digest = self._digest(path)
+            settled = digest is not None and digest == self._seen.get(slot)
+            self._seen[slot] = digest
+            with self._lock:
+                known = {v.digest for v in (self.current.get(slot), self._pending.get(slot)) if v is not None}
+                if not settled or digest in known or digest == self._rejected.get(slot):
+                    continue
+            if self._load_version(slot, path, digest):
+                staged.append(slot)
+        if staged and self.on_staged is not None:
+            self.on_staged()
+        return staged
+
+    def _load_version(self, slot, path, digest) -> bool:
+        print(f"[ModelManager] new {slot} model {digest[:12]} in {path}; loading in the background")
+        started = time.monotonic()
+        model = None
+        try:
+            model = self.load(slot, path)
+            if self.check is not None:
+                self.check(slot, model)
+        except Exception as e:
+            if model is not None and self.release is not None:
+                self.release(model)
+            self.stats["failures"] += 1
+            with self._lock:
+                self._rejected[slot] = digest
+            print(f"[ModelManager] {slot} model {digest[:12]} rejected, keeping the current one:", e)
+            return False
+        version = ModelVersion(slot, path, digest, model, time.monotonic() - started)
+        self.stats["loads"] += 1
+        self._stage(version)
+        print(f"[ModelManager] {slot} model {digest[:12]} ready in {version.load_s:.2f}s; "
+              f"swapping in at the next idle point")
+        return True
+
+    def _stage(self, version: ModelVersion):
+        with self._lock:
+            replaced = self._pending.get(version.slot)
+            self._pending[version.slot] = version
+            kept = [v.model for v in (self.current.get(version.slot), self.previous.get(version.slot)) if v is not None]
+        # a staged version overtaken before it was ever swapped in
+        if replaced is not None and all(replaced.model is not m for m in kept) and self.release is not None:
+            self.release(replaced.model)
+
+    # ----- swapping (owner calls these when no model is in use) -----
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def swap_pending(self, apply: Callable[[str, object], None]) -> List[str]:
+        """
+        Make every staged version current: apply(slot, model) installs it in the
+        owner. The version two swaps back is released. Returns the slots swapped.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for slot, version in pending.items():
+            apply(slot, version.model)
+            with self._lock:
+                old_previous = self.previous.get(slot)
+                if self.current.get(slot) is not None:
+                    self.previous[slot] = self.current[slot]
+                self.current[slot] = version
+            if old_previous is not None and old_previous.model is not version.model and self.release is not None:
+                self.release(old_previous.model)
+            self.stats["swaps"] += 1
+            print(f"[ModelManager] {slot} model now {version.digest[:12]}")
+        return list(pending)
+
+    def rollback(self, slot: Optional[str] = None) -> List[str]:
+        """Stage the previous version of `slot` (or of every slot) again. Returns the slots staged."""
+        staged = []
+        with self._lock:
+            slots = [slot] if slot else list(self.previous)
+            versions = [(s, self.previous.get(s), self.current.get(s)) for s in slots]
+        for s, previous, current in versions:
+            if previous is None or current is None:
+                continue
+            with self._lock:
+                self._rejected[s] = current.digest  # do not reload the files we are moving away from
+            self._stage(previous)
+            staged.append(s)
+        if staged:
+            self.stats["rollbacks"] += len(staged)
+            print(f"[ModelManager] rolling back {', '.join(staged)} at the next idle point")
+        return staged
+
+    def versions(self) -> dict:
+        with self._lock:
+            return {
+                slot: {
+                    "current": self.current[slot].as_dict() if slot in self.current else None,
+                    "previous": self.previous[slot].as_dict() if slot in self.previous else None,
+                    "pending": self._pending[slot].as_dict() if slot in self._pending else None,
+                    "rejected": (self._rejected.get(slot) or "")[:12] or None,
+                }
+                for slot in self.paths
+            }
+
+    def stop(self, timeout_s: float = 5.0):
+        """Stop watching and release the previous/staged versions (the owner releases the current ones)."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout_s)
+        with self._lock:
+            current = [v.model for v in self.current.values()]
+            spare = [v.model for v in (*self.previous.values(), *self._pending.values())]
+            self.previous.clear()
+            self._pending.clear()
+        released = []
+        for model in spare:
+            if self.release is not None and all(model is not m for m in current + released):
+                self.release(model)
+                released.append(model)
@@ -0,0 +1,236 @@
+"""
+ModelRegistry - one loaded copy of each classifier per process.
+
+Models are keyed by a hash of their file contents (plus backend and load
+options), not by path, so the identical exports under bill_handler/models/
+and demo/models/ resolve to the same entry, and every PiBillHandler in the
+process (UI, terminal, test scripts that build several) shares it.
+
+    registry = get_model_registry()
+    model = registry.get_or_load(path, "ncnn", lambda: NcnnClassifier(path))
+    ...
+    registry.release(model)       # the last release unloads the model
+
+Shared models must be safe to call from several threads. NcnnClassifier and
+MultiHeadClassifier serialize calls with their own lock; models of any other
+backend (ultralytics YOLO keeps per-call predictor state) are wrapped in a
+SerializedModel before they are cached.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# files that make up a model directory; anything else (harness scripts, __pycache__) is ignored
+_MODEL_FILES = ("model.ncnn.param", "model.ncnn.bin", "metadata.yaml")
+
+_hash_cache: Dict[str, tuple] = {}  # path -> ((mtime, size), digest)
+_hash_lock = threading.Lock()
+
+
+def _file_digest(path: str, chunk: int = 1 << 20) -> str:
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _hash_lock:
+        cached = _hash_cache.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _hash_lock:
+        _hash_cache[path] = (stamp, digest)
+    return digest
+
+
+def content_hash(path: str) -> str:
+    """sha256 over a model file, or over the model files of an export directory."""
+    path = os.path.realpath(path)
+    if os.path.isfile(path):
+        return _file_digest(path)
+    h = hashlib.sha256()
+    found = False
+    for name in _MODEL_FILES:
+        p = os.path.join(path, name)
+        if os.path.isfile(p):
+            found = True
+            h.update(name.encode())
+            h.update(_file_digest(p).encode())
+    if not found:
+        raise FileNotFoundError(f"no model files in {path}")
+    return h.hexdigest()
+
+
+class SerializedModel:
+    """
+    Thread-safe front for a model that is not: every method call takes one
+    lock. Attributes (names, task, ...) are read straight from the model.
+    """
+
+    def __init__(self, model):
+        self._model = model
+        self._lock = threading.Lock()
+
+    @property
+    def wrapped(self):
+        return self._model
+
+    def __getattr__(self, name):
+        attr = getattr(self._model, name)
+        if not callable(attr):
+            return attr
+        lock = self._lock
+
+        def locked(*args, **kwargs):
+            with lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            return self._model(*args, **kwargs)
+
+    def __repr__(self):
+        return f"SerializedModel({self._model!r})"
+
+
+def _thread_safe(backend: str) -> bool:
+    return backend.startswith("ncnn")
+
+
+class _Entry:
+    __slots__ = ("model", "key", "paths", "refs", "load_s", "loaded_at", "ready")
+
+    def __init__(self, key):
+        self.key = key
+        self.model = None
+        self.paths = set()
+        self.refs = 0
+        self.load_s = 0.0
+        self.loaded_at = 0.0
+        self.ready = threading.Event()
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries: Dict[tuple, _Entry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def get_or_load(self, path: str, backend: str, loader: Callable[[], object], **options):
+        """
+        Return the shared model for `path`, calling loader() only if no model
+        with the same content, backend and options is loaded yet. Concurrent
+        callers for the same key wait for the first load instead of repeating it.
+        Models of non-ncnn backends come back wrapped in a SerializedModel.
+        """
+        key = (content_hash(path), backend, tuple(sorted(options.items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _Entry(key)
+            entry.refs += 1
+            entry.paths.add(os.path.realpath(path))
+
+        if not owner:
+            entry.ready.wait()
+            if entry.model is None:
+                # the first load failed; let this caller try again
+                with self._lock:
+                    entry.refs -= 1
+                return self.get_or_load(path, backend, loader, **options)
+            with self._lock:
+                self.hits += 1
+            return entry.model
+
+        started = time.monotonic()
+        try:
+            model = loader()
+            entry.model = model if _thread_safe(backend) else SerializedModel(model)
+            entry.load_s = time.monotonic() - started
+            entry.loaded_at = time.time()
+            with self._lock:
+                self.loads += 1
+            print(f"[ModelRegistry] loaded {os.path.basename(os.path.normpath(path))} ({backend}) "
+                  f"in {entry.load_s:.2f}s [{key[0][:12]}]")
+            return entry.model
+        except Exception:
+            with self._lock:
+                self._entries.pop(key, None)
+            raise
+        finally:
+            entry.ready.set()
+
+    def release(self, model) -> None:
+        """Drop one reference; the last one unloads the model."""
+        if model is None:
+            return
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry.model is model and entry.refs > 0:
+                    entry.refs -= 1
+                    if entry.refs > 0:
+                        return
+                    del self._entries[key]
+                    break
+            else:
+                return
+        self._close(entry)
+
+    def evict_unused(self) -> int:
+        """Unload models nobody holds (release() already does this for the last reference). Returns how many."""
+        with self._lock:
+            unused = [k for k, e in self._entries.items() if e.refs <= 0 and e.ready.is_set()]
+            entries = [self._entries.pop(k) for k in unused]
+        for entry in entries:
+            self._close(entry)
+        return len(entries)
+
+    @staticmethod
+    def _close(entry: _Entry):
+        print(f"[ModelRegistry] unloading {entry.key[1]} model [{entry.key[0][:12]}]")
+        close = getattr(entry.model, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                print("[ModelRegistry] close failed:", e)
+        entry.model = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "hits": self.hits,
+                "models": [
+                    {
+                        "hash": e.key[0][:12],
+                        "backend": e.key[1],
+                        "options": dict(e.key[2]),
+                        "paths": sorted(e.paths),
+                        "refs": e.refs,
+                        "load_s": e.load_s,
+                    }
+                    for e in self._entries.values()
+                ],
+            }
+
+
+_default_registry: Optional[ModelRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Process-wide registry shared by every PiBillHandler."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
@@ -0,0 +1,264 @@
+"""
+NcnnClassifier - runs the exported *_ncnn_model classifiers with ncnn directly.
+
+The ultralytics wrapper imports torch and builds a Results object on every
+predict call. For a 480x480 classifier on the Pi that overhead is a large
+part of each scan, so this backend talks to ncnn.Net itself:
+
+ - input/output blobs "in0"/"out0" as in the exported model_ncnn.py harness
+ - labels and input size read from the model's metadata.yaml
+ - preprocessing into a preallocated CHW buffer (preprocess.Preprocessor),
+   wrapped once in an ncnn.Mat
+ - one extractor reused between calls (when the bindings expose clear())
+ - optional read-only mmap of model.ncnn.bin, so processes loading the same
+   weights share page-cache pages instead of each holding a private copy
+
+    clf = NcnnClassifier("bill_handler/models/uv_cls_v2_ncnn_model")
+    label, conf = clf.classify(bgr_frame)
+"""
+
+import mmap
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import ncnn
+except Exception:
+    ncnn = None
+
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+try:
+    import yaml
+except Exception:
+    yaml = None
+
+from .preprocess import Preprocessor
+
+NCNN_AVAILABLE = ncnn is not None and cv2 is not None
+
+
+def load_metadata(model_dir: str) -> dict:
+    """Parse metadata.yaml of an ultralytics export (names, imgsz)."""
+    path = os.path.join(model_dir, "metadata.yaml")
+    with open(path, "r") as f:
+        if yaml is not None:
+            return yaml.safe_load(f) or {}
+        # minimal fallback: only the fields we need
+        meta, section = {"names": {}, "imgsz": []}, None
+        for raw in f:
+            line = raw.rstrip()
+            if not line or line.lstrip().startswith("#"):
+                continue
+            if not raw.startswith((" ", "-")):
+                section = line.split(":", 1)[0]
+                continue
+            item = line.strip()
+            if section.startswith("names") and ":" in item:  # names, or names_auth / names_denom (multihead)
+                idx, name = item.split(":", 1)
+                meta.setdefault(section, {})[int(idx)] = name.strip().strip("'\"")
+            elif section == "imgsz" and item.startswith("-"):
+                meta["imgsz"].append(int(item[1:].strip()))
+        return meta
+
+
+def variant_path(model_dir: str, variant: str) -> str:
+    """
+    Directory of a model variant: "fp32" is the export itself, others sit next to it
+    (uv_cls_v2_ncnn_model -> uv_cls_v2_int8_ncnn_model, see quantize_models.py).
+    """
+    if variant in (None, "", "fp32"):
+        return model_dir
+    model_dir = os.path.normpath(model_dir)
+    parent, name = os.path.split(model_dir)
+    stem = name[: -len("_ncnn_model")] if name.endswith("_ncnn_model") else name
+    return os.path.join(parent, f"{stem}_{variant}_ncnn_model")
+
+
+class NcnnClassifier:
+    def __init__(
+        self,
+        model_dir: str,
+        num_threads: int = 4,
+        input_name: str = "in0",
+        output_name: str = "out0",
+        use_vulkan: bool = False,
+        mmap_weights: bool = False,
+        interpolation: str = "linear",
+    ):
+        if not NCNN_AVAILABLE:
+            raise ImportError("ncnn and opencv-python are required for the ncnn backend")
+        self.model_dir = model_dir
+        self.input_name = input_name
+        self.output_name = output_name
+
+        meta = load_metadata(model_dir)
+        self.names: Dict[int, str] = {int(k): str(v) for k, v in (meta.get("names") or {}).items()}
+        imgsz = meta.get("imgsz") or [480, 480]
+        self.height, self.width = int(imgsz[0]), int(imgsz[-1])
+
+        self.net = ncnn.Net()
+        self.net.opt.num_threads = num_threads
+        self.net.opt.use_vulkan_compute = use_vulkan
+        param_path = os.path.join(model_dir, "model.ncnn.param")
+        bin_path = os.path.join(model_dir, "model.ncnn.bin")
+        if self.net.load_param(param_path) != 0:
+            raise RuntimeError(f"failed to load {param_path}")
+        self._weights = None
+        self.weights_mapped = mmap_weights and self._load_mapped(bin_path)
+        if not self.weights_mapped and self.net.load_model(bin_path) != 0:
+            raise RuntimeError(f"failed to load {bin_path}")
+
+        # preallocated per-call buffers; the Mat shares the preprocessor's output memory
+        self.preprocessor = Preprocessor((self.height, self.width), interpolation=interpolation, layout="chw_rgb")
+        self._mat = ncnn.Mat(self.preprocessor.output)
+        self._extractor = self.net.create_extractor()
+        self._reuse_extractor = hasattr(self._extractor, "clear")
+        self._lock = threading.Lock()
+
+    def _load_mapped(self, bin_path) -> bool:
+        """
+        Load weights from a read-only mmap. ncnn references fp32 weights in the
+        buffer instead of copying them, so the map has to live as long as the net.
+        Needs bindings with load_model_mem; returns False to fall back to a file load.
+        """
+        if not hasattr(self.net, "load_model_mem"):
+            print("[NcnnClassifier] ncnn bindings cannot load from memory; weights not mapped")
+            return False
+        try:
+            with open(bin_path, "rb") as f:
+                self._weights = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.net.load_model_mem(self._weights)
+            return True
+        except Exception as e:
+            print("[NcnnClassifier] mmap load failed, reading file instead:", e)
+            if self._weights is not None:
+                self._weights.close()
+                self._weights = None
+            return False
+
+    def forward(self):
+        """
+        Run the net on whatever is in preprocessor.output and return the raw
+        output Mat. predict_probs does this under the lock; benchmarks call it
+        directly to time the forward pass on its own.
+        """
+        if self._reuse_extractor:
+            ex = self._extractor
+            ex.clear()  # drop cached blobs from the previous call
+        else:
+            ex = self.net.create_extractor()
+        ex.input(self.input_name, self._mat)
+        ret, out = ex.extract(self.output_name)
+        if ret != 0:
+            raise RuntimeError(f"ncnn extract failed ({ret})")
+        return out
+
+    def predict_probs(self, frame) -> np.ndarray:
+        """Class probabilities (the exported graph already ends in Softmax)."""
+        with self._lock:
+            self.preprocessor(frame)  # BGR any size -> RGB, 0..1, CHW (matches ultralytics classify)
+            return np.array(self.forward(), dtype=np.float32).reshape(-1)
+
+    def classify(self, frame) -> Tuple[Optional[str], float]:
+        probs = self.predict_probs(frame)
+        idx = int(np.argmax(probs))
+        return self.names.get(idx, str(idx)), float(probs[idx])
+
+    def close(self):
+        with self._lock:
+            self._extractor = None
+            self.net.clear()
+            if self._weights is not None:
+                self._weights.close()
+                self._weights = None
+
+
+class MultiHeadClassifier:
+    """
+    Fused UV + white-light classifier (train_multihead.py): one backbone over the
+    two captures stacked as 6 channels (white RGB, then UV RGB), two softmax heads.
+    One forward pass gives both the authenticity and the denomination.
+
+    metadata.yaml: names_auth, names_denom, imgsz; blobs in0 -> out0 (auth), out1 (denom).
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        num_threads: int = 4,
+        input_name: str = "in0",
+        output_names: Tuple[str, str] = ("out0", "out1"),
+        use_vulkan: bool = False,
+        mmap_weights: bool = False,
+        interpolation: str = "linear",
+    ):
+        if not NCNN_AVAILABLE:
+            raise ImportError("ncnn and opencv-python are required for the ncnn backend")
+        self.model_dir = model_dir
+        self.input_name = input_name
+        self.output_names = output_names
+
+        meta = load_metadata(model_dir)
+        self.names_auth: Dict[int, str] = {int(k): str(v) for k, v in (meta.get("names_auth") or {}).items()}
+        self.names_denom: Dict[int, str] = {int(k): str(v) for k, v in (meta.get("names_denom") or {}).items()}
+        if not self.names_auth or not self.names_denom:
+            raise ValueError(f"{model_dir}/metadata.yaml lacks names_auth / names_denom")
+        imgsz = meta.get("imgsz") or [480, 480]
+        self.height, self.width = int(imgsz[0]), int(imgsz[-1])
+
+        self.net = ncnn.Net()
+        self.net.opt.num_threads = num_threads
+        self.net.opt.use_vulkan_compute = use_vulkan
+        param_path = os.path.join(model_dir, "model.ncnn.param")
+        bin_path = os.path.join(model_dir, "model.ncnn.bin")
+        if self.net.load_param(param_path) != 0:
+            raise RuntimeError(f"failed to load {param_path}")
+        self._weights = None
+        self.weights_mapped = mmap_weights and self._load_mapped(bin_path)
+        if not self.weights_mapped and self.net.load_model(bin_path) != 0:
+            raise RuntimeError(f"failed to load {bin_path}")
+
+        # both captures preprocess straight into their half of one stacked input buffer
+        self._input = np.empty((6, self.height, self.width), dtype=np.float32)
+        size = (self.height, self.width)
+        self._pre_white = Preprocessor(size, interpolation=interpolation, out=self._input[:3])
+        self._pre_uv = Preprocessor(size, interpolation=interpolation, out=self._input[3:])
+        self._mat = ncnn.Mat(self._input)
+        self._lock = threading.Lock()
+
+    _load_mapped = NcnnClassifier._load_mapped
+
+    def predict_probs(self, uv_frame, white_frame) -> Tuple[np.ndarray, np.ndarray]:
+        """(auth probabilities, denomination probabilities) from one forward pass."""
+        with self._lock:
+            self._pre_white(white_frame)
+            self._pre_uv(uv_frame)
+            ex = self.net.create_extractor()
+            ex.input(self.input_name, self._mat)
+            outputs = []
+            for name in self.output_names:
+                ret, out = ex.extract(name)  # the second head reuses the backbone blobs
+                if ret != 0:
+                    raise RuntimeError(f"ncnn extract {name} failed ({ret})")
+                outputs.append(np.array(out, dtype=np.float32).reshape(-1))
+            return outputs[0], outputs[1]
+
+    def classify(self, uv_frame, white_frame):
+        """((auth label, conf), (denom label, conf))."""
+        auth, denom = self.predict_probs(uv_frame, white_frame)
+        a, d = int(np.argmax(auth)), int(np.argmax(denom))
+        return (self.names_auth.get(a, str(a)), float(auth[a])), (self.names_denom.get(d, str(d)), float(denom[d]))
+
+    def close(self):
+        with self._lock:
+            self.net.clear()
+            if self._weights is not None:
+                self._weights.close()
+                self._weights = None
@@ -14,7 +14,12 @@ Bill dispensing uses modular BillDispenser units:
 
 import time
 import os
-from typing import Optional, Tuple, Dict
+import json
+import threading
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Optional, Tuple, Dict
 
 # --- GPIOZero setup ---
 try:
@@ -55,16 +60,43 @@ try:
 except Exception:
     serial = None
 
-# OpenCV + YOLO
+try:
+    from coin_handler.python.serial_link import DEFAULT_MAX_BAUD, SerialConnection
+except Exception:
+    DEFAULT_MAX_BAUD = 9600
+    SerialConnection = None
+
+# OpenCV (ultralytics is imported only when the "ultralytics" backend is used; it pulls in torch)
 try:
     import cv2
-    from ultralytics import YOLO
 except Exception:
     cv2 = None
-    YOLO = None
+YOLO = None
 
 # Storage
 from .bill_storage import BillStorage
+from .camera_service import CameraService
+from .color_cascade import DEFAULT_CASCADE_FILE, ColorCascade
+from .frame_quality import FrameQualityGate
+from .inference_server import InferenceClient, RemoteClassifier
+from .inference_worker import InferenceWorker
+from .model_manager import ModelManager
+from .model_registry import ModelRegistry, get_model_registry
+from .ncnn_classifier import NCNN_AVAILABLE, MultiHeadClassifier, NcnnClassifier, variant_path
+from .preprocess import DEFAULT_CALIBRATION_FILE, Preprocessor, crop, load_calibration
+from .result_cache import ResultCache
+from .training_capture import TrainingCapture
+
+
+def _import_yolo():
+    global YOLO
+    if YOLO is None:
+        try:
+            from ultralytics import YOLO as _YOLO
+            YOLO = _YOLO
+        except Exception as e:
+            print("[PiBillHandler] ultralytics not available:", e)
+    return YOLO
 
 
 class BillDispenser:
@@ -240,11 +272,34 @@ class PiBillHandler:
         white_led_pin: int = 27,
         sorter_serial_port: str = "/dev/ttyACM0",
         sorter_baud: int = 9600,
+        sorter_max_baud: int = DEFAULT_MAX_BAUD,  # negotiated upgrade ceiling (== sorter_baud disables)
         speed: float = 0.4,  # Motor speed (0.0–1.0)
         use_hardware: Optional[bool] = None,
         uv_model_path: Optional[str] = None,
         denom_model_path: Optional[str] = None,
         serial_manager = None, # New shared serial manager (CoinHandlerSerial instance)
+        sorter_link = None,  # SerialConnection for a dedicated sorter board (DeviceRegistry)
+        camera_index: int = 0,
+        camera: Optional[CameraService] = None,  # share one running service between handlers
+        calibration_file: str = DEFAULT_CALIBRATION_FILE,  # bill ROI, capture resolution, interpolation
+        model_backend: str = "auto",  # "ncnn" (direct ncnn.Net), "ultralytics", or "auto" (ncnn if available)
+        model_registry: Optional[ModelRegistry] = None,  # defaults to the process-wide registry
+        mmap_weights: bool = False,  # ncnn: map weight blobs so processes share pages
+        model_config_file: str = "model_config.json",  # per-model variant: {"uv_variant": "int8", ...}
+        cascade_file: Optional[str] = DEFAULT_CASCADE_FILE,  # colour pre-classifier (None disables)
+        cascade_margin: float = 0.35,  # below this margin the CNN decides
+        max_vote_frames: int = 3,  # white frames a marginal denomination may average over (1 = single frame)
+        uv_threshold: float = 0.8,
+        denom_threshold: float = 0.5,
+        quality_gate: Optional[bool] = None,  # blur/exposure/bill-present check; None = on if calibrated ("quality" key)
+        max_regrabs: int = 5,  # frames skipped per capture before giving up on a bad frame
+        led_settle_timeout_s: float = 0.6,  # upper bound on waiting for stable brightness after white_on
+        inference_server: Optional[str] = None,  # socket of a shared inference_server process; local models if unreachable
+        inference_worker: bool = False,  # run the models in a supervised child process of our own
+        multihead_model_path: Optional[str] = None,  # fused UV+white model, used when model_config.json has "multihead": true
+        result_cache_ttl_s: float = 20.0,  # reuse the denomination of a bill reinserted within this window (0 disables)
+        training_capture_dir: Optional[str] = None,  # opt-in: save scanned frames + predictions here for retraining
+        model_watch_interval_s: float = 5.0,  # poll model dirs; new versions swap in between transactions (0 disables)
     ):
         self.ir_pin = ir_pin
         self.motor_forward_pin = motor_forward_pin
@@ -253,6 +308,7 @@ class PiBillHandler:
         self.white_led_pin = white_led_pin
         self.sorter_serial_port = sorter_serial_port
         self.sorter_baud = sorter_baud
+        self.sorter_max_baud = sorter_max_baud
         self.speed = speed
         self.serial_manager = serial_manager
 
@@ -284,6 +340,9 @@ class PiBillHandler:
         # Serial sorter (Shared manager or individual)
 
         self.sorter_serial = None
+        self.sorter_link = sorter_link
+        if sorter_link is not None and sorter_link.is_open:
+            self.sorter_serial = sorter_link.ser
         
         # NOTE: serial_manager logic is handled if passed later or we can add it to init now.
         # But to avoid breaking existing signatures too much, we will handle it via setter or optional param.
@@ -297,26 +356,336 @@ class PiBillHandler:
         # Storage
         self.storage = BillStorage()
 
-        # Model loading
+        # UV and denomination models run side by side in verify_bill (inference releases the GIL)
+        self._infer_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="BillInfer")
+        self._orphans = set()  # inference abandoned by an early reject, still running on the pool
+        self.last_verify_timing: Dict[str, float] = {}  # *_s durations, uv_frames / denom_frames counts
+        self._light_lock = threading.Lock()  # the white burst owns the LED while it runs
+
+        # Camera stays open and grabs in the background; capture_image hands out buffered frames
+        # Capture at the calibrated resolution (ideally one where the ROI needs no resize)
+        self.calibration = load_calibration(calibration_file)
+        self.roi = self.calibration["roi"]
+        self._bgr_pre: Dict[int, Preprocessor] = {}  # ultralytics input buffers, one per model
+        self._owns_camera = camera is None  # a shared service is stopped by whoever created it
+        self.camera = camera if camera is not None else CameraService(
+            camera_index, width=self.calibration["camera_width"], height=self.calibration["camera_height"]
+        )
+
+        # Model loading runs in the background so the UI can come up immediately;
+        # models_ready resolves to the backend name (None = mock) once both models are warm.
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         if uv_model_path is None:
             uv_model_path = os.path.join(self.script_dir, '..', 'models', "uv_cls_v2_ncnn_model")
         if denom_model_path is None:
             denom_model_path = os.path.join(self.script_dir, '..', 'models', "denom-cls-v2_ncnn_model")
+        if multihead_model_path is None:
+            multihead_model_path = os.path.join(self.script_dir, '..', 'models', "bill_multihead_ncnn_model")
+        self.multihead_model_path = multihead_model_path
+        self.multihead: Optional[MultiHeadClassifier] = None  # replaces uv_model + denom_model when loaded
 
         self.uv_model = None
         self.denom_model = None
         self.uv_labels = []
         self.denom_labels = []
+        self.model_backend = None
+        self.model_load_timing: Dict[str, float] = {}
+        self.models_ready: Future = Future()
+        self.model_registry = model_registry if model_registry is not None else get_model_registry()
+        self.mmap_weights = mmap_weights
+        self.model_variants = self._load_model_config(model_config_file)
+        self.inference_server = inference_server
+        self.inference_client: Optional[InferenceClient] = None
+        self._use_worker = inference_worker and not inference_server
+        self.inference_worker: Optional[InferenceWorker] = None
+
+        # optional colour-histogram cascade in front of the denomination CNN (fit with color_cascade.py)
+        self.cascade = ColorCascade.load(cascade_file) if cascade_file else None
+        self.cascade_margin = cascade_margin
+        self.cascade_stats = {"short_circuit": 0, "fallthrough": 0}
+
+        # sequential decisions: stop at the first frame whose mean probability clears the threshold
+        self.max_vote_frames = max(1, max_vote_frames)
+        self.uv_threshold = uv_threshold
+        self.denom_threshold = denom_threshold
+
+        # unusable frames are re-grabbed from the ring buffer instead of being classified. The default
+        # thresholds are not tuned to any particular camera, so the gate is only on by default once
+        # camera_calibration.json carries measured ones.
+        if quality_gate is None:
+            quality_gate = bool(self.calibration.get("quality"))
+        self.quality_gate = FrameQualityGate(self.calibration.get("quality")) if quality_gate else None
+        self.max_regrabs = max(0, max_regrabs)
+        self.led_settle_timeout_s = led_settle_timeout_s
+
+        # verified results keyed by a perceptual hash of the UV ROI, for bills pushed back and reinserted
+        self.result_cache = ResultCache(ttl_s=result_cache_ttl_s) if result_cache_ttl_s > 0 else None
+        self._cache_key = None
+        self.last_verify_confidence: Dict[str, float] = {}
+
+        # field frames for retraining, encoded and written off the transaction path
+        self.training_capture = TrainingCapture(training_capture_dir) if training_capture_dir else None
+        self._scan_frames = {"uv": [], "white": []}
+
+        # hot swap: new model versions are loaded in the background and installed only between transactions
+        self.model_watch_interval_s = model_watch_interval_s
+        self.model_manager: Optional[ModelManager] = None
+        self._txn_lock = threading.RLock()
+        threading.Thread(
+            target=self._load_models,
+            args=(uv_model_path, denom_model_path, model_backend),
+            name="BillModelLoad",
+            daemon=True,
+        ).start()
+
+    def _load_models(self, uv_model_path, denom_model_path, model_backend):
+        started = time.monotonic()
+        try:
+            if cv2 is not None and not self.camera.is_running:
+                self.camera.start()
+            self.model_load_timing["camera_s"] = time.monotonic() - started
+
+            t = time.monotonic()
+            uv_model = denom_model = None
+            if self.model_variants["multihead"]:
+                self.multihead = self._load_multihead()
+                if self.multihead is not None:
+                    self.model_backend = "ncnn-multihead"
+            # with the fused network loaded, the two single-task models are not
+            if self.multihead is None and self._use_worker:
+                self._start_inference_worker(uv_model_path, denom_model_path, model_backend)
+
+            if self.multihead is None and self.inference_server:
+                wait_ready = self.inference_worker.wait_ready if self.inference_worker else None
+                client = InferenceClient(self.inference_server, wait_ready=wait_ready)
+                try:
+                    names = client.models()
+                    uv_model = RemoteClassifier(client, "uv", names["uv"])
+                    denom_model = RemoteClassifier(client, "denom", names["denom"])
+                    uv_labels, denom_labels = uv_model.names, denom_model.names
+                    self.inference_client = client
+                    backend = "server"
+                except Exception as e:
+                    client.close()
+                    uv_model = denom_model = None
+                    print(f"[PiBillHandler] inference server {self.inference_server} unavailable, loading locally:", e)
 
-        if YOLO is not None:
+            if self.multihead is None and uv_model is None and model_backend in ("auto", "ncnn") and NCNN_AVAILABLE:
+                try:
+                    model_paths = {"uv": self._variant_dir(uv_model_path, self.model_variants["uv"]),
+                                   "denom": self._variant_dir(denom_model_path, self.model_variants["denom"])}
+                    uv_model = self._shared_model(model_paths["uv"], "ncnn")
+                    denom_model = self._shared_model(model_paths["denom"], "ncnn")
+                    uv_labels, denom_labels = uv_model.names, denom_model.names
+                    backend = "ncnn"
+                except Exception as e:
+                    self.model_registry.release(uv_model)
+                    uv_model = denom_model = None
+                    print("[PiBillHandler] ncnn model load failed:", e)
+
+            if self.multihead is None and uv_model is None and model_backend in ("auto", "ultralytics") \
+                    and _import_yolo() is not None:
+                try:
+                    uv_model = self._shared_model(uv_model_path, "ultralytics")
+                    denom_model = self._shared_model(denom_model_path, "ultralytics")
+                    uv_labels = getattr(uv_model, "names", [])
+                    denom_labels = getattr(denom_model, "names", [])
+                    model_paths = {"uv": uv_model_path, "denom": denom_model_path}
+                    backend = "ultralytics"
+                except Exception as e:
+                    self.model_registry.release(uv_model)
+                    uv_model = denom_model = None
+                    print("[PiBillHandler] YOLO model load failed:", e)
+            self.model_load_timing["load_s"] = time.monotonic() - t
+
+            if uv_model is not None:
+                # warm-up: first inference allocates buffers / picks kernels; pay it now, not on the first bill
+                import numpy as np
+                t = time.monotonic()
+                dummy = np.zeros((480, 480, 3), dtype=np.uint8)
+                self.run_inference(uv_model, dummy, uv_labels)
+                self.run_inference(denom_model, dummy, denom_labels)
+                self.model_load_timing["warmup_s"] = time.monotonic() - t
+
+                self.uv_labels, self.denom_labels = uv_labels, denom_labels
+                self.uv_model, self.denom_model = uv_model, denom_model
+                self.model_backend = backend
+                if backend in ("ncnn", "ultralytics"):
+                    self._start_model_manager(model_paths, {"uv": uv_model, "denom": denom_model})
+            elif self.multihead is not None:
+                self._start_model_manager({"multihead": self.multihead_model_path}, {"multihead": self.multihead})
+        except Exception as e:
+            print("[PiBillHandler] model loading failed:", e)
+        finally:
+            self.model_load_timing["total_s"] = time.monotonic() - started
+            variants = f" {self.model_variants}" if self.model_backend == "ncnn" else ""
+            print(f"[PiBillHandler] model backend: {self.model_backend or 'none (mock)'}{variants} "
+                  f"ready in {self.model_load_timing['total_s']:.2f}s {self.model_load_timing}")
+            self.models_ready.set_result(self.model_backend)
+
+    def _start_inference_worker(self, uv_model_path, denom_model_path, model_backend):
+        """Spawn the worker process; on success the server path below talks to it over shared memory."""
+        if model_backend == "ultralytics":
+            args = ["--backend", "ultralytics"]
+        else:
+            args = ["--backend", "ncnn"]
+            uv_variant = variant_path(uv_model_path, self.model_variants["uv"])
+            denom_variant = variant_path(denom_model_path, self.model_variants["denom"])
+            uv_model_path = uv_variant if os.path.isdir(uv_variant) else uv_model_path
+            denom_model_path = denom_variant if os.path.isdir(denom_variant) else denom_model_path
+        # one acceptor: UV and denom are different models, so waiting for batch company only adds latency
+        args += ["--uv-model", uv_model_path, "--denom-model", denom_model_path, "--max-wait-ms", "0"]
+        worker = InferenceWorker(server_args=args)
+        if worker.start():
+            self.inference_worker = worker
+            self.inference_server = worker.socket_path
+        else:
+            worker.stop()
+            print("[PiBillHandler] inference worker failed to start; loading models in-process")
+
+    @staticmethod
+    def _load_model_config(path):
+        variants = {"uv": "fp32", "denom": "fp32", "multihead": False}
+        if os.path.exists(path):
             try:
-                self.uv_model = YOLO(uv_model_path, task='classify')
-                self.denom_model = YOLO(denom_model_path, task='classify')
-                self.uv_labels = getattr(self.uv_model, "names", [])
-                self.denom_labels = getattr(self.denom_model, "names", [])
+                with open(path, "r") as f:
+                    config = json.load(f)
+                variants["uv"] = config.get("uv_variant", "fp32")
+                variants["denom"] = config.get("denom_variant", "fp32")
+                variants["multihead"] = bool(config.get("multihead", False))
             except Exception as e:
-                print("[PiBillHandler] YOLO model load failed:", e)
+                print(f"[PiBillHandler] Error loading {path}: {e}")
+        return variants
+
+    def _load_multihead(self, path: Optional[str] = None) -> Optional[MultiHeadClassifier]:
+        """Fused model through the registry, warmed up; None (two-model setup) if it cannot load."""
+        path = path or self.multihead_model_path
+        if not NCNN_AVAILABLE or not os.path.isdir(path):
+            print(f"[PiBillHandler] multihead enabled but {path} unavailable; using two models")
+            return None
+        interpolation = self.calibration["interpolation"]
+        try:
+            model = self.model_registry.get_or_load(
+                path, "ncnn-multihead",
+                lambda: MultiHeadClassifier(path, mmap_weights=self.mmap_weights, interpolation=interpolation),
+                mmap_weights=self.mmap_weights, interpolation=interpolation,
+            )
+        except Exception as e:
+            print("[PiBillHandler] multihead model load failed:", e)
+            return None
+        t = time.monotonic()
+        dummy = np.zeros((480, 480, 3), dtype=np.uint8)
+        model.predict_probs(dummy, dummy)
+        self.model_load_timing["warmup_s"] = time.monotonic() - t
+        return model
+
+    @staticmethod
+    def _variant_dir(path, variant):
+        chosen = variant_path(path, variant)
+        if chosen != path and not os.path.isdir(chosen):
+            print(f"[PiBillHandler] {variant} variant {chosen} missing; using fp32")
+            return path
+        return chosen
+
+    def _shared_model(self, path, backend, variant="fp32"):
+        """Load through the registry so every handler in the process shares one copy."""
+        if backend == "ncnn":
+            path = self._variant_dir(path, variant)
+            interpolation = self.calibration["interpolation"]
+            return self.model_registry.get_or_load(
+                path, backend,
+                lambda: NcnnClassifier(path, mmap_weights=self.mmap_weights, interpolation=interpolation),
+                mmap_weights=self.mmap_weights, interpolation=interpolation,
+            )
+        return self.model_registry.get_or_load(path, backend, lambda: YOLO(path, task='classify'))
+
+    def wait_models_ready(self, timeout_s: Optional[float] = None) -> bool:
+        """Block until background loading finished (returns at once when it already has)."""
+        if self.models_ready.done():
+            return True
+        print("[PiBillHandler] waiting for models to finish loading...")
+        t = time.monotonic()
+        try:
+            self.models_ready.result(timeout=timeout_s)
+        except FutureTimeoutError:
+            print(f"[PiBillHandler] models still loading after {timeout_s}s")
+            return False
+        print(f"[PiBillHandler] models ready after waiting {time.monotonic() - t:.2f}s")
+        return True
+
+    # -------------------------
+    # Model hot swap
+    # -------------------------
+    def _start_model_manager(self, paths, current):
+        if self.model_watch_interval_s <= 0:
+            return
+        self.model_manager = ModelManager(
+            paths, load=self._load_for_swap, check=self._check_swapped_model, current=current,
+            release=self.model_registry.release, poll_s=self.model_watch_interval_s,
+            on_staged=self._swap_models_if_idle,
+        )
+        self.model_manager.start()
+
+    def _load_for_swap(self, slot, path):
+        if slot == "multihead":
+            model = self._load_multihead(path)
+            if model is None:
+                raise RuntimeError(f"cannot load {path}")
+            return model
+        return self._shared_model(path, self.model_backend)
+
+    @staticmethod
+    def _label_set(labels):
+        return set(labels.values()) if isinstance(labels, dict) else set(labels)
+
+    def _check_swapped_model(self, slot, model):
+        """Warm the candidate up and make sure it can stand in for the current model."""
+        dummy = np.zeros((480, 480, 3), dtype=np.uint8)
+        if slot == "multihead":
+            auth, denom = model.predict_probs(dummy, dummy)
+            outputs = [(auth, model.names_auth, self.multihead.names_auth),
+                       (denom, model.names_denom, self.multihead.names_denom)]
+        else:
+            names = getattr(model, "names", [])
+            current = self.uv_labels if slot == "uv" else self.denom_labels
+            outputs = [(self.inference_probs(model, dummy), names, current)]
+        for probs, names, current in outputs:
+            if probs is None or len(probs) != len(names) or not np.all(np.isfinite(probs)):
+                raise ValueError("warm-up output does not match the model's labels")
+            missing = self._label_set(current) - self._label_set(names)
+            if missing:
+                raise ValueError(f"labels {sorted(missing)} missing")
+
+    def _install_model(self, slot, model):
+        if slot == "uv":
+            self.uv_model, self.uv_labels = model, getattr(model, "names", [])
+        elif slot == "denom":
+            self.denom_model, self.denom_labels = model, getattr(model, "names", [])
+        else:
+            self.multihead = model
+        if self.result_cache is not None:
+            self.result_cache.clear()  # verdicts of the old model
+
+    def _swap_models_if_idle(self):
+        """Install staged model versions now, unless a transaction is running (it installs them when it ends)."""
+        if self.model_manager is None or not self.model_manager.has_pending():
+            return
+        if any(not f.done() for f in list(self._orphans)):
+            return  # an abandoned inference still uses the current model; it swaps when done
+        if not self._txn_lock.acquire(blocking=False):
+            return
+        try:
+            self.model_manager.swap_pending(self._install_model)
+        finally:
+            self._txn_lock.release()
+
+    def rollback_models(self, slot: Optional[str] = None) -> list:
+        """Switch back to the previously installed version of `slot` (or all). Returns the slots rolled back."""
+        if self.model_manager is None:
+            return []
+        slots = self.model_manager.rollback(slot)
+        self._swap_models_if_idle()
+        return slots
 
     # -------------------------
     # Dispenser Management
@@ -398,16 +767,22 @@ class PiBillHandler:
         if self.serial_manager:
             return
 
+        if serial is None or SerialConnection is None:
+            self.sorter_serial = None
+            print("[PiBillHandler] sorter serial not available (mock mode)")
+            return
+
+        if self.sorter_link is None:
+            # persistent link: waits for the sorter's Ready banner, negotiates baud
+            self.sorter_link = SerialConnection(
+                self.sorter_serial_port, self.sorter_baud, self.sorter_max_baud, name="PiBillHandler"
+            )
         for attempt in range(attempts):
-            try:
-                if serial is None:
-                    self.sorter_serial = None
-                    return
-                self.sorter_serial = serial.Serial(self.sorter_serial_port, self.sorter_baud, timeout=1)
+            if self.sorter_link.open():
+                self.sorter_serial = self.sorter_link.ser
                 return
-            except Exception as e:
-                print(f"[PiBillHandler] sorter open attempt {attempt+1} failed: {e}")
-                time.sleep(delay_s)
+            print(f"[PiBillHandler] sorter open attempt {attempt+1} failed")
+            time.sleep(delay_s)
         self.sorter_serial = None
         print("[PiBillHandler] sorter serial not available (mock mode)")
 
@@ -418,8 +793,10 @@ class PiBillHandler:
         if self.serial_manager:
             return self.serial_manager.send_sort_command(denom, timeout_s=timeout_s)
 
-        # 2. Fallback to individual serial
+        # 2. Fallback to individual serial (dedicated sorter board is opened on first use)
         cmd = f"SORT:{denom}\n"
+        if self.sorter_serial is None and self.sorter_link is not None:
+            self._open_sorter_serial()
         if self.sorter_serial is None:
             print("[PiBillHandler] sorter serial missing; assuming success (mock).")
             return True
@@ -448,75 +825,477 @@ class PiBillHandler:
     # -------------------------
     # Camera & YOLO
     # -------------------------
-    def capture_image(self):
+    def capture_image(self, after: Optional[float] = None, timeout_s: float = 1.0, light: Optional[str] = None):
+        """
+        Frame grabbed after `after` (time.monotonic(); defaults to now, so the
+        frame shows the bill as it is at call time). Not a copy; do not modify.
+
+        With `light` ("uv" / "white") the frame should pass the quality gate;
+        failing frames are skipped for the next one in the stream, up to
+        max_regrabs times, after which the best frame seen is returned (and
+        counted as best_effort_frames) so the models still get to decide.
+        """
         if cv2 is None:
             print("[PiBillHandler] OpenCV not available for capture.")
             return None
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
+        if not self.camera.is_running and not self.camera.start():
             print("[PiBillHandler] Camera failed to open")
             return None
-        ret, frame = cap.read()
-        cap.release()
-        return frame if ret else None
+        ts = time.monotonic() if after is None else after
+        gate = self.quality_gate if light else None
+        best, best_rank = None, None
+        for attempt in range(1 + (self.max_regrabs if gate else 0)):
+            ts, frame = self.camera.frame_after(ts, timeout_s=timeout_s)
+            if frame is None:
+                print("[PiBillHandler] no camera frame within", timeout_s, "s")
+                return best
+            if gate is None:
+                return frame
+            ok, reason, metrics = gate.check(crop(frame, self.roi), light)
+            if ok:
+                if attempt:
+                    self.last_verify_timing["regrabs"] = self.last_verify_timing.get("regrabs", 0) + attempt
+                return frame
+            print(f"[PiBillHandler] {light} frame rejected ({reason}: sharpness {metrics['sharpness']:.0f}, "
+                  f"mean {metrics['mean']:.0f}, occupancy {metrics['occupancy']:.2f}); re-grabbing")
+            # a blurred bill beats a badly lit one, which beats an empty slot; then the sharpest
+            rank = (reason != "empty", reason != "exposure", metrics["sharpness"])
+            if best_rank is None or rank > best_rank:
+                best, best_rank = frame, rank
+        timing = self.last_verify_timing
+        timing["regrabs"] = timing.get("regrabs", 0) + self.max_regrabs
+        timing["best_effort_frames"] = timing.get("best_effort_frames", 0) + 1
+        print(f"[PiBillHandler] no {light} frame passed the quality gate after {self.max_regrabs} re-grabs; "
+              f"classifying the best one")
+        return best
 
-    def run_inference(self, model, frame, labels):
+    def inference_probs(self, model, frame):
+        """Class probability vector for one frame (ROI-cropped), or None on failure."""
         try:
             if frame is None:
-                return None, 0.0
-            resized = cv2.resize(frame, (480, 480))
-            result = model.predict(resized, verbose=False)[0]
+                return None
+            frame = crop(frame, self.roi)  # view, no copy
+            if hasattr(model, "predict_probs"):
+                return model.predict_probs(frame)  # NcnnClassifier preprocesses into its own buffers
+            pre = self._bgr_pre.get(id(model))
+            if pre is None:
+                pre = self._bgr_pre[id(model)] = Preprocessor(
+                    (480, 480), interpolation=self.calibration["interpolation"], layout="hwc_bgr"
+                )
+            result = model.predict(pre(frame), verbose=False)[0]
             if getattr(result, "probs", None) is None:
-                return None, 0.0
-            label_idx = int(result.probs.top1)
-            return labels[label_idx], float(result.probs.top1conf)
+                return None
+            return np.asarray(result.probs.data.cpu().numpy(), dtype=np.float32).reshape(-1)
         except Exception as e:
             print("[PiBillHandler] run_inference failed:", e)
+            return None
+
+    def run_inference(self, model, frame, labels):
+        probs = self.inference_probs(model, frame)
+        if probs is None or not len(probs):
             return None, 0.0
+        idx = int(np.argmax(probs))
+        return labels[idx], float(probs[idx])
+
+    def sequential_decision(self, model, labels, frames, bound: float, max_frames: int):
+        """
+        Score successive frames, averaging per-class probabilities, and stop as
+        soon as the mean probability of the leading class reaches `bound` (or at
+        max_frames). A clear bill decides on the first frame; for a marginal one
+        the next frames smooth out a bad grab (glare, slight motion).
+        Returns (label, mean probability, frames_used).
+        """
+        prob_sum, used, scored = None, 0, 0
+        label, posterior = None, 0.0
+        for frame in frames:
+            if used >= max_frames:
+                break
+            probs = self.inference_probs(model, frame)
+            used += 1
+            if probs is None or not len(probs):
+                continue
+            scored += 1
+            prob_sum, idx, posterior = self._accumulate_vote(prob_sum, probs, scored)
+            label = labels[idx]
+            if posterior >= bound:
+                break
+        return label, posterior, used
+
+    @staticmethod
+    def _accumulate_vote(prob_sum, probs, count):
+        """
+        Add one frame's probabilities to the running sum. Returns (prob_sum,
+        leading idx, its mean probability over `count` frames). Frames of a
+        bill sitting still in the slot are not independent evidence, so they
+        are averaged, not multiplied: a steady 0.65 stays 0.65.
+        """
+        probs = np.asarray(probs, dtype=np.float64)
+        prob_sum = probs.copy() if prob_sum is None else prob_sum + probs
+        mean = prob_sum / count
+        idx = int(np.argmax(mean))
+        return prob_sum, idx, float(mean[idx])
 
     def authenticate_bill(self) -> bool:
         print("[PiBillHandler] UV Scan (authenticity)...")
-        frame = self.capture_image()
+        return self.authenticate_frame(self.capture_image(light="uv"))
+
+    def authenticate_frame(self, frame) -> bool:
+        genuine, timing, confidence = self._authenticate(frame)
+        self.last_verify_timing.update(timing)
+        self.last_verify_confidence.update(confidence)
+        return genuine
+
+    def _authenticate(self, frame):
+        """authenticate_frame without touching handler state: (genuine, timing, confidence)."""
         if frame is None:
-            return False
+            return False, {}, {}
+        self.wait_models_ready()
         if not self.uv_model:
             print("[PiBillHandler] UV model missing; assuming real (mock).")
-            return True
-        label, conf = self.run_inference(self.uv_model, frame, self.uv_labels)
-        print(f"[UV] {label} ({conf*100:.1f}%)")
-        return (conf >= 0.8) and (label == "genuine")
+            return True, {}, {}
+        # authenticity stays a single-frame decision against uv_threshold
+        label, conf, used = self.sequential_decision(self.uv_model, self.uv_labels, [frame], self.uv_threshold, 1)
+        print(f"[UV] {label} ({conf*100:.1f}%, {used} frame{'s' if used != 1 else ''})")
+        return (conf >= self.uv_threshold) and (label == "genuine"), {"uv_frames": used}, {"uv": conf}
+
+    def capture_white_frames(self, count: int = 1, stop: Optional[Callable[[], bool]] = None):
+        """
+        White LED on, wait for the brightness to settle, grab `count` successive
+        frames, LED off. `stop()` is checked before the LED goes on and between
+        grabs; once it returns True no further frames are taken.
+        """
+        stop = stop or (lambda: False)
+        if stop():
+            return []
+        with self._light_lock:
+            settled_ts = self._white_on_settled()
+            # the settled frame itself is the first candidate
+            degraded = self.last_verify_timing.get("best_effort_frames", 0)
+            frames = [self.capture_image(after=settled_ts - 1e-6 if settled_ts else None, light="white")]
+            # once the gate had to settle for a best-effort frame, more re-grabs will not do better
+            while len(frames) < count and frames[-1] is not None and not stop() \
+                    and self.last_verify_timing.get("best_effort_frames", 0) == degraded:
+                frames.append(self.capture_image(light="white"))  # next usable frame in the stream
+            self.white_off()
+        return [f for f in frames if f is not None]
+
+    def _white_on_settled(self) -> Optional[float]:
+        """
+        Switch the white LED on and wait until frame brightness stops changing
+        (LED rise + auto-exposure) instead of a fixed delay. Logs the measured
+        settle time and records it as led_settle_s. Returns the settled frame's
+        timestamp, or None if the camera is unavailable.
+        """
+        switched = time.monotonic()
+        self.white_on()
+        if cv2 is None or (not self.camera.is_running and not self.camera.start()):
+            return None  # no frames to watch (and none to capture)
+        ts, _, settle_s = self.camera.wait_settled(
+            switched, timeout_s=self.led_settle_timeout_s, roi=self.roi, min_change=0.05
+        )
+        if settle_s is None:
+            print(f"[PiBillHandler] white LED did not settle within {self.led_settle_timeout_s:.2f}s")
+            self.last_verify_timing["led_settle_s"] = self.led_settle_timeout_s
+        else:
+            print(f"[PiBillHandler] white LED settled in {settle_s * 1000:.0f}ms")
+            self.last_verify_timing["led_settle_s"] = settle_s
+        return ts
+
+    def capture_white_frame(self):
+        frames = self.capture_white_frames(1)
+        return frames[0] if frames else None
 
     def classify_denomination(self) -> Optional[int]:
         print("[PiBillHandler] White-light denomination classification...")
-        self.white_on()
-        time.sleep(0.3)
-        frame = self.capture_image()
-        self.white_off()
-        if frame is None:
-            return None
+        return self.denomination_from_frames(self.capture_white_frames(self.max_vote_frames))
+
+    def denomination_from_frame(self, frame) -> Optional[int]:
+        return self.denomination_from_frames([frame] if frame is not None else [])
+
+    def denomination_from_frames(self, frames) -> Optional[int]:
+        denom, timing, confidence = self._denominate(frames)
+        self.last_verify_timing.update(timing)
+        self.last_verify_confidence.update(confidence)
+        return denom
+
+    def _denominate(self, frames):
+        """denomination_from_frames without touching handler state: (denom, timing, confidence)."""
+        if not frames:
+            return None, {}, {}
+        if self.cascade is not None:
+            # colour cascade first; the CNN only runs when its margin is too small
+            label, margin = self.cascade.classify(crop(frames[0], self.roi))
+            if label is not None and margin >= self.cascade_margin:
+                self.cascade_stats["short_circuit"] += 1
+                print(f"[Denom] {label} (colour cascade, margin {margin:.2f})")
+                return self._label_to_denom(label), {}, {"denom_margin": margin}
+            self.cascade_stats["fallthrough"] += 1
+        self.wait_models_ready()
         if not self.denom_model:
             print("[PiBillHandler] denom model missing; returning default 100 (mock).")
-            return 100
-        label, conf = self.run_inference(self.denom_model, frame, self.denom_labels)
-        if conf < 0.5:
-            return None
-        print(f"[Denom] {label} ({conf*100:.1f}%)")
+            return 100, {}, {}
+        label, conf, used = self.sequential_decision(
+            self.denom_model, self.denom_labels, frames, self.denom_threshold, self.max_vote_frames
+        )
+        if conf < self.denom_threshold:
+            return None, {"denom_frames": used}, {"denom": conf}
+        print(f"[Denom] {label} ({conf*100:.1f}%, {used} frame{'s' if used != 1 else ''})")
+        return self._label_to_denom(label), {"denom_frames": used}, {"denom": conf}
+
+    @staticmethod
+    def _label_to_denom(label) -> Optional[int]:
         try:
             return int(label)
         except Exception:
             digits = ''.join(ch for ch in str(label) if ch.isdigit())
             return int(digits) if digits else None
 
+    def verify_bill(self) -> Tuple[bool, Optional[int], str]:
+        """
+        Parallel verification stage: UV inference starts as soon as the UV frame
+        is grabbed and runs while the white-light frame is taken; both models
+        then run on the worker pool. A fake verdict rejects the bill as soon as
+        it arrives, without waiting for the denomination.
+        Returns (ok, denom, reason) with reason "verified", "bad_frame" (no UV
+        frame from the camera), "fake_bill" or "denom_unknown".
+        """
+        self._scan_frames = {"uv": [], "white": []}
+        result = self._verify_multihead() if self.multihead is not None else self._verify_separate()
+        if self.training_capture is not None and not self.last_verify_timing.get("cache_hit"):
+            self._queue_training_frames(*result)
+        return result
+
+    def _verify_separate(self) -> Tuple[bool, Optional[int], str]:
+        """
+        verify_bill with the UV and denomination models. The pool tasks return
+        their timings and confidences instead of writing them, so an inference
+        abandoned by an early reject cannot change the results of this or the
+        next verification.
+        """
+        started = time.monotonic()
+        timing = {}
+        self.last_verify_timing = timing  # led_settle_s / regrabs are recorded as frames are captured
+        self.last_verify_confidence = {}
+
+        def timed(name, fn, frame):
+            t = time.monotonic()
+            result, times, confidence = fn(frame)
+            return result, dict(times, **{name: time.monotonic() - t}), confidence
+
+        print("[PiBillHandler] UV Scan (authenticity) + white-light classification...")
+        uv_frame = self.capture_image(light="uv")
+        self._scan_frames["uv"] = [uv_frame] if uv_frame is not None else []
+        if uv_frame is None:
+            # nothing usable in the slot: reject without spending a CNN pass
+            timing["wall_s"] = time.monotonic() - started
+            return False, None, "bad_frame"
+        cached = self._cached_verdict(uv_frame, started, lambda: timed("uv_s", self._authenticate, uv_frame))
+        if cached is not None:
+            return cached
+        uv_future = self._infer_pool.submit(timed, "uv_s", self._authenticate, uv_frame)
+
+        def rejected():
+            return uv_future.done() and not uv_future.result()[0]
+
+        # a fake verdict arriving mid-burst stops the white capture
+        white_frames = self.capture_white_frames(self.max_vote_frames, stop=rejected)
+        self._scan_frames["white"] = white_frames
+        timing["capture_s"] = time.monotonic() - started
+
+        denom_future = None
+        if white_frames and not rejected():
+            denom_future = self._infer_pool.submit(timed, "denom_s", self._denominate, white_frames)
+
+        pending = {f for f in (uv_future, denom_future) if f is not None}
+        genuine, denom = None, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result, times, confidence = future.result()
+                timing.update(times)
+                self.last_verify_confidence.update(confidence)
+                if future is uv_future:
+                    genuine = result
+                else:
+                    denom = result
+            if uv_future in done and not genuine:
+                break  # early reject
+        if denom_future is not None and not denom_future.done() and not denom_future.cancel():
+            # already running: its result is dropped; model swaps wait until it has finished
+            self._orphans.add(denom_future)
+            denom_future.add_done_callback(self._orphan_done)
+
+        timing["wall_s"] = time.monotonic() - started
+        print("[PiBillHandler] verification " + ", ".join(
+            f"{k[:-2]} {v * 1000:.0f}ms" if k.endswith("_s") else f"{k} {v}" for k, v in timing.items()
+        ))
+
+        self.last_verify_timing = dict(timing)
+        if not genuine:
+            return False, None, "fake_bill"
+        if denom is None:
+            return False, None, "denom_unknown"
+        self._remember_verdict(denom)
+        return True, denom, "verified"
+
+    def _orphan_done(self, future):
+        self._orphans.discard(future)
+        self._swap_models_if_idle()
+
+    def _verify_multihead(self) -> Tuple[bool, Optional[int], str]:
+        """
+        verify_bill with the fused model: the UV frame and each white frame of
+        the burst go through one forward pass that yields both verdicts. The
+        UV frame is the same in every pass, so authenticity is taken from the
+        first pass only (the single-frame uv_threshold rule). The denomination
+        head votes over the burst as in sequential_decision.
+        """
+        started = time.monotonic()
+        timing = {}
+        self.last_verify_timing = timing
+        self.last_verify_confidence = {}
+        uv_frame = self.capture_image(light="uv")
+        self._scan_frames["uv"] = [uv_frame] if uv_frame is not None else []
+        if uv_frame is None:
+            timing["wall_s"] = time.monotonic() - started
+            return False, None, "bad_frame"
+        cached = self._cached_verdict(uv_frame, started, lambda: self._authenticate_fused(uv_frame))
+        if cached is not None:
+            return cached
+        white_frames = self.capture_white_frames(self.max_vote_frames)
+        self._scan_frames["white"] = white_frames
+        timing["capture_s"] = time.monotonic() - started
+        if not white_frames:
+            timing["wall_s"] = time.monotonic() - started
+            return False, None, "bad_frame"
+
+        t = time.monotonic()
+        uv = crop(uv_frame, self.roi)
+        denom_sum = None
+        auth_label, auth_post, denom_label, denom_post, used = None, 0.0, None, 0.0, 0
+        for white in white_frames:
+            try:
+                auth_probs, denom_probs = self.multihead.predict_probs(uv, crop(white, self.roi))
+            except Exception as e:
+                print("[PiBillHandler] multihead inference failed:", e)
+                break
+            used += 1
+            if used == 1:
+                a = int(np.argmax(auth_probs))
+                auth_label, auth_post = self.multihead.names_auth.get(a, str(a)), float(auth_probs[a])
+                if not (auth_label == "genuine" and auth_post >= self.uv_threshold):
+                    break  # fake or unsure: the denomination does not matter
+            denom_sum, d, denom_post = self._accumulate_vote(denom_sum, denom_probs, used)
+            denom_label = self.multihead.names_denom.get(d, str(d))
+            if denom_post >= self.denom_threshold:
+                break
+        timing["fused_s"] = time.monotonic() - t
+        timing["fused_frames"] = used
+        self.last_verify_confidence.update(uv=auth_post, denom=denom_post)
+        timing["wall_s"] = time.monotonic() - started
+        print(f"[UV] {auth_label} ({auth_post * 100:.1f}%) [Denom] {denom_label} ({denom_post * 100:.1f}%), "
+              f"fused, {used} frame{'s' if used != 1 else ''}")
+        print("[PiBillHandler] verification " + ", ".join(
+            f"{k[:-2]} {v * 1000:.0f}ms" if k.endswith("_s") else f"{k} {v}" for k, v in timing.items()
+        ))
+
+        if not (auth_label == "genuine" and auth_post >= self.uv_threshold):
+            return False, None, "fake_bill"
+        denom = self._label_to_denom(denom_label) if denom_post >= self.denom_threshold else None
+        if denom is None:
+            return False, None, "denom_unknown"
+        self._remember_verdict(denom)
+        return True, denom, "verified"
+
+    def _cached_verdict(self, uv_frame, started: float, authenticate) -> Optional[Tuple[bool, Optional[int], str]]:
+        """
+        Reinserted bill: if a near-identical UV frame verified within the cache
+        TTL, reuse its denomination and skip the white burst and the
+        denomination model. Authenticity is never taken from the cache:
+        authenticate() -> (genuine, timing, confidence) runs on this frame, and
+        genuine None (no verdict possible) falls back to the full path. None on
+        a miss, with the cache disabled, or on that fallback.
+        """
+        self._cache_key = None
+        if self.result_cache is None:
+            return None
+        self._cache_key = self.result_cache.key(crop(uv_frame, self.roi))
+        hit = self.result_cache.get(self._cache_key)
+        if hit is None:
+            return None
+        genuine, times, confidence = authenticate()
+        if genuine is None:
+            return None
+        timing = self.last_verify_timing
+        timing.update(times, cache_hit=1)
+        timing["wall_s"] = time.monotonic() - started
+        self.last_verify_confidence = dict(hit["confidence"], cached=True)
+        self.last_verify_confidence.update(confidence)
+        print(f"[PiBillHandler] reinserted bill: reusing {hit['denom']} verified {hit['age_s']:.1f}s ago "
+              f"({hit['distance']} bits off, cache hit rate {self.result_cache.hit_rate * 100:.0f}%)")
+        print("[PiBillHandler] verification " + ", ".join(
+            f"{k[:-2]} {v * 1000:.0f}ms" if k.endswith("_s") else f"{k} {v}" for k, v in timing.items()
+        ))
+        if not genuine:
+            return False, None, "fake_bill"
+        return True, hit["denom"], "verified"
+
+    def _authenticate_fused(self, uv_frame):
+        """Authenticity alone from the fused model: one white frame, one pass. genuine None if no frame."""
+        t = time.monotonic()
+        white_frames = self.capture_white_frames(1)
+        self._scan_frames["white"] = white_frames
+        if not white_frames:
+            return None, {}, {}
+        try:
+            auth_probs, _ = self.multihead.predict_probs(crop(uv_frame, self.roi), crop(white_frames[0], self.roi))
+        except Exception as e:
+            print("[PiBillHandler] multihead inference failed:", e)
+            return None, {}, {}
+        a = int(np.argmax(auth_probs))
+        label, post = self.multihead.names_auth.get(a, str(a)), float(auth_probs[a])
+        print(f"[UV] {label} ({post * 100:.1f}%), fused")
+        genuine = label == "genuine" and post >= self.uv_threshold
+        return genuine, {"fused_s": time.monotonic() - t, "fused_frames": 1}, {"uv": post}
+
+    def _queue_training_frames(self, ok: bool, denom: Optional[int], reason: str):
+        """Hand this scan's frames to the training capture queue; never blocks."""
+        prediction = {"reason": reason, "denom": denom, "confidence": dict(self.last_verify_confidence)}
+        uv_label = "fake" if reason == "fake_bill" else "genuine" if reason in ("verified", "denom_unknown") else "unknown"
+        white_label = str(denom) if denom is not None else "unknown"
+        for frame in self._scan_frames["uv"]:
+            self.training_capture.submit(frame, "uv", uv_label, prediction)
+        for frame in self._scan_frames["white"][:1]:  # burst frames are near-duplicates; keep the first
+            self.training_capture.submit(frame, "white", white_label, prediction)
+
+    def _remember_verdict(self, denom: int):
+        if self.result_cache is not None and self._cache_key is not None:
+            self.result_cache.put(self._cache_key, {"denom": denom, "confidence": dict(self.last_verify_confidence)})
+
     # -------------------------
     # High-level flows
     # -------------------------
-    def accept_bill(
+    def accept_bill(self, required_denom: int, **kwargs) -> Tuple[bool, Optional[int], str]:
+        """
+        Full accept flow (blocking), see _accept_bill. Model versions staged by
+        the model manager are installed only before or after a transaction,
+        never during one.
+        """
+        with self._txn_lock:
+            self._swap_models_if_idle()
+            try:
+                return self._accept_bill(required_denom, **kwargs)
+            finally:
+                self._swap_models_if_idle()
+
+    def _accept_bill(
         self,
         required_denom: int,
         motor_forward_ms: int = 500,
         motor_reverse_ms: int = 1000,
         push_after_sort_ms: int = 1500,
         wait_for_ir_timeout_s: int = 60,
+        models_timeout_s: float = 60.0,
     ) -> Tuple[bool, Optional[int], str]:
         """Full accept flow (blocking). Uses Arduino SORT for bill acceptance."""
         start = time.time()
@@ -532,18 +1311,19 @@ class PiBillHandler:
         time.sleep(motor_forward_ms / 1000.0)
         self.motor_stop()
 
-        if not self.authenticate_bill():
+        # only blocks if the bill arrived before background model loading finished
+        if not self.wait_models_ready(models_timeout_s):
             self.motor_reverse()
             time.sleep(motor_reverse_ms / 1000.0)
             self.motor_stop()
-            return False, None, "fake_bill"
+            return False, None, "models_not_ready"
 
-        denom = self.classify_denomination()
-        if denom is None:
+        verified, denom, reason = self.verify_bill()
+        if not verified:
             self.motor_reverse()
             time.sleep(motor_reverse_ms / 1000.0)
             self.motor_stop()
-            return False, None, "denom_unknown"
+            return False, None, reason
 
         if denom != required_denom:
             self.motor_reverse()
@@ -561,6 +1341,8 @@ class PiBillHandler:
         # Successfully sorted; push into storage
         self.motor_forward()
         self.storage.add(denom, 1)
+        if self.result_cache is not None and self._cache_key is not None:
+            self.result_cache.discard(self._cache_key)  # in storage now; a look-alike must be verified afresh
         time.sleep(push_after_sort_ms / 1000.0)
         self.motor_stop()
         return True, denom, "accepted"
@@ -613,11 +1395,33 @@ class PiBillHandler:
 
     def cleanup(self):
         try:
-            if self.sorter_serial and hasattr(self.sorter_serial, "close"):
+            if self.sorter_link is not None:
+                self.sorter_link.close()
+            elif self.sorter_serial and hasattr(self.sorter_serial, "close"):
                 self.sorter_serial.close()
         except Exception:
             pass
 
+        if self._owns_camera:
+            try:
+                self.camera.stop()
+            except Exception:
+                pass
+
+        if self.model_manager is not None:
+            self.model_manager.stop()
+        self._infer_pool.shutdown(wait=False)
+        if self.training_capture is not None:
+            self.training_capture.close()
+        if self.inference_client is not None:
+            self.inference_client.close()
+        if self.inference_worker is not None:
+            self.inference_worker.stop()
+        # shared models stay loaded for other handlers; drop our references
+        for model in (self.uv_model, self.denom_model, self.multihead):
+            if model is not None:
+                self.model_registry.release(model)
+
         try:
             self.motor.close()
             self.enable_pin.close()
@@ -0,0 +1,174 @@
+"""
+Bill image preprocessing with a fixed ROI and reused buffers.
+
+The camera sees more than the bill slot. The calibrated ROI is cut out as a
+numpy view, with no copy. The view is then resized straight into a buffer
+that is allocated once. For the ncnn backend, BGR->RGB, HWC->CHW and /255
+happen in a single pass into the float input buffer. Pick a camera
+resolution whose ROI already matches the model input (e.g. 640x480 with a
+480x480 ROI) and the resize disappears too.
+
+Calibration lives in camera_calibration.json:
+
+    {"roi": [80, 0, 480, 480], "camera_width": 640, "camera_height": 480,
+     "interpolation": "area"}
+
+    python -m bill_handler.python.preprocess --roi 80 0 480 480 --camera 640 480
+    python -m bill_handler.python.preprocess --select      # drag the ROI on a live frame
+"""
+
+import json
+import os
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+DEFAULT_CALIBRATION_FILE = "camera_calibration.json"
+DEFAULT_CALIBRATION = {
+    "roi": None, "camera_width": None, "camera_height": None, "interpolation": "linear",
+    "quality": {},  # per-light FrameQualityGate overrides
+}
+
+INTERPOLATIONS = ("nearest", "linear", "area", "cubic")
+
+
+def _cv_interpolation(name: str):
+    return {
+        "nearest": cv2.INTER_NEAREST,
+        "linear": cv2.INTER_LINEAR,
+        "area": cv2.INTER_AREA,
+        "cubic": cv2.INTER_CUBIC,
+    }[name]
+
+
+def load_calibration(path: str = DEFAULT_CALIBRATION_FILE) -> dict:
+    calibration = dict(DEFAULT_CALIBRATION)
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                calibration.update(json.load(f))
+        except Exception as e:
+            print(f"[Preprocess] Error loading {path}: {e}")
+    if calibration["interpolation"] not in INTERPOLATIONS:
+        print(f"[Preprocess] unknown interpolation {calibration['interpolation']!r}; using linear")
+        calibration["interpolation"] = "linear"
+    return calibration
+
+
+def save_calibration(calibration: dict, path: str = DEFAULT_CALIBRATION_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(calibration, f, indent=2)
+    os.replace(tmp, path)
+
+
+def crop(frame, roi: Optional[Sequence[int]]):
+    """ROI (x, y, w, h) as a view into frame, clamped to the frame; no copy."""
+    if roi is None or frame is None:
+        return frame
+    x, y, w, h = (int(v) for v in roi)
+    height, width = frame.shape[:2]
+    x0, y0 = max(0, min(x, width - 1)), max(0, min(y, height - 1))
+    x1, y1 = max(x0 + 1, min(x + w, width)), max(y0 + 1, min(y + h, height))
+    return frame[y0:y1, x0:x1]
+
+
+class Preprocessor:
+    """
+    Resize (+ layout conversion) into buffers allocated once. The returned array
+    is the internal buffer and is overwritten by the next call.
+
+    layout "chw_rgb": float32 (3, H, W), RGB, scaled by `scale` (ncnn input)
+    layout "hwc_bgr": uint8 (H, W, 3), BGR (ultralytics input at model size)
+
+    `out` (chw_rgb only) writes into a caller-owned (3, H, W) float32 buffer,
+    e.g. one half of a stacked 6-channel input.
+    """
+
+    def __init__(self, size: Tuple[int, int] = (480, 480), interpolation: str = "linear",
+                 layout: str = "chw_rgb", scale: float = 1.0 / 255.0, out: Optional[np.ndarray] = None):
+        if layout not in ("chw_rgb", "hwc_bgr"):
+            raise ValueError(f"Unknown layout: {layout}")
+        self.height, self.width = size
+        self.interpolation = interpolation
+        self.layout = layout
+        self.scale = scale
+        self.resampled = 0  # calls that needed a resize (ROI size != model size)
+        self.calls = 0
+        self._resized = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        if out is not None:
+            if layout != "chw_rgb" or out.shape != (3, self.height, self.width) or out.dtype != np.float32:
+                raise ValueError(f"out must be float32 (3, {self.height}, {self.width}) with layout chw_rgb")
+            self.output = out
+        else:
+            self.output = (
+                np.empty((3, self.height, self.width), dtype=np.float32) if layout == "chw_rgb" else self._resized
+            )
+
+    def __call__(self, frame):
+        self.calls += 1
+        return self.convert(self.resize(frame))
+
+    def resize(self, frame):
+        """Frame at model size: the frame itself if it already matches, else the resize buffer."""
+        if frame.shape[0] == self.height and frame.shape[1] == self.width:
+            return frame  # ROI already at model size: no resampling
+        cv2.resize(frame, (self.width, self.height), dst=self._resized,
+                   interpolation=_cv_interpolation(self.interpolation))
+        self.resampled += 1
+        return self._resized
+
+    def convert(self, src):
+        """Model-size BGR frame -> output buffer in the configured layout."""
+        if self.layout == "hwc_bgr":
+            if src is not self._resized:
+                np.copyto(self._resized, src)
+            return self._resized
+
+        # HWC BGR -> CHW RGB and scale, in one pass into the float buffer
+        np.multiply(src.transpose(2, 0, 1)[::-1], self.scale, out=self.output, casting="unsafe")
+        return self.output
+
+
+def _main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write the camera ROI calibration")
+    parser.add_argument("--file", default=DEFAULT_CALIBRATION_FILE)
+    parser.add_argument("--roi", nargs=4, type=int, metavar=("X", "Y", "W", "H"))
+    parser.add_argument("--camera", nargs=2, type=int, metavar=("WIDTH", "HEIGHT"),
+                        help="capture resolution; pick one whose ROI matches the model input")
+    parser.add_argument("--interpolation", choices=INTERPOLATIONS)
+    parser.add_argument("--select", action="store_true", help="select the ROI on a live camera frame")
+    args = parser.parse_args()
+
+    calibration = load_calibration(args.file)
+    if args.camera:
+        calibration["camera_width"], calibration["camera_height"] = args.camera
+    if args.interpolation:
+        calibration["interpolation"] = args.interpolation
+    if args.roi:
+        calibration["roi"] = list(args.roi)
+    if args.select:
+        from .camera_service import CameraService
+        camera = CameraService(0, width=calibration["camera_width"], height=calibration["camera_height"])
+        if not camera.start():
+            raise SystemExit("camera failed to open")
+        _, frame = camera.latest()
+        camera.stop()
+        x, y, w, h = cv2.selectROI("Select bill ROI", frame, showCrosshair=True)
+        cv2.destroyAllWindows()
+        if w and h:
+            calibration["roi"] = [int(x), int(y), int(w), int(h)]
+            calibration["camera_width"], calibration["camera_height"] = frame.shape[1], frame.shape[0]
+    save_calibration(calibration, args.file)
+    print(json.dumps(calibration, indent=2))
+
+
+if __name__ == "__main__":
+    _main()
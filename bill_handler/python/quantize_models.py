@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Build INT8-quantized variants of the ncnn bill classifiers.
+
+Runs ncnn's post-training quantization tools on each fp32 export:
+
+    ncnnoptimize  model.ncnn.param/bin -> fused fp32 graph
+    ncnn2table    calibration images   -> per-layer activation scales (KL)
+    ncnn2int8     fused graph + table  -> int8 param/bin
+
+and writes <name>_int8_ncnn_model/ next to <name>_ncnn_model/ with the same
+file names and metadata.yaml, so NcnnClassifier loads either one unchanged.
+Calibration images should be bill scans taken by the kiosk camera (a few
+hundred, both lights, every denomination); with --roi they are cropped to
+the calibrated bill ROI first, matching what the classifier sees at runtime.
+
+    python bill_handler/python/quantize_models.py --calib-dir scans/ --roi
+    python bill_handler/python/quantize_models.py --calib-dir scans/ --models uv --tools ~/ncnn/build/tools
+
+Compare the result with test_model_variants.py, then select it per model in
+model_config.json ({"uv_variant": "int8", "denom_variant": "fp32"}).
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(SCRIPT_DIR, "..", "..")))
+
+from bill_handler.python.ncnn_classifier import load_metadata, variant_path
+
+MODELS_DIR = os.path.join(SCRIPT_DIR, "..", "models")
+MODELS = {
+    "uv": os.path.join(MODELS_DIR, "uv_cls_v2_ncnn_model"),
+    "denom": os.path.join(MODELS_DIR, "denom-cls-v2_ncnn_model"),
+}
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def find_tool(name, tools_dir=None):
+    candidates = []
+    if tools_dir:
+        candidates += [os.path.join(tools_dir, name), os.path.join(tools_dir, "quantize", name)]
+    found = shutil.which(name)
+    if found:
+        candidates.append(found)
+    for path in candidates:
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    raise SystemExit(f"{name} not found; build ncnn tools and pass --tools <ncnn>/build/tools")
+
+
+def collect_images(calib_dir, roi, workdir):
+    paths = sorted(
+        os.path.join(root, f)
+        for root, _, files in os.walk(calib_dir)
+        for f in files
+        if f.lower().endswith(IMAGE_EXTS)
+    )
+    if not paths:
+        raise SystemExit(f"no calibration images in {calib_dir}")
+    if roi is None:
+        return paths
+
+    import cv2
+    from bill_handler.python.preprocess import crop
+
+    cropped = []
+    for i, path in enumerate(paths):
+        img = cv2.imread(path)
+        if img is None:
+            print("skipping unreadable", path)
+            continue
+        out = os.path.join(workdir, f"calib_{i:05d}.png")
+        cv2.imwrite(out, crop(img, roi))
+        cropped.append(out)
+    return cropped
+
+
+def run(cmd):
+    print("$", " ".join(cmd))
+    subprocess.run(cmd, check=True)
+
+
+def quantize(model_dir, images, tools, method="kl", threads=4):
+    meta = load_metadata(model_dir)
+    h, w = (meta.get("imgsz") or [480, 480])[:2]
+    out_dir = variant_path(model_dir, "int8")
+    os.makedirs(out_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix="ncnn_int8_") as tmp:
+        opt_param, opt_bin = os.path.join(tmp, "opt.param"), os.path.join(tmp, "opt.bin")
+        table = os.path.join(out_dir, "model.table")
+        image_list = os.path.join(tmp, "images.txt")
+        with open(image_list, "w") as f:
+            f.write("\n".join(images) + "\n")
+
+        run([tools["ncnnoptimize"], os.path.join(model_dir, "model.ncnn.param"),
+             os.path.join(model_dir, "model.ncnn.bin"), opt_param, opt_bin, "0"])
+        # same preprocessing as runtime: RGB, scaled to 0..1, model input size
+        run([tools["ncnn2table"], opt_param, opt_bin, image_list, table,
+             "mean=[0,0,0]", "norm=[0.003922,0.003922,0.003922]",
+             f"shape=[{w},{h},3]", "pixel=RGB", f"thread={threads}", f"method={method}"])
+        run([tools["ncnn2int8"], opt_param, opt_bin,
+             os.path.join(out_dir, "model.ncnn.param"), os.path.join(out_dir, "model.ncnn.bin"), table])
+
+    with open(os.path.join(model_dir, "metadata.yaml")) as src, \
+            open(os.path.join(out_dir, "metadata.yaml"), "w") as dst:
+        dst.write(src.read().rstrip("\n") + "\n")
+        dst.write(f"quantization: int8\ncalibration_images: {len(images)}\ncalibration_method: {method}\n")
+    print("wrote", out_dir)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the bill classifiers to INT8 with ncnn tools")
+    parser.add_argument("--calib-dir", required=True, help="folder of calibration images (searched recursively)")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=sorted(MODELS))
+    parser.add_argument("--tools", help="directory holding ncnnoptimize / ncnn2table / ncnn2int8")
+    parser.add_argument("--method", choices=("kl", "aciq", "eq"), default="kl")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--roi", action="store_true", help="crop images to the ROI in camera_calibration.json")
+    parser.add_argument("--calibration-file", default="camera_calibration.json")
+    args = parser.parse_args()
+
+    tools = {name: find_tool(name, args.tools) for name in ("ncnnoptimize", "ncnn2table", "ncnn2int8")}
+    roi = None
+    if args.roi:
+        from bill_handler.python.preprocess import load_calibration
+        roi = load_calibration(args.calibration_file)["roi"]
+        if roi is None:
+            raise SystemExit(f"--roi given but {args.calibration_file} has no roi")
+
+    with tempfile.TemporaryDirectory(prefix="ncnn_calib_") as workdir:
+        images = collect_images(args.calib_dir, roi, workdir)
+        print(f"{len(images)} calibration images")
+        for name in args.models:
+            quantize(MODELS[name], images, tools, method=args.method, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+ResultCache - reuse the verdict for a bill that comes straight back in.
+
+A bill that verifies but is then pushed back (denom_not_required,
+sorter_no_ack) is usually reinserted at once. Without a cache it pays for
+the LED settle, the white burst and both CNN passes again. The cache keys a
+verified result by a perceptual hash of the UV ROI. That hash is a
+difference hash (dHash) of the ROI shrunk to 16x17 grey cells, giving 256
+bits. A reinserted note lands a few pixels off and its hash differs in a
+handful of bits. A different note, or a fake with its different UV
+response, differs in far more. dHash only records which of two cells is
+brighter, so a uniform offset or gain leaves it unchanged. A copy that
+glows evenly under UV would hash like the note it copies. The key therefore
+also carries the absolute UV levels of the ROI (10th/50th/90th percentile per
+channel), and a hit needs those levels within level_tolerance as well.
+Lookups take the nearest entry within max_distance bits that is younger
+than ttl_s.
+
+A hit stands in only for the denomination: the caller still runs UV
+authentication on the new frame.
+
+Only "verified" results are stored. A rejected bill is re-run in full on
+reinsertion, because the customer is retrying. Accepted bills are discarded
+from the cache.
+
+    cache = ResultCache(ttl_s=20.0)
+    key = cache.key(uv_roi)       # CacheKey(bits, levels)
+    hit = cache.get(key)          # None, or the dict given to put()
+    cache.put(key, {"denom": 100, "confidence": {...}})
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+def dhash(frame, size: int = 16) -> int:
+    """Difference hash of a BGR (or grey) frame: size*size bits, each "is this cell brighter than its right neighbour"."""
+    if frame.ndim == 3:
+        gray = frame[..., 0] * np.float32(0.114) + frame[..., 1] * np.float32(0.587) + frame[..., 2] * np.float32(0.299)
+    else:
+        gray = frame.astype(np.float32)
+    h, w = gray.shape
+    # area average onto a size x (size + 1) grid
+    rows = np.linspace(0, h, size + 1).astype(int)[:-1]
+    cols = np.linspace(0, w, size + 2).astype(int)[:-1]
+    cells = np.add.reduceat(np.add.reduceat(gray, rows, axis=0), cols, axis=1)
+    cells /= np.outer(np.diff(np.append(rows, h)), np.diff(np.append(cols, w)))
+    bits = cells[:, 1:] > cells[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def uv_levels(frame) -> Tuple[float, ...]:
+    """10th/50th/90th percentile of each channel: the absolute brightness dHash ignores."""
+    pixels = frame.reshape(-1, frame.shape[2]) if frame.ndim == 3 else frame.reshape(-1, 1)
+    return tuple(float(v) for v in np.percentile(pixels[::7], (10, 50, 90), axis=0).T.ravel())
+
+
+class CacheKey(NamedTuple):
+    bits: int  # dHash
+    levels: Tuple[float, ...]  # uv_levels
+
+
+class ResultCache:
+    def __init__(
+        self,
+        ttl_s: float = 20.0,
+        max_distance: Optional[int] = None,  # bits; defaults to 3/32 of the hash
+        hash_size: int = 16,
+        max_entries: int = 8,
+        level_tolerance: float = 0.1,  # allowed relative change of each UV level (plus 4 grey levels)
+    ):
+        self.ttl_s = ttl_s
+        self.hash_size = hash_size
+        self.max_distance = max_distance if max_distance is not None else hash_size * hash_size * 3 // 32
+        self.level_tolerance = level_tolerance
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, result), oldest first
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0}
+
+    def key(self, frame) -> CacheKey:
+        return CacheKey(dhash(frame, self.hash_size), uv_levels(frame))
+
+    def distance(self, a: CacheKey, b: CacheKey) -> Optional[int]:
+        """Hamming distance of the hashes, or None when the UV levels differ too much to be the same note."""
+        for x, y in zip(a.levels, b.levels):
+            if abs(x - y) > 4.0 + self.level_tolerance * max(x, y):
+                return None
+        return hamming(a.bits, b.bits)
+
+    def _prune(self, now):
+        while self._entries:
+            key, (stored_at, _) = next(iter(self._entries.items()))
+            if now - stored_at <= self.ttl_s:
+                break
+            del self._entries[key]
+            self.stats["expired"] += 1
+
+    def _near(self, a: CacheKey, b: CacheKey) -> bool:
+        d = self.distance(a, b)
+        return d is not None and d <= self.max_distance
+
+    def get(self, key: CacheKey) -> Optional[dict]:
+        """Result stored for the nearest hash within max_distance, or None. Hits carry age_s and distance."""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            best, best_d = None, self.max_distance + 1
+            for k in self._entries:
+                d = self.distance(key, k)
+                if d is not None and d < best_d:
+                    best, best_d = k, d
+            if best is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            stored_at, result = self._entries[best]
+            return dict(result, age_s=now - stored_at, distance=best_d)
+
+    def put(self, key: CacheKey, result: dict):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic(), result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats["stores"] += 1
+
+    def discard(self, key: CacheKey):
+        """Forget every entry near key (the bill went into storage)."""
+        with self._lock:
+            for k in [k for k in self._entries if self._near(key, k)]:
+                del self._entries[k]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
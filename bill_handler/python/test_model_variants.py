@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+# Compare fp32 and quantized variants of the bill classifiers on a folder of scans.
+# Reports per variant: top-1 agreement with fp32, confidence shift on the fp32
+# top-1 class, accuracy (when images sit in folders named after their label,
+# e.g. scans/uv/genuine/*.jpg) and CPU latency.
+#
+#   python bill_handler/python/test_model_variants.py --images scans/uv --model uv
+#   python bill_handler/python/test_model_variants.py --images scans/denom --model denom --variants fp32 int8
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(script_dir, '..', '..')))
+
+from bill_handler.python.ncnn_classifier import NcnnClassifier, variant_path
+from bill_handler.python.preprocess import crop, load_calibration
+
+MODELS = {
+    "uv": os.path.join(script_dir, '..', 'models', 'uv_cls_v2_ncnn_model'),
+    "denom": os.path.join(script_dir, '..', 'models', 'denom-cls-v2_ncnn_model'),
+}
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_images(folder, roi):
+    images = []
+    for root, _, files in os.walk(folder):
+        for f in sorted(files):
+            if not f.lower().endswith(IMAGE_EXTS):
+                continue
+            img = cv2.imread(os.path.join(root, f))
+            if img is None:
+                continue
+            label = os.path.basename(root) if os.path.normpath(root) != os.path.normpath(folder) else None
+            images.append((os.path.join(root, f), label, np.ascontiguousarray(crop(img, roi))))
+    return images
+
+
+def evaluate(classifier, images):
+    preds, times = [], []
+    for _, _, img in images:
+        t = time.perf_counter()
+        probs = classifier.predict_probs(img)
+        times.append(time.perf_counter() - t)
+        preds.append(probs.copy())
+    return preds, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 vs quantized classifier comparison")
+    parser.add_argument("--images", required=True)
+    parser.add_argument("--model", choices=sorted(MODELS), required=True)
+    parser.add_argument("--variants", nargs="+", default=["fp32", "int8"])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--roi", action="store_true", help="crop to the ROI in camera_calibration.json")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    roi = load_calibration()["roi"] if args.roi else None
+    images = load_images(args.images, roi)
+    if not images:
+        print(f"No images found in {args.images}")
+        sys.exit()
+    print(f"{len(images)} images, model {args.model}")
+
+    results = {}
+    for variant in args.variants:
+        path = variant_path(MODELS[args.model], variant)
+        if not os.path.isdir(path):
+            print(f"[{variant}] missing {path} (run quantize_models.py)")
+            continue
+        clf = NcnnClassifier(path, num_threads=args.threads)
+        evaluate(clf, images[:2])  # warm-up
+        preds, times = evaluate(clf, images)
+        results[variant] = (clf.names, preds, times)
+        clf.close()
+
+    if "fp32" not in results:
+        print("fp32 baseline missing; nothing to compare against")
+        sys.exit()
+
+    names, base, _ = results["fp32"]
+    report = {}
+    print("\n" + "=" * 86)
+    print(f"{'variant':<10}{'agree %':>9}{'acc %':>8}{'dconf mean':>12}{'dconf max':>11}{'p50 ms':>9}{'p90 ms':>9}{'mean ms':>9}")
+    for variant, (v_names, preds, times) in results.items():
+        agree, correct, labelled, shifts = 0, 0, 0, []
+        for (_, label, _), p_base, p in zip(images, base, preds):
+            top_base, top = int(np.argmax(p_base)), int(np.argmax(p))
+            agree += top_base == top
+            # confidence shift measured on the class fp32 picked
+            shifts.append(float(p[top_base] - p_base[top_base]))
+            if label is not None:
+                labelled += 1
+                correct += v_names.get(top) == label
+        ms = sorted(t * 1000.0 for t in times)
+        row = {
+            "agreement": agree / len(images),
+            "accuracy": (correct / labelled) if labelled else None,
+            "conf_shift_mean": float(np.mean(shifts)),
+            "conf_shift_max": float(np.max(np.abs(shifts))),
+            "p50_ms": ms[len(ms) // 2],
+            "p90_ms": ms[min(len(ms) - 1, int(len(ms) * 0.9))],
+            "mean_ms": float(np.mean(ms)),
+        }
+        report[variant] = row
+        acc = f"{row['accuracy'] * 100:.1f}" if row["accuracy"] is not None else "-"
+        print(f"{variant:<10}{row['agreement'] * 100:>9.1f}{acc:>8}{row['conf_shift_mean']:>12.4f}"
+              f"{row['conf_shift_max']:>11.4f}{row['p50_ms']:>9.1f}{row['p90_ms']:>9.1f}{row['mean_ms']:>9.1f}")
+    print("=" * 86)
+
+    disagreements = [
+        (path, names.get(int(np.argmax(b))), results[v][0].get(int(np.argmax(p))), v)
+        for v, (_, preds, _) in results.items() if v != "fp32"
+        for (path, _, _), b, p in zip(images, base, preds)
+        if int(np.argmax(b)) != int(np.argmax(p))
+    ]
+    for path, was, now, v in disagreements[:20]:
+        print(f"  [{v}] {os.path.basename(path)}: fp32 {was} -> {now}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"model": args.model, "images": len(images), "variants": report}, f, indent=2)
+        print("wrote", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Train and export the fused UV + white-light bill classifier.
+
+The kiosk runs two YOLO11n-cls networks on the same bill: one on the UV
+capture (genuine/fake) and one on the white-light capture (denomination).
+This model shares a single backbone. Both captures are stacked into a
+6-channel image, white RGB in channels 0-2 and UV RGB in 3-5. Two heads read
+the shared features, so one forward pass gives both verdicts.
+
+Initialisation: the backbone and both heads start from an existing
+classifier (uv_cls_v2.pt by default). The stem conv is widened to 6 input
+channels by repeating its pretrained filters (halved, so activations keep
+their scale). Each head gets a fresh final linear layer sized for its classes.
+
+Paired captures (same bill, same position, both lights):
+
+    pairs/<genuine|fake>/<denom label>/<id>_uv.jpg
+    pairs/<genuine|fake>/<denom label>/<id>_white.jpg
+
+    python bill_handler/python/train_multihead.py train --data pairs/ --epochs 60
+    python bill_handler/python/train_multihead.py export --weights runs/multihead/best.pt
+    python bill_handler/python/benchmark_multihead.py --data pairs_test/
+
+Export writes bill_handler/models/bill_multihead_ncnn_model/ (via pnnx).
+Enable it with {"multihead": true} in model_config.json.
+"""
+
+import argparse
+import copy
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zlib
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(SCRIPT_DIR, "..", "..")))
+
+MODELS_DIR = os.path.join(SCRIPT_DIR, "..", "models")
+DEFAULT_BASE = os.path.join(MODELS_DIR, "uv_cls_v2.pt")
+DEFAULT_EXPORT = os.path.join(MODELS_DIR, "bill_multihead_ncnn_model")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def iter_pairs(root):
+    """(auth label, denom label, uv path, white path) for every complete pair under root."""
+    for auth in sorted(os.listdir(root)):
+        auth_dir = os.path.join(root, auth)
+        if not os.path.isdir(auth_dir):
+            continue
+        for denom in sorted(os.listdir(auth_dir)):
+            denom_dir = os.path.join(auth_dir, denom)
+            if not os.path.isdir(denom_dir):
+                continue
+            files = {f.lower(): f for f in os.listdir(denom_dir) if f.lower().endswith(IMAGE_EXTS)}
+            for lower, f in sorted(files.items()):
+                stem, ext = os.path.splitext(lower)
+                if not stem.endswith("_uv"):
+                    continue
+                white = files.get(stem[:-3] + "_white" + ext)
+                if white:
+                    yield auth, denom, os.path.join(denom_dir, f), os.path.join(denom_dir, white)
+
+
+def load_pair(uv_path, white_path, size, roi=None):
+    """6-channel float32 CHW input, exactly as MultiHeadClassifier builds it at runtime."""
+    import cv2
+    from bill_handler.python.preprocess import Preprocessor, crop
+
+    stacked = np.empty((6, size, size), dtype=np.float32)
+    for path, half in ((white_path, stacked[:3]), (uv_path, stacked[3:])):
+        img = cv2.imread(path)
+        if img is None:
+            raise ValueError(f"unreadable {path}")
+        Preprocessor((size, size), out=half)(np.ascontiguousarray(crop(img, roi)))
+    return stacked
+
+
+# ----- model -----
+def build_model(base_weights, n_auth, n_denom):
+    import torch
+    from torch import nn
+    from ultralytics import YOLO
+
+    layers = YOLO(base_weights).model.model  # classification models are a plain chain
+    backbone, head = layers[:-1], layers[-1]
+
+    class MultiHeadNet(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.backbone = copy.deepcopy(backbone)
+            stem = self.backbone[0].conv
+            wide = nn.Conv2d(6, stem.out_channels, stem.kernel_size, stem.stride, stem.padding,
+                             groups=stem.groups, bias=stem.bias is not None)
+            with torch.no_grad():
+                wide.weight.copy_(torch.cat([stem.weight, stem.weight], dim=1) / 2)
+                if stem.bias is not None:
+                    wide.bias.copy_(stem.bias)
+            self.backbone[0].conv = wide
+            self.auth_head = self._head(n_auth)
+            self.denom_head = self._head(n_denom)
+
+        @staticmethod
+        def _head(n):
+            h = copy.deepcopy(head)
+            h.linear = nn.Linear(h.linear.in_features, n)
+            return h
+
+        @staticmethod
+        def _run_head(h, x):
+            # Classify.forward differs between ultralytics versions; spell it out
+            return h.linear(h.drop(h.pool(h.conv(x)).flatten(1)))
+
+        def forward(self, x):
+            for m in self.backbone:
+                x = m(x)
+            auth, denom = self._run_head(self.auth_head, x), self._run_head(self.denom_head, x)
+            if self.training:
+                return auth, denom
+            return auth.softmax(1), denom.softmax(1)
+
+    return MultiHeadNet()
+
+
+# ----- train -----
+def train(args):
+    import torch
+    from torch.utils.data import DataLoader, Dataset
+
+    from bill_handler.python.preprocess import load_calibration
+
+    roi = load_calibration()["roi"] if args.roi else None
+    pairs = list(iter_pairs(args.data))
+    if not pairs:
+        raise SystemExit(f"no uv/white pairs under {args.data}")
+    auth_names = sorted({p[0] for p in pairs})
+    denom_names = sorted({p[1] for p in pairs})
+    # stable split by file name so re-runs validate on the same bills
+    val = [p for p in pairs if zlib.crc32(os.path.basename(p[2]).encode()) % 10 == 0]
+    val_set = set(val)
+    trn = [p for p in pairs if p not in val_set]
+    print(f"{len(trn)} train / {len(val)} val pairs, auth {auth_names}, denom {denom_names}")
+
+    class Pairs(Dataset):
+        def __init__(self, items, augment):
+            self.items, self.augment = items, augment
+
+        def __len__(self):
+            return len(self.items)
+
+        def __getitem__(self, i):
+            auth, denom, uv, white = self.items[i]
+            x = load_pair(uv, white, args.imgsz, roi)
+            if self.augment:
+                # lighting drift between kiosks and LED ageing: per-light gain, small shift
+                x[:3] *= np.random.uniform(0.8, 1.2)
+                x[3:] *= np.random.uniform(0.7, 1.3)
+                dx, dy = np.random.randint(-12, 13, size=2)
+                x = np.roll(x, (dy, dx), axis=(1, 2))
+                np.clip(x, 0.0, 1.0, out=x)
+            return torch.from_numpy(x), auth_names.index(auth), denom_names.index(denom)
+
+    model = build_model(args.base, len(auth_names), len(denom_names))
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model.to(device)
+    opt = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=5e-4)
+    sched = torch.optim.lr_scheduler.CosineAnnealingLR(opt, args.epochs)
+    loss_fn = torch.nn.CrossEntropyLoss()
+    train_dl = DataLoader(Pairs(trn, True), batch_size=args.batch, shuffle=True, num_workers=args.workers)
+    val_dl = DataLoader(Pairs(val, False), batch_size=args.batch, num_workers=args.workers)
+
+    os.makedirs(args.out, exist_ok=True)
+    best = -1.0
+    for epoch in range(args.epochs):
+        model.train()
+        total = 0.0
+        for x, a, d in train_dl:
+            x, a, d = x.to(device), a.to(device), d.to(device)
+            out_a, out_d = model(x)
+            # authenticity errors are the expensive ones: weight that head up
+            loss = args.auth_weight * loss_fn(out_a, a) + loss_fn(out_d, d)
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+            total += loss.item() * len(x)
+        sched.step()
+
+        model.eval()
+        correct_a = correct_d = n = 0
+        with torch.no_grad():
+            for x, a, d in val_dl:
+                pa, pd = model(x.to(device))
+                correct_a += (pa.argmax(1).cpu() == a).sum().item()
+                correct_d += (pd.argmax(1).cpu() == d).sum().item()
+                n += len(x)
+        acc_a, acc_d = correct_a / max(n, 1), correct_d / max(n, 1)
+        print(f"epoch {epoch + 1}/{args.epochs} loss {total / len(trn):.4f} "
+              f"val auth {acc_a * 100:.1f}% denom {acc_d * 100:.1f}%")
+        checkpoint = {"state_dict": model.state_dict(), "auth_names": auth_names, "denom_names": denom_names,
+                      "imgsz": args.imgsz, "base": args.base}
+        torch.save(checkpoint, os.path.join(args.out, "last.pt"))
+        if min(acc_a, acc_d) > best:
+            best = min(acc_a, acc_d)
+            torch.save(checkpoint, os.path.join(args.out, "best.pt"))
+    print("best val (min of both heads):", f"{best * 100:.1f}%", "->", os.path.join(args.out, "best.pt"))
+
+
+# ----- export -----
+def export(args):
+    import torch
+
+    ckpt = torch.load(args.weights, map_location="cpu")
+    model = build_model(ckpt["base"], len(ckpt["auth_names"]), len(ckpt["denom_names"]))
+    model.load_state_dict(ckpt["state_dict"])
+    model.eval()
+    size = ckpt["imgsz"]
+
+    pnnx = args.pnnx or shutil.which("pnnx")
+    if not pnnx:
+        raise SystemExit("pnnx not found (pip install pnnx, or pass --pnnx)")
+    os.makedirs(args.out, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="multihead_export_") as tmp:
+        traced = os.path.join(tmp, "model.pt")
+        torch.jit.trace(model, torch.zeros(1, 6, size, size)).save(traced)
+        subprocess.run([pnnx, traced, f"inputshape=[1,6,{size},{size}]"], check=True, cwd=tmp)
+        for ext in ("param", "bin"):
+            shutil.copy(os.path.join(tmp, f"model.ncnn.{ext}"), os.path.join(args.out, f"model.ncnn.{ext}"))
+
+    with open(os.path.join(args.out, "metadata.yaml"), "w") as f:
+        f.write("task: multihead\ninput: white_rgb+uv_rgb\n")
+        f.write(f"imgsz:\n- {size}\n- {size}\n")
+        for key, names in (("names_auth", ckpt["auth_names"]), ("names_denom", ckpt["denom_names"])):
+            f.write(f"{key}:\n" + "".join(f"  {i}: {name}\n" for i, name in enumerate(names)))
+    print("wrote", args.out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fused UV + white-light bill classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    t = sub.add_parser("train")
+    t.add_argument("--data", required=True, help="pairs/<genuine|fake>/<denom>/<id>_{uv,white}.jpg")
+    t.add_argument("--base", default=DEFAULT_BASE, help="classifier .pt to initialise from")
+    t.add_argument("--epochs", type=int, default=60)
+    t.add_argument("--batch", type=int, default=16)
+    t.add_argument("--lr", type=float, default=1e-3)
+    t.add_argument("--imgsz", type=int, default=480)
+    t.add_argument("--auth-weight", type=float, default=2.0)
+    t.add_argument("--workers", type=int, default=2)
+    t.add_argument("--roi", action="store_true", help="crop pairs to the ROI in camera_calibration.json")
+    t.add_argument("--out", default=os.path.join("runs", "multihead"))
+
+    e = sub.add_parser("export")
+    e.add_argument("--weights", required=True)
+    e.add_argument("--out", default=DEFAULT_EXPORT)
+    e.add_argument("--pnnx", help="path to the pnnx binary")
+
+    args = parser.parse_args()
+    train(args) if args.command == "train" else export(args)
+
+
+if __name__ == "__main__":
+    main()
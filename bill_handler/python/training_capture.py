@@ -0,0 +1,184 @@
+"""
+TrainingCapture - saves scanned bill frames for retraining, off the transaction path.
+
+Field frames are the best retraining data for denom-cls-v2 / uv_cls_v2. But
+a JPEG encode plus an SD-card write inside accept_bill would add tens of
+milliseconds, and an occasional write stall, to every scan. submit() only
+puts a frame reference and its prediction on a bounded queue. It never
+waits: when the queue is full, or the rate limit is used up, the frame is
+dropped and counted. A background thread encodes and writes the frames:
+
+    <out_dir>/<light>/<predicted label>/<time>_<seq>.jpg
+    <out_dir>/captures.jsonl      one line per image: file, light, prediction
+
+The folders follow the classifier datasets (uv/genuine, white/100, ...).
+Predicted labels are unreviewed: check them before training. When the
+folder grows past quota_mb, the oldest images are deleted first.
+
+Frames from CameraService are never overwritten by the grabber, so they are
+queued by reference without a copy.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".npy")
+
+
+class TrainingCapture:
+    def __init__(
+        self,
+        out_dir: str = "training_capture",
+        max_queue: int = 16,
+        max_per_minute: float = 30.0,  # frames accepted per minute (token bucket, burst of max_queue)
+        quota_mb: float = 2048.0,
+        jpeg_quality: int = 95,
+        encoder: Optional[Callable[[object], bytes]] = None,  # frame -> file bytes; defaults to OpenCV JPEG
+        ext: str = ".jpg",
+    ):
+        self.out_dir = out_dir
+        self.max_per_minute = max_per_minute
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.jpeg_quality = jpeg_quality
+        self.encoder = encoder or self._encode_jpeg
+        self.ext = ext
+        self.stats = {"submitted": 0, "written": 0, "dropped_full": 0, "rate_limited": 0,
+                      "evicted": 0, "errors": 0}
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._tokens = float(max_queue)
+        self._burst = float(max_queue)
+        self._refilled = time.monotonic()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._files = deque()  # (path, size), oldest first
+        self._bytes = 0
+        self.enabled = cv2 is not None or encoder is not None
+        if not self.enabled:
+            print("[TrainingCapture] OpenCV not available; capture disabled")
+            return
+        os.makedirs(out_dir, exist_ok=True)
+        self._scan_existing()
+        self._thread = threading.Thread(target=self._writer, name="TrainingCapture", daemon=True)
+        self._thread.start()
+
+    def _scan_existing(self):
+        """Pick up images from earlier runs so the quota covers them too."""
+        found = []
+        for root, _, files in os.walk(self.out_dir):
+            for f in files:
+                if f.lower().endswith(IMAGE_EXTS):
+                    path = os.path.join(root, f)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(found):
+            self._files.append((path, size))
+            self._bytes += size
+
+    def _take_token(self) -> bool:
+        if self.max_per_minute <= 0:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._refilled) * self.max_per_minute / 60.0)
+        self._refilled = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def submit(self, frame, light: str, label: str, prediction: Optional[dict] = None) -> bool:
+        """Queue one frame (BGR array) without blocking. False if it was dropped."""
+        if not self.enabled or frame is None:
+            return False
+        with self._lock:
+            self.stats["submitted"] += 1
+            if not self._take_token():
+                self.stats["rate_limited"] += 1
+                return False
+            self._seq += 1
+            item = (frame, light, str(label), prediction or {}, time.time(), self._seq)
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped_full"] += 1
+            return False
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                print("[TrainingCapture] write failed:", e)
+
+    def _encode_jpeg(self, frame) -> bytes:
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise RuntimeError("JPEG encode failed")
+        return buf.tobytes()
+
+    def _write(self, frame, light, label, prediction, wall_time, seq):
+        data = self.encoder(frame)
+        folder = os.path.join(self.out_dir, light, label.replace(os.sep, "_"))
+        os.makedirs(folder, exist_ok=True)
+        name = time.strftime("%Y%m%d_%H%M%S", time.localtime(wall_time)) + f"_{seq:05d}{self.ext}"
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.out_dir, "captures.jsonl"), "a") as f:
+            f.write(json.dumps({"file": os.path.relpath(path, self.out_dir), "light": light, "label": label,
+                                "time": wall_time, "prediction": prediction}) + "\n")
+        self._files.append((path, len(data)))
+        self._bytes += len(data)
+        with self._lock:
+            self.stats["written"] += 1
+        self._evict()
+
+    def _evict(self):
+        while self._bytes > self.quota_bytes and len(self._files) > 1:
+            path, size = self._files.popleft()
+            self._bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            with self._lock:
+                self.stats["evicted"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update(queued=self._queue.qsize(), disk_mb=self._bytes / (1024 * 1024))
+        return stats
+
+    def close(self, timeout_s: float = 5.0):
+        """Flush what is queued (up to timeout_s) and stop the writer."""
+        if not self.enabled:
+            return
+        try:
+            self._queue.put(None, timeout=timeout_s)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout_s)
+        stats = self.snapshot()
+        print(f"[TrainingCapture] written {stats['written']}, dropped {stats['dropped_full']} (queue full), "
+              f"{stats['rate_limited']} (rate limit), evicted {stats['evicted']}")
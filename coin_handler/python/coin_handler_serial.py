@@ -5,14 +5,77 @@ import time
 import traceback
 from typing import Callable
 from .coin_storage import CoinStorage
+from .event_bus import DROP_OLDEST, EventBus
+from .serial_capture import INBOUND, OUTBOUND, CaptureWriter
+from .serial_link import BOOT_BAUD, DEFAULT_MAX_BAUD, DEFAULT_READY_TIMEOUT_S, SerialConnection
+from .serial_metrics import DEFAULT_METRICS_FILE, SerialMetrics
+
+# the only topic the overflow policy may drop: each coin event repeats the running total
+COIN_EVENT_DROPPABLE = ("coin",)
+
+class CallbackSession:
+    """Callbacks registered for one transaction/worker; close() (or leaving the with-block) removes them."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._scope = handler.events.scope()
+
+    def add_callback(self, fn):
+        return self._scope.subscribe("coin", fn)
+
+    def add_reached_callback(self, fn):
+        return self._scope.subscribe("reached", fn)
+
+    def add_dispense_callback(self, fn):
+        return self._scope.subscribe("dispense", fn)
+
+    def add_dispense_done_callback(self, fn):
+        return self._scope.subscribe("dispense_done", fn)
+
+    def add_error_callback(self, fn):
+        return self._scope.subscribe("error", fn)
+
+    def close(self):
+        self._scope.close()
+        print("[CoinHandlerSerial] session closed; live subscribers:", self.handler.subscriber_counts())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
 
 class CoinHandlerSerial:
-    def __init__(self):
-        self.port = "/dev/ttyACM0"
-        self.baud = 9600
+    def __init__(
+        self,
+        port="/dev/ttyACM0",
+        baud=BOOT_BAUD,
+        max_baud=DEFAULT_MAX_BAUD,
+        ready_timeout_s=DEFAULT_READY_TIMEOUT_S,
+        suppress_dtr_reset=False,
+        event_queue_size=256,
+        event_overflow=DROP_OLDEST,  # never stall the reader; applies to "coin" events only, see COIN_EVENT_DROPPABLE
+        storage=None,
+        capture_path=None,
+        link=None,
+        metrics_path=DEFAULT_METRICS_FILE,  # None disables the JSON dump
+        metrics_interval_s=60.0,
+    ):
+        self.port = port
+        self.baud = baud          # rate the firmware boots at
+        self.max_baud = max_baud  # upper bound for negotiation (set to baud to disable)
         self.reconnect = True
 
-        self.ser = None
+        # persistent link: READY handshake, baud negotiation, jittered reconnects
+        # (DeviceRegistry passes the link it already opened while probing the board)
+        self.link = link or SerialConnection(
+            port, baud, max_baud,
+            name="CoinHandlerSerial",
+            ready_timeout_s=ready_timeout_s,
+            suppress_dtr_reset=suppress_dtr_reset,
+        )
         self._reader_thread = None
         self._running = False
         self._reader_running = False
@@ -22,11 +85,11 @@ class CoinHandlerSerial:
         self.session_counts = {1: 0, 5: 0, 10: 0, 20: 0}
         self.total_value = 0
 
-        self._callbacks = []  # callbacks: fn(denom, count_for_denom, total_value)
-        self._reached_callbacks = []  # callbacks for when required fee reached: fn(total_value)
-        self._dispense_callbacks = []      # fn(denom, qty)
-        self._dispense_done_callbacks = [] # fn(denom, qty)
-        self._error_callbacks = []         # fn(msg)
+        # Callbacks run on the event bus dispatcher thread, never on the reader thread.
+        # Topics: "coin" fn(denom, count_for_denom, total_value), "reached" fn(total_value),
+        #         "dispense" fn(denom, qty), "dispense_done" fn(denom, qty), "error" fn(msg)
+        self.events = EventBus(name="CoinHandlerSerial.events", maxsize=event_queue_size, overflow=event_overflow,
+                               droppable=COIN_EVENT_DROPPABLE)
         self._reached_emitted = False
         self._reached_emitted = False
         self._lock = threading.Lock()
@@ -34,56 +97,82 @@ class CoinHandlerSerial:
         # Sorting synchronization
         self._sort_event = threading.Event() 
         self._sort_success = False
-        self.storage = CoinStorage()  # will persist to JSON
-        self._reconnect_wait = 1.0  # start backoff
+        self.storage = storage if storage is not None else CoinStorage()  # will persist to JSON
+
+        # optional binary capture of all serial traffic (see serial_capture.py for replay)
+        self.capture = CaptureWriter(capture_path) if capture_path else None
+
+        # per-command latency histograms; snapshot via metrics_snapshot(), optionally dumped to a JSON file
+        self.metrics = SerialMetrics()
+        self.metrics_path = metrics_path
+        if metrics_path:
+            self.metrics.start_periodic_dump(metrics_path, metrics_interval_s)
 
+    @property
+    def ser(self):
+        return self.link.ser
+
+    @property
+    def active_baud(self):
+        return self.link.active_baud
+
+    # add_* return a Subscription; call .cancel() (or use session()) when done,
+    # otherwise the callback keeps firing for every later transaction.
     def add_callback(self, fn: Callable[[int, int, int], None]):
-        self._callbacks.append(fn)
+        return self.events.subscribe("coin", fn)
 
     def add_reached_callback(self, fn):
         """Register a callback called once when required fee is reached. fn(total_value)"""
-        self._reached_callbacks.append(fn)
+        return self.events.subscribe("reached", fn)
 
     def add_dispense_callback(self, fn):
-        self._dispense_callbacks.append(fn)
+        return self.events.subscribe("dispense", fn)
 
     def add_dispense_done_callback(self, fn):
-        self._dispense_done_callbacks.append(fn)
+        return self.events.subscribe("dispense_done", fn)
 
     def add_error_callback(self, fn):
-        self._error_callbacks.append(fn)
+        return self.events.subscribe("error", fn)
+
+    def session(self):
+        """
+        Session-scoped callbacks, removed automatically when the session ends:
+
+            with handler.session() as s:
+                s.add_callback(on_coin)
+                ...
+        """
+        return CallbackSession(self)
+
+    def subscriber_counts(self):
+        """Live callbacks per event topic (debug: should return to baseline after each session)."""
+        return self.events.subscriber_count()
+
+    def event_stats(self):
+        """Queue depth, drops and per-subscriber lag (ms) of the callback dispatcher."""
+        return self.events.stats()
 
     # ----- Serial open/close/reconnect -----
     def open(self):
-        if self.ser and self.ser.is_open:
-            return True
-
-        try:
-            self.ser = serial.Serial(self.port, self.baud, timeout=1)
-            # give Arduino time to reset on open
-            time.sleep(2.0)
-            print(f"[CoinHandlerSerial] Opened {self.port}@{self.baud}")
-            self._reconnect_wait = 1.0
-            return True
-        except Exception as e:
-            print("[CoinHandlerSerial] open error:", e)
-            self.ser = None
-            return False
+        """Open the port once and keep it; a no-op while the link is up."""
+        return self.link.open()
 
     def close(self):
         """Internal close (or force close)."""
-        try:
-            if self.ser and self.ser.is_open:
-                self.ser.close()
-            self.ser = None
-        except Exception as e:
-            print("[CoinHandlerSerial] close error:", e)
-            
+        self.link.close()
+
     def shutdown(self):
         """Explicitly stop everything and close the port."""
         self._running = False
         self._reader_running = False
         self.close()
+        reader = self._reader_thread
+        if reader is not None and reader is not threading.current_thread():
+            reader.join(timeout=2.0)
+        self.events.stop()
+        if self.capture:
+            self.capture.close()
+        self.metrics.stop(self.metrics_path)
 
     # ----- Control functions -----
     def start_accepting(self, required_amount):
@@ -99,11 +188,7 @@ class CoinHandlerSerial:
         else:
             # send enable immediately if serial is open
             self._send_command("ENABLE_COIN")
-        # start reader
-        if not self._reader_thread or not self._reader_thread.is_alive():
-            self._reader_running = True
-            self._reader_thread = threading.Thread(target=self._reader_loop, args=(required_amount,), daemon=True)
-            self._reader_thread.start()
+        self.ensure_reader(required_amount)
 
     def stop_accepting(self):
         """Send DISABLE_COIN and stop reader loop logic (but keep port open)."""
@@ -137,11 +222,7 @@ class CoinHandlerSerial:
             if not self.open():
                 print("[CoinHandlerSerial] dispense failed: port not open")
                 return
-            # start reader if not running
-            if not self._reader_thread or not self._reader_thread.is_alive():
-                self._reader_running = True
-                self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
-                self._reader_thread.start()
+        self.ensure_reader()
 
         cmd = f"DISPENSE:{denom}:{qty}"
         self._send_command(cmd)
@@ -158,10 +239,7 @@ class CoinHandlerSerial:
                 return False
 
         # Ensure reader is running (crucial since we might have stopped it or init didn't start it)
-        if not self._reader_thread or not self._reader_thread.is_alive():
-            self._reader_running = True
-            self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
-            self._reader_thread.start()
+        self.ensure_reader()
 
         self._sort_event.clear()
         self._sort_success = False
@@ -174,6 +252,7 @@ class CoinHandlerSerial:
             return self._sort_success
         else:
             print(f"[CoinHandlerSerial] Sort timed out for denom {denom}")
+            self.metrics.timeout("SORT", denom)
             return False
 
 
@@ -186,30 +265,50 @@ class CoinHandlerSerial:
             self._handle_coin(denom=d)
             time.sleep(interval)
 
+    def metrics_snapshot(self):
+        """Latency histograms, timeouts and ERR counts per command and denomination."""
+        return self.metrics.snapshot()
+
+    def ensure_reader(self, required_amount=0):
+        """Start the reader thread unless one is already running."""
+        if not self._reader_thread or not self._reader_thread.is_alive():
+            self._reader_running = True
+            self._reader_thread = threading.Thread(target=self._reader_loop, args=(required_amount,), daemon=True)
+            self._reader_thread.start()
+
     # ----- internal utils -----
     def _send_command(self, cmd: str):
         try:
-            if self.ser and self.ser.is_open:
-                self.ser.write((cmd + "\n").encode("utf-8"))
+            if self.link.is_open:
+                self.link.write_line(cmd)
+                if self.capture:
+                    self.capture.record(OUTBOUND, cmd)
+                self._track_command(cmd)
                 print("[RPi -> ARDUINO]", cmd)
             else:
                 print("[CoinHandlerSerial] _send_command failed; serial not open:", cmd)
         except Exception as e:
             print("[CoinHandlerSerial] write error:", e)
 
+    def _track_command(self, cmd: str):
+        """Open a pending latency entry for commands the firmware answers."""
+        parts = cmd.split(":")
+        tag = parts[0].upper()
+        try:
+            if tag == "SORT" and len(parts) >= 2:
+                self.metrics.begin("SORT", int(parts[1]))
+            elif tag == "DISPENSE" and len(parts) >= 3:
+                self.metrics.begin("DISPENSE_ACK", int(parts[1]))
+            elif tag in ("ENABLE_COIN", "DISABLE_COIN"):
+                self.metrics.begin(tag)
+        except ValueError:
+            pass
+
     def _reconnect_loop(self):
-        """Try to open serial repeatedly with backoff while _running is True."""
-        while self._running:
-            ok = self.open()
-            if ok:
-                # send enable when reconnected
-                time.sleep(0.5)
-                self._send_command("ENABLE_COIN")
-                break
-            else:
-                print(f"[CoinHandlerSerial] reconnect failed, retrying in {self._reconnect_wait:.1f}s")
-                time.sleep(self._reconnect_wait)
-                self._reconnect_wait = min(self._reconnect_wait * 1.5, 10.0)
+        """Try to open serial repeatedly with jittered backoff while _running is True."""
+        if self.link.reconnect(lambda: self._running):
+            # send enable when reconnected (READY handshake already waited for the board)
+            self._send_command("ENABLE_COIN")
 
     def _reader_loop(self, required_amount=0):
         """Continuously read lines and parse them."""
@@ -220,13 +319,15 @@ class CoinHandlerSerial:
                     time.sleep(0.2)
                     continue
 
-                raw = self.ser.readline()
+                raw = self.link.readline()
                 if not raw:
                     continue
                 line = raw.decode('utf-8', errors='ignore').strip()
                 if not line:
                     continue
 
+                if self.capture:
+                    self.capture.record(INBOUND, line)
                 print("[ARDUINO]", line)
                 self._parse_line(line, required_amount)
 
@@ -235,7 +336,12 @@ class CoinHandlerSerial:
                     break  # Exit gracefully if stopped
                 print("[CoinHandlerSerial] reader exception:", e)
                 traceback.print_exc()
-                time.sleep(0.5)
+                if isinstance(e, serial.SerialException) and self.reconnect:
+                    # board unplugged or reset: reopen instead of spinning on a dead handle
+                    if self.link.reconnect(lambda: self._reader_running) and self._running:
+                        self._send_command("ENABLE_COIN")
+                else:
+                    time.sleep(0.5)
         print("[CoinHandlerSerial] reader stopped")
 
 
@@ -274,12 +380,15 @@ class CoinHandlerSerial:
                     denom = int(parts[2])
                     qty = int(parts[3])
                     print(f"[CoinHandlerSerial] ACK -> DISPENSE {denom} x{qty}")
-                    for cb in self._dispense_callbacks:
-                        cb(denom, qty)
+                    if self.metrics.complete("DISPENSE_ACK", denom) is not None:
+                        self.metrics.begin("DISPENSE_DONE", denom)
+                    self.events.publish("dispense", denom, qty)
                 except Exception as e:
                     print("[CoinHandlerSerial] bad ACK DISPENSE:", e)
             else:
                 print("[CoinHandlerSerial] ACK ->", ":".join(parts[1:]))
+                if len(parts) >= 2:
+                    self.metrics.complete(parts[1].upper())
 
         elif tag == "SORT_DONE" and len(parts) >= 2:
             print("[CoinHandlerSerial] SORT_DONE ->", parts[1])
@@ -288,24 +397,24 @@ class CoinHandlerSerial:
             try:
                 denom = int(parts[1])
                 qty = int(parts[2])
+                self.metrics.complete("DISPENSE_DONE", denom)
                 # Deduct from coin storage
                 actual = self.storage.deduct(denom, qty)
                 print(f"[CoinHandlerSerial] DISPENSE_DONE -> {denom} x{actual}")
-                for cb in self._dispense_done_callbacks:
-                    cb(denom, actual)
+                self.events.publish("dispense_done", denom, actual)
             except Exception as e:
                 print("[CoinHandlerSerial] bad DISPENSE_DONE:", e)
 
         elif tag == "ERR":
             msg = ":".join(parts[1:])
             print("[CoinHandlerSerial] ERR from arduino:", msg)
+            self.metrics.error(msg)
             # Check if it relates to sorting
             if self._sort_event is not None and not self._sort_event.is_set():
                 self._sort_success = False
                 self._sort_event.set()
-                
-            for cb in self._error_callbacks:
-                cb(msg)
+
+            self.events.publish("error", msg)
 
         elif "HOMING" in tag or "READY" in tag:
             print(f"[CoinHandlerSerial] System Status: {line}")
@@ -315,11 +424,13 @@ class CoinHandlerSerial:
             # Sorter success indicator
             print(f"[CoinHandlerSerial] Sorter msg: {line}")
             if "[OK]" in line or line.endswith("OK"):
+                 self.metrics.complete("SORT")
                  self._sort_success = True
                  self._sort_event.set()
 
         elif "Error" in line:
             print(f"[CoinHandlerSerial] Sorter Error: {line}")
+            self.metrics.error(line, command="SORT")
             if self._sort_event is not None and not self._sort_event.is_set():
                 self._sort_success = False
                 self._sort_event.set()
@@ -338,31 +449,30 @@ class CoinHandlerSerial:
             # increment session counters and total
             self.session_counts[denom] += 1
             self.total_value += denom
+            count, total = self.session_counts[denom], self.total_value
 
             # Persist to coin storage (machine's stock increases when user inserts coin)
             new_storage_count = self.storage.add(denom, 1)
 
-            # Notify callbacks (denom, count_for_denom_in_session, total_value)
-            for cb in self._callbacks:
-                try:
-                    cb(denom, self.session_counts[denom], self.total_value)
-                except Exception as e:
-                    print("[CoinHandlerSerial] callback error:", e)
-
-            if required_amount > 0 and self.total_value >= required_amount and not self._reached_emitted:
+            reached = required_amount > 0 and total >= required_amount and not self._reached_emitted
+            if reached:
                 self._reached_emitted = True
-                print("[CoinHandlerSerial] required fee reached; sending DISABLE_COIN")
-
-                # notify reached-callbacks (UI or worker can use this to proceed)
-                for rcb in self._reached_callbacks:
-                    try:
-                        rcb(self.total_value)
-                    except Exception as e:
-                        print("[CoinHandlerSerial] reached-callback error:", e)
-
-                # send disable command to arduino (handler will still listen for ACKs)
-                self._send_command("DISABLE_COIN")
-                # Keep running to catch ACKs and additional messages until controller stops the handler.
+
+        # Notify callbacks (denom, count_for_denom_in_session, total_value) outside the lock;
+        # the dispatcher thread runs them so a slow UI never stalls the reader. Every coin event
+        # carries the running total, so a dropped one never leaves the UI with a wrong sum;
+        # "reached", "dispense_done" and "error" have no such successor and are never dropped.
+        self.events.publish("coin", denom, count, total)
+
+        if reached:
+            print("[CoinHandlerSerial] required fee reached; sending DISABLE_COIN")
+
+            # notify reached-callbacks (UI or worker can use this to proceed)
+            self.events.publish("reached", total)
+
+            # send disable command to arduino (handler will still listen for ACKs)
+            self._send_command("DISABLE_COIN")
+            # Keep running to catch ACKs and additional messages until controller stops the handler.
 
     def _map_pulses_to_denom(self, pulses):
         mapping = {1: 1, 5: 5, 10: 10, 20: 20}
@@ -0,0 +1,194 @@
+# device_registry.py
+"""
+Registry of the Arduino boards attached to the Pi.
+
+Boards are identified either by USB serial number (devices.json maps serial
+number -> role, no probing needed) or by asking the firmware ID? during a
+probe. Each board gets its own SerialConnection, and commands are routed by
+capability, so a separate coin module and bill sorter run on independent
+links instead of contending on /dev/ttyACM0.
+
+    registry = DeviceRegistry()
+    registry.discover()
+    coin_handler = registry.coin_handler()
+    bill_handler = PiBillHandler(**registry.bill_handler_kwargs(coin_handler))
+"""
+import json
+import os
+
+from .coin_handler_serial import CoinHandlerSerial
+from .serial_link import BOOT_BAUD, DEFAULT_MAX_BAUD, DEFAULT_READY_TIMEOUT_S, SerialConnection, query_device_id
+
+DEFAULT_DEVICES_FILE = "devices.json"
+DEFAULT_PORT = "/dev/ttyACM0"
+DEFAULT_PROBE_TIMEOUT_S = 1.0  # READY wait and ID? reply budget per probed port
+
+# What each known firmware can do (used when a board is matched by USB serial only)
+ROLE_CAPABILITIES = {
+    "coin_module": ["COIN", "DISPENSE"],
+    "bill_sorter": ["SORT", "HOME"],
+    "merged_handler": ["COIN", "DISPENSE", "SORT", "HOME", "PREP_DISPENSE"],
+}
+
+# Command prefix -> capability needed to execute it
+COMMAND_CAPABILITIES = {
+    "ENABLE_COIN": "COIN",
+    "DISABLE_COIN": "COIN",
+    "DISPENSE": "DISPENSE",
+    "SORT": "SORT",
+    "HOME": "HOME",
+    "PREP_DISPENSE": "PREP_DISPENSE",
+    "FINISH_DISPENSE": "PREP_DISPENSE",
+}
+
+
+class Device:
+    def __init__(self, port, role, capabilities, serial_number=None, link=None):
+        self.port = port
+        self.role = role
+        self.capabilities = list(capabilities)
+        self.serial_number = serial_number
+        self.link = link  # open SerialConnection when discovered by probing
+
+    def __repr__(self):
+        return f"Device({self.role} @ {self.port}, caps={self.capabilities})"
+
+
+class DeviceRegistry:
+    def __init__(self, devices_file=DEFAULT_DEVICES_FILE, port_patterns=("ttyACM", "ttyUSB"),
+                 probe_timeout_s=DEFAULT_PROBE_TIMEOUT_S):
+        self.devices_file = devices_file
+        self.port_patterns = port_patterns
+        self.probe_timeout_s = probe_timeout_s
+        self.devices = []
+        self.known_serials = {}  # USB serial number -> role
+        self._coin_handler = None
+        if os.path.exists(self.devices_file):
+            try:
+                with open(self.devices_file, "r") as f:
+                    self.known_serials = {str(k): str(v) for k, v in json.load(f).items()}
+            except Exception as e:
+                print(f"[DeviceRegistry] Error loading {self.devices_file}: {e}")
+
+    # ----- discovery -----
+    def _candidate_ports(self):
+        try:
+            from serial.tools import list_ports
+            return [
+                (info.device, info.serial_number)
+                for info in list_ports.comports()
+                if any(p in info.device for p in self.port_patterns)
+            ]
+        except Exception as e:
+            print("[DeviceRegistry] port enumeration failed:", e)
+            return []
+
+    def discover(self, ports=None, probe=True):
+        """
+        Identify every attached board. `ports` overrides enumeration (list of paths).
+        Boards listed in devices.json are matched by USB serial; others are probed
+        with ID? (the probe link stays open and is reused by the handlers). A port
+        that neither prints READY nor answers ID? is not one of our boards and is
+        left alone.
+        """
+        candidates = [(p, None) for p in ports] if ports is not None else self._candidate_ports()
+        self.devices = []
+        for port, serial_number in candidates:
+            role = self.known_serials.get(serial_number) if serial_number else None
+            if role:
+                self.devices.append(Device(port, role, ROLE_CAPABILITIES.get(role, []), serial_number))
+                continue
+            if not probe:
+                continue
+            device = self._probe(port, serial_number)
+            if device:
+                self.devices.append(device)
+
+        for device in self.devices:
+            print(f"[DeviceRegistry] {device}")
+        if not self.devices:
+            print(f"[DeviceRegistry] no boards identified; falling back to {DEFAULT_PORT}")
+        return self.devices
+
+    def _probe(self, port, serial_number):
+        # short READY wait and no baud negotiation until the board has answered, so a port
+        # that stays silent costs about 3 x probe_timeout_s instead of 8 s or more
+        link = SerialConnection(port, max_baud=BOOT_BAUD, name=f"probe:{port}", ready_timeout_s=self.probe_timeout_s)
+        if not link.open():
+            return None
+        ready = link.open_trace[-1]["ready"]
+        read_timeout, link.ser.timeout = link.ser.timeout, 0.1  # keep each ID? wait within its budget
+        try:
+            role, caps = query_device_id(link.ser, self.probe_timeout_s)
+            if role is None and not ready:
+                # no READY banner yet: ID? may have gone out while the board was still booting
+                role, caps = query_device_id(link.ser, self.probe_timeout_s)
+        except Exception as e:
+            print(f"[DeviceRegistry] ID? on {port} failed: {e}")
+            role, caps = None, []
+        finally:
+            link.ser.timeout = read_timeout
+        if role is None and not ready:
+            # silent: a GPS, modem or unrelated adapter must not be handed COIN/DISPENSE/SORT routes
+            print(f"[DeviceRegistry] {port}: no READY and no ID? reply; skipping")
+            link.close()
+            return None
+        if role is None:
+            # booted with READY but firmware predates ID?: it can only be the legacy merged handler
+            role, caps = "merged_handler", ROLE_CAPABILITIES["merged_handler"]
+        link.name = role
+        # the short probe wait was for discovery only; reconnects must wait out a full DTR reboot
+        link.ready_timeout_s = DEFAULT_READY_TIMEOUT_S
+        try:
+            link.upgrade_baud(DEFAULT_MAX_BAUD)
+        except Exception as e:
+            print(f"[DeviceRegistry] baud negotiation on {port} failed, staying at {link.active_baud}: {e}")
+        return Device(port, role, caps or ROLE_CAPABILITIES.get(role, []), serial_number, link)
+
+    # ----- routing -----
+    def device_for(self, capability):
+        capability = capability.upper()
+        # prefer a dedicated board over the merged one so load is split across links
+        matches = [d for d in self.devices if capability in d.capabilities]
+        matches.sort(key=lambda d: len(d.capabilities))
+        return matches[0] if matches else None
+
+    def route(self, command):
+        """Device that should receive `command` (e.g. "SORT:100"), or None."""
+        capability = COMMAND_CAPABILITIES.get(command.split(":", 1)[0].upper())
+        return self.device_for(capability) if capability else None
+
+    def port_for(self, capability, default=DEFAULT_PORT):
+        device = self.device_for(capability)
+        return device.port if device else default
+
+    # ----- handler wiring -----
+    def coin_handler(self, **kwargs):
+        """CoinHandlerSerial bound to the board that accepts coins (cached)."""
+        if self._coin_handler is None:
+            device = self.device_for("COIN")
+            if device is None:
+                self._coin_handler = CoinHandlerSerial(**kwargs)
+            else:
+                self._coin_handler = CoinHandlerSerial(port=device.port, link=device.link, **kwargs)
+        return self._coin_handler
+
+    def bill_handler_kwargs(self, coin_handler=None):
+        """
+        PiBillHandler arguments for sorting: its own link when the sorter is a
+        separate board, otherwise share the coin handler's link (legacy wiring).
+        """
+        sorter = self.device_for("SORT")
+        coin = self.device_for("COIN")
+        if sorter is not None and sorter is not coin:
+            return {"sorter_serial_port": sorter.port, "sorter_link": sorter.link}
+        return {"serial_manager": coin_handler or self.coin_handler()}
+
+    def close(self):
+        """Shut the coin handler down (event bus dispatcher, metrics dump thread) and close every link."""
+        if self._coin_handler is not None:
+            self._coin_handler.shutdown()
+            self._coin_handler = None
+        for device in self.devices:
+            if device.link:
+                device.link.close()
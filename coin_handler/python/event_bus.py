@@ -0,0 +1,290 @@
+# event_bus.py
+"""
+Bounded event bus: the serial reader thread publishes, a dispatcher thread
+runs the subscribers. A slow subscriber (Qt signal emission, terminal prints)
+therefore delays other subscribers, never the reading of the next serial line.
+
+Overflow policies when the queue is full:
+  BLOCK        wait up to block_timeout_s for room, then drop the new event
+  DROP_OLDEST  discard the oldest queued event to make room
+  DROP_NEWEST  discard the event being published
+The policy applies only to the topics in `droppable` (all topics when None).
+Any other topic is a control event that nothing later would make up for: it
+is never dropped and never waits. It takes the place of the oldest
+droppable event, or goes in over maxsize if there is none. Every dropped
+event is counted in stats()["dropped"].
+
+Subscriber statistics are keyed by the callback's qualified name, so the
+callbacks of successive sessions share one entry instead of adding one per
+session.
+
+subscribe() returns a Subscription token; cancel it (or use it / a
+SubscriptionScope as a context manager) when the owner goes away, otherwise
+handlers from finished sessions keep receiving events.
+"""
+import threading
+import time
+import traceback
+from collections import deque
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+
+def _subscriber_name(fn):
+    """Stable across instances and sessions (no ids), so the stats table stays bounded."""
+    return getattr(fn, "__qualname__", None) or type(fn).__qualname__
+
+
+class Subscription:
+    """Handle for one registered callback. Cancelling is idempotent."""
+
+    def __init__(self, bus, topic, fn):
+        self.bus = bus
+        self.topic = topic
+        self.fn = fn
+        self.active = True
+
+    def cancel(self):
+        if not self.active:
+            return False
+        self.active = False
+        return self.bus._remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cancel()
+        return False
+
+
+class SubscriptionScope:
+    """
+    Groups subscriptions that belong to one session (a transaction, a worker).
+    close() first lets already-queued events reach them, then cancels them all.
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+        self._subs = []
+
+    def subscribe(self, topic, fn):
+        sub = self.bus.subscribe(topic, fn)
+        self._subs.append(sub)
+        return sub
+
+    def close(self, flush_timeout_s=1.0):
+        if not self._subs:
+            return
+        self.bus.flush(flush_timeout_s)
+        for sub in self._subs:
+            sub.cancel()
+        self._subs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class _SubscriberStats:
+    __slots__ = ("calls", "errors", "lag_total_s", "lag_max_s", "run_total_s", "run_max_s")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.lag_total_s = 0.0
+        self.lag_max_s = 0.0
+        self.run_total_s = 0.0
+        self.run_max_s = 0.0
+
+    def as_dict(self):
+        calls = max(self.calls, 1)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "lag_avg_ms": self.lag_total_s / calls * 1000.0,
+            "lag_max_ms": self.lag_max_s * 1000.0,
+            "run_avg_ms": self.run_total_s / calls * 1000.0,
+            "run_max_ms": self.run_max_s * 1000.0,
+        }
+
+
+class EventBus:
+    def __init__(self, name="EventBus", maxsize=256, overflow=BLOCK, block_timeout_s=1.0, droppable=None):
+        if overflow not in (BLOCK, DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.name = name
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.block_timeout_s = block_timeout_s
+        self.droppable = frozenset(droppable) if droppable is not None else None  # None: every topic
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._subscribers = {}  # topic -> list of Subscription
+        self._stats = {}        # subscriber name -> _SubscriberStats
+        self._sub_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self._busy = False  # dispatcher is inside subscriber callbacks
+
+        self.published = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    # ----- subscriptions -----
+    def subscribe(self, topic, fn):
+        sub = Subscription(self, topic, fn)
+        with self._sub_lock:
+            # copy-on-write so the dispatcher can iterate without holding the lock
+            self._subscribers[topic] = self._subscribers.get(topic, []) + [sub]
+        return sub
+
+    def scope(self):
+        return SubscriptionScope(self)
+
+    def _remove(self, sub):
+        with self._sub_lock:
+            current = self._subscribers.get(sub.topic, [])
+            remaining = [s for s in current if s is not sub]
+            if len(remaining) == len(current):
+                return False
+            self._subscribers[sub.topic] = remaining
+            return True
+
+    def subscriber_count(self, topic=None):
+        with self._sub_lock:
+            if topic is not None:
+                return len(self._subscribers.get(topic, []))
+            return {t: len(subs) for t, subs in self._subscribers.items() if subs}
+
+    # ----- publishing (reader thread) -----
+    def _is_droppable(self, topic):
+        return self.droppable is None or topic in self.droppable
+
+    def _drop_oldest_droppable(self):
+        """Remove the oldest queued event the policy may drop. False if every queued event is a control event."""
+        for queued in self._queue:
+            if self._is_droppable(queued[0]):
+                self._queue.remove(queued)
+                self.dropped += 1
+                print(f"[{self.name}] queue full; dropped oldest {queued[0]} event")
+                return True
+        return False
+
+    def publish(self, topic, *args):
+        """Enqueue an event. Returns False if the overflow policy dropped it."""
+        self._ensure_dispatcher()
+        event = (topic, args, time.monotonic())
+        with self._cond:
+            if len(self._queue) >= self.maxsize:
+                if not self._is_droppable(topic):
+                    self._drop_oldest_droppable()  # else the control event goes in over maxsize
+                elif self.overflow == DROP_OLDEST:
+                    if not self._drop_oldest_droppable():
+                        self.dropped += 1
+                        print(f"[{self.name}] queue full of control events; dropped {topic} event")
+                        return False
+                elif self.overflow == DROP_NEWEST:
+                    self.dropped += 1
+                    print(f"[{self.name}] queue full; dropped {topic} event")
+                    return False
+                else:
+                    deadline = time.monotonic() + self.block_timeout_s
+                    while len(self._queue) >= self.maxsize:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.dropped += 1
+                            print(f"[{self.name}] queue full for {self.block_timeout_s:.1f}s; dropped {topic} event")
+                            return False
+                        self._cond.wait(remaining)
+            self._queue.append(event)
+            self.published += 1
+            self.high_water = max(self.high_water, len(self._queue))
+            self._cond.notify_all()
+        return True
+
+    # ----- dispatcher -----
+    def _ensure_dispatcher(self):
+        with self._cond:
+            if self._running and self._thread and self._thread.is_alive():
+                return
+            self._running = True
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._dispatch_loop, name=f"{self.name}-dispatch", daemon=True)
+                self._thread.start()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait(0.5)
+                if not self._running and not self._queue:
+                    return
+                topic, args, published_at = self._queue.popleft()
+                self._busy = True
+                self._cond.notify_all()  # wake a publisher blocked on a full queue
+
+            with self._sub_lock:
+                subs = self._subscribers.get(topic, [])
+            for sub in subs:
+                if not sub.active:
+                    continue  # cancelled after this event was picked up
+                started = time.monotonic()
+                stats = self._stats.setdefault(_subscriber_name(sub.fn), _SubscriberStats())
+                lag = started - published_at
+                try:
+                    sub.fn(*args)
+                except Exception as e:
+                    stats.errors += 1
+                    print(f"[{self.name}] {topic} subscriber error:", e)
+                    traceback.print_exc()
+                run = time.monotonic() - started
+                stats.calls += 1
+                stats.lag_total_s += lag
+                stats.lag_max_s = max(stats.lag_max_s, lag)
+                stats.run_total_s += run
+                stats.run_max_s = max(stats.run_max_s, run)
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def flush(self, timeout_s=2.0):
+        """Wait until every queued event has been handed to its subscribers."""
+        if self._thread is threading.current_thread():
+            return False  # called from a subscriber; waiting on ourselves would deadlock
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout_s=2.0):
+        """Drain what is queued, then stop the dispatcher thread."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout_s)
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "queued": queued,
+            "published": self.published,
+            "dropped": self.dropped,
+            "high_water": self.high_water,
+            "overflow": self.overflow,
+            "droppable": sorted(self.droppable) if self.droppable is not None else None,
+            "subscribers": {name: s.as_dict() for name, s in list(self._stats.items())},
+        }
@@ -0,0 +1,178 @@
+# serial_capture.py
+"""
+Serial traffic recorder and replayer.
+
+Capture format (little-endian):
+  header  b"CNCAP1\\n" + <d wall-clock start (time.time())>
+  record  <Q microseconds since capture start (monotonic)> <B direction> <H length> <payload utf-8>
+          direction 0 = Arduino -> RPi (inbound), 1 = RPi -> Arduino (outbound)
+
+11 bytes of overhead per line, so a busy day of traffic stays small. The
+recorder rotates to <path>.1 once the file reaches max_bytes.
+
+Replay feeds inbound lines back through CoinHandlerSerial._parse_line (storage
+and callbacks included) at real speed, N times faster, or as fast as possible:
+
+    python -m coin_handler.python.serial_capture dump capture.bin
+    python -m coin_handler.python.serial_capture replay capture.bin --speed 100 --profile
+"""
+import os
+import struct
+import threading
+import time
+
+MAGIC = b"CNCAP1\n"
+_HEADER = struct.Struct("<d")
+_RECORD = struct.Struct("<QBH")
+
+INBOUND = 0
+OUTBOUND = 1
+
+
+class CaptureWriter:
+    """Thread-safe recorder; the reader thread and command writers share one instance."""
+
+    def __init__(self, path, max_bytes=32 * 1024 * 1024, flush_interval_s=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval_s = flush_interval_s
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._start = 0.0
+        self._last_flush = 0.0
+        self._open_new()
+
+    def _open_new(self):
+        self._file = open(self.path, "wb")
+        self._start = time.monotonic()
+        self._file.write(MAGIC)
+        self._file.write(_HEADER.pack(time.time()))
+        self._last_flush = self._start
+
+    def record(self, direction, line, at=None):
+        payload = line.encode("utf-8", errors="replace")[:0xFFFF]
+        now = time.monotonic() if at is None else at
+        with self._lock:
+            if self._file is None:
+                return
+            offset_us = max(0, int((now - self._start) * 1_000_000))
+            self._file.write(_RECORD.pack(offset_us, direction, len(payload)))
+            self._file.write(payload)
+            self.records += 1
+            if now - self._last_flush >= self.flush_interval_s:
+                self._file.flush()
+                self._last_flush = now
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        os.replace(self.path, self.path + ".1")
+        self._open_new()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_capture(path):
+    """Yield (seconds_since_start, direction, line) for every record in a capture file."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a serial capture")
+        f.read(_HEADER.size)
+        while True:
+            head = f.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return  # clean end, or a record cut short by a crash
+            offset_us, direction, length = _RECORD.unpack(head)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield offset_us / 1_000_000, direction, payload.decode("utf-8", errors="ignore")
+
+
+def replay(path, handler, speed=1.0, required_amount=0, include_outbound=False):
+    """
+    Feed the inbound lines of a capture through handler._parse_line.
+    speed=1.0 is real time, 100 is 100x faster, 0 means no pacing at all.
+    Returns a summary dict (line counts per tag, parse time, wall time).
+    """
+    summary = {"inbound": 0, "outbound": 0, "tags": {}, "parse_s": 0.0, "wall_s": 0.0, "capture_s": 0.0}
+    wall_start = time.monotonic()
+    for t, direction, line in read_capture(path):
+        summary["capture_s"] = t
+        if speed > 0:
+            delay = wall_start + t / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if direction == OUTBOUND:
+            summary["outbound"] += 1
+            if include_outbound:
+                print("[REPLAY RPi -> ARDUINO]", line)
+            continue
+
+        summary["inbound"] += 1
+        tag = line.split(":", 1)[0].upper() if line else ""
+        summary["tags"][tag] = summary["tags"].get(tag, 0) + 1
+        started = time.perf_counter()
+        handler._parse_line(line, required_amount)
+        summary["parse_s"] += time.perf_counter() - started
+    handler.events.flush(timeout_s=5.0)
+    summary["wall_s"] = time.monotonic() - wall_start
+    return summary
+
+
+def _main():
+    import argparse
+    import cProfile
+    import pstats
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Dump or replay a CoinHandlerSerial capture")
+    parser.add_argument("command", choices=["dump", "replay"])
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, 100 = 100x, 0 = unpaced")
+    parser.add_argument("--required", type=int, default=0, help="required amount passed to _parse_line")
+    parser.add_argument("--profile", action="store_true", help="run the replay under cProfile")
+    args = parser.parse_args()
+
+    if args.command == "dump":
+        for t, direction, line in read_capture(args.path):
+            arrow = "->" if direction == OUTBOUND else "<-"
+            print(f"{t:12.6f} {arrow} {line}")
+        return
+
+    from .coin_handler_serial import CoinHandlerSerial
+    from .coin_storage import CoinStorage
+
+    # never touch the kiosk's real coin_storage.json from a replay
+    scratch = tempfile.mkdtemp(prefix="coinnect_replay_")
+    handler = CoinHandlerSerial(port=None, storage=CoinStorage(storage_file=os.path.join(scratch, "coin_storage.json")),
+                                metrics_path=None)
+    handler.reconnect = False
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    summary = replay(args.path, handler, speed=args.speed, required_amount=args.required)
+    if profiler:
+        profiler.disable()
+
+    print("\n" + "=" * 60)
+    print(f"Replayed {summary['inbound']} inbound / {summary['outbound']} outbound lines")
+    print(f"Capture span {summary['capture_s']:.2f}s, replay wall {summary['wall_s']:.2f}s, "
+          f"parse total {summary['parse_s'] * 1000:.1f}ms")
+    for tag, count in sorted(summary["tags"].items(), key=lambda kv: -kv[1]):
+        print(f"  {tag:<24}{count:>8}")
+    print("Callback lag:", handler.event_stats()["subscribers"])
+    print("=" * 60)
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,213 @@
+# serial_emulator.py
+"""
+PTY-backed Arduino emulator for exercising the serial stack without hardware.
+
+Speaks the merged handler protocol (COIN/ACK/DISPENSE_DONE/[OK]/ERR, READY on
+boot) plus the BAUD?/BAUD:/PING handshake from serial_link. A PTY has no real
+line rate, so output is paced at 10 bits per byte of the *emulated* baud rate,
+which makes throughput comparisons between 9600 and 115200 meaningful.
+Like a real Uno, the emulator "resets" whenever the host opens the port: it
+drops back to 9600 and prints its boot banner (READY). dtr_reset=False
+emulates a board whose auto-reset is disabled: it keeps its rate across
+opens. garble_on_mismatch=True compares the host's termios speed with the
+emulated rate and, like a real UART, turns traffic at the wrong rate into
+noise in both directions.
+
+Usage:
+    emu = ArduinoEmulator()
+    emu.start()
+    handler = CoinHandlerSerial(port=emu.port)
+    ...
+    emu.stop()
+"""
+import errno
+import os
+import select
+import termios
+import threading
+import time
+import tty
+
+from .serial_link import BOOT_BAUD, FIRMWARE_FALLBACK_S
+
+_TERMIOS_BAUDS = {getattr(termios, f"B{b}"): b for b in (1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200)
+                  if hasattr(termios, f"B{b}")}
+
+
+class ArduinoEmulator:
+    def __init__(
+        self,
+        supported_bauds=(9600, 57600, 115200),
+        boot_lines=("READY",),
+        pace=True,
+        dispense_delay_s=0.05,
+        sort_delay_s=0.05,
+        device_id="ID:merged_handler:COIN,DISPENSE,SORT,HOME",
+        dtr_reset=True,
+        garble_on_mismatch=False,
+    ):
+        # supported_bauds=None emulates old firmware without the BAUD command
+        self.supported_bauds = tuple(supported_bauds) if supported_bauds else None
+        self.boot_lines = tuple(boot_lines)
+        self.pace = pace
+        self.dispense_delay_s = dispense_delay_s
+        self.sort_delay_s = sort_delay_s
+        self.device_id = device_id  # None emulates firmware without ID?
+        self.dtr_reset = dtr_reset
+        self.garble_on_mismatch = garble_on_mismatch
+        self.garbled = 0  # host writes dropped because they arrived at the wrong rate
+
+        self.baud = BOOT_BAUD
+        self.acceptor_enabled = False
+        self.received = []  # every command line seen from the host
+
+        self._master_fd = None
+        self.port = None
+        self.host_connected = False
+        self._thread = None
+        self._running = False
+        self._write_lock = threading.Lock()
+        self._pending_baud_confirm = None  # deadline (monotonic) while waiting for PING
+
+    # ----- lifecycle -----
+    def start(self):
+        self._master_fd, slave_fd = os.openpty()
+        tty.setraw(slave_fd)
+        self.port = os.ttyname(slave_fd)
+        # only the host holds the slave side, so its open/close is visible as EIO on the master
+        os.close(slave_fd)
+        self._running = True
+        self._thread = threading.Thread(target=self._command_loop, daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        try:
+            if self._master_fd is not None:
+                os.close(self._master_fd)
+        except OSError:
+            pass
+        self._master_fd = None
+
+    def reset(self):
+        """Emulate a DTR reset: back to boot rate, acceptor off, boot banner again."""
+        self.baud = BOOT_BAUD
+        self.acceptor_enabled = False
+        self._pending_baud_confirm = None
+        for line in self.boot_lines:
+            self.emit(line)
+
+    def _rate_mismatch(self):
+        """True when garbling is on and the host's port is set to a different rate than ours."""
+        if not self.garble_on_mismatch or self._master_fd is None:
+            return False
+        try:
+            host = _TERMIOS_BAUDS.get(termios.tcgetattr(self._master_fd)[4])
+        except termios.error:
+            return False
+        return host is not None and host != self.baud
+
+    # ----- output -----
+    def emit(self, line):
+        """Send one line to the host, paced at the emulated baud rate."""
+        data = (line + "\r\n").encode("utf-8")
+        with self._write_lock:
+            if self._master_fd is None:
+                return
+            if self._rate_mismatch():
+                data = bytes(0xF0 | (b & 0x0F) for b in data)  # framing noise, no line breaks
+            os.write(self._master_fd, data)
+            if self.pace:
+                time.sleep(len(data) * 10.0 / self.baud)
+
+    def inject_coin(self, denom):
+        """Emulate the acceptor finishing a pulse train (ignored while disabled, like firmware)."""
+        if self.acceptor_enabled:
+            self.emit(f"COIN:{denom}")
+
+    # ----- command handling -----
+    def _command_loop(self):
+        buf = b""
+        while self._running:
+            if self._pending_baud_confirm and time.monotonic() > self._pending_baud_confirm:
+                # no PING after switching -> firmware falls back to boot rate
+                self.baud = BOOT_BAUD
+                self._pending_baud_confirm = None
+            try:
+                r, _, _ = select.select([self._master_fd], [], [], 0.05)
+                chunk = os.read(self._master_fd, 1024) if r else b""
+            except OSError as e:
+                if e.errno == errno.EIO:
+                    # no process has the port open
+                    self.host_connected = False
+                    time.sleep(0.02)
+                    continue
+                break
+            if not self.host_connected:
+                # host just opened the port: DTR pulse resets the board (unless auto-reset is disabled)
+                self.host_connected = True
+                buf = b""
+                if self.dtr_reset:
+                    self.reset()
+            if not chunk:
+                continue
+            if self._rate_mismatch():
+                self.garbled += 1
+                buf = b""
+                continue
+            buf += chunk
+            while b"\n" in buf:
+                raw, buf = buf.split(b"\n", 1)
+                cmd = raw.decode("utf-8", errors="ignore").strip()
+                if cmd:
+                    self.received.append(cmd)
+                    self._handle(cmd)
+
+    def _handle(self, cmd):
+        upper = cmd.upper()
+        if upper == "ENABLE_COIN":
+            self.acceptor_enabled = True
+            self.emit("ACK:ENABLE_COIN")
+        elif upper == "DISABLE_COIN":
+            self.acceptor_enabled = False
+            self.emit("ACK:DISABLE_COIN")
+        elif cmd.startswith("DISPENSE:"):
+            _, denom, qty = cmd.split(":")
+            if denom not in ("1", "5", "10", "20"):
+                self.emit("ERR:Invalid coin denomination")
+                return
+            self.emit(f"ACK:DISPENSE:{denom}:{qty}")
+            time.sleep(self.dispense_delay_s * int(qty))
+            self.emit(f"DISPENSE_DONE:{denom}:{qty}")
+        elif cmd.startswith("SORT:"):
+            if cmd[5:] not in ("20", "50", "100", "200", "500", "1000"):
+                self.emit("[Error] Unknown bill denom")
+                return
+            time.sleep(self.sort_delay_s)
+            self.emit("[OK]")
+        elif upper == "HOME":
+            self.emit("[Homing] Moving toward HOME...")
+            self.emit("[OK]")
+        elif upper == "ID?" and self.device_id:
+            self.emit(self.device_id)
+        elif upper == "PING":
+            self._pending_baud_confirm = None
+            self.emit("PONG")
+        elif upper == "BAUD?" and self.supported_bauds:
+            self.emit("BAUDS:" + ",".join(str(b) for b in self.supported_bauds))
+        elif cmd.startswith("BAUD:") and self.supported_bauds:
+            try:
+                baud = int(cmd[5:])
+            except ValueError:
+                baud = 0
+            if baud in self.supported_bauds:
+                self.emit(f"ACK:BAUD:{baud}")
+                self.baud = baud
+                self._pending_baud_confirm = time.monotonic() + FIRMWARE_FALLBACK_S
+            else:
+                self.emit("ERR:Unsupported baud")
+        else:
+            self.emit(f"ERR:Unknown command {cmd}")
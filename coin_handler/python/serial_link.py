@@ -0,0 +1,354 @@
+# serial_link.py
+"""
+Link-level helpers shared by every Arduino serial connection.
+
+Baud negotiation protocol (firmware always boots at BOOT_BAUD):
+  RPi -> BAUD?              Arduino -> BAUDS:9600,57600,115200
+  RPi -> BAUD:<rate>        Arduino -> ACK:BAUD:<rate>   (then switches)
+  RPi -> PING  (at <rate>)  Arduino -> PONG              (confirms the switch)
+
+Firmware that does not confirm with PING within ~2s falls back to BOOT_BAUD,
+so a failed upgrade never leaves the link mute. Older firmware answers
+"ERR:Unknown command BAUD?" and the link simply stays at BOOT_BAUD.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+BOOT_BAUD = 9600
+DEFAULT_MAX_BAUD = 115200
+DEFAULT_BAUD_FILE = "serial_baud.json"
+DEFAULT_READY_TIMEOUT_S = 5.0  # a board rebooted by DTR prints READY well within this
+FIRMWARE_FALLBACK_S = 2.0  # firmware reverts to BOOT_BAUD if no PING arrives in this window
+
+
+class BaudStore:
+    """Remembers the negotiated baud rate per device (JSON persistence)."""
+
+    def __init__(self, storage_file=DEFAULT_BAUD_FILE):
+        self.storage_file = storage_file
+        self._lock = threading.Lock()
+        self._rates = {}
+        if os.path.exists(self.storage_file):
+            try:
+                with open(self.storage_file, "r") as f:
+                    self._rates = {str(k): int(v) for k, v in json.load(f).items()}
+            except Exception as e:
+                print(f"[BaudStore] Error loading {self.storage_file}, ignoring. {e}")
+                self._rates = {}
+
+    def get(self, device_key):
+        with self._lock:
+            return self._rates.get(device_key)
+
+    def set(self, device_key, baud):
+        with self._lock:
+            self._rates[device_key] = int(baud)
+            self._save()
+
+    def forget(self, device_key):
+        with self._lock:
+            if self._rates.pop(device_key, None) is not None:
+                self._save()
+
+    def _save(self):
+        tmp = self.storage_file + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self._rates, f, indent=2)
+            os.replace(tmp, self.storage_file)
+        except Exception as e:
+            print(f"[BaudStore] Error saving {self.storage_file}: {e}")
+
+
+def device_key(port):
+    """
+    Stable identity for a serial device: the USB serial number when pyserial can
+    see it (survives ttyACM0/ttyACM1 renumbering), otherwise the port path.
+    """
+    try:
+        from serial.tools import list_ports
+        for info in list_ports.comports():
+            if info.device == port and info.serial_number:
+                return f"usb:{info.serial_number}"
+    except Exception:
+        pass
+    return port
+
+
+def _write_line(ser, cmd):
+    ser.write((cmd + "\n").encode("utf-8"))
+    ser.flush()
+
+
+def _read_reply(ser, prefixes, timeout_s):
+    """Read lines until one starts with any of `prefixes`; skip chatter. Returns the line or None."""
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        raw = ser.readline()
+        if not raw:
+            continue
+        line = raw.decode("utf-8", errors="ignore").strip()
+        if not line:
+            continue
+        if any(line.startswith(p) for p in prefixes):
+            return line
+    return None
+
+
+def query_supported_bauds(ser, timeout_s=1.5):
+    """Ask firmware which rates it supports. Returns a sorted list (empty if unsupported)."""
+    _write_line(ser, "BAUD?")
+    reply = _read_reply(ser, ("BAUDS:", "ERR:Unknown command BAUD"), timeout_s)
+    if not reply or not reply.startswith("BAUDS:"):
+        return []
+    rates = []
+    for part in reply[len("BAUDS:"):].split(","):
+        try:
+            rates.append(int(part))
+        except ValueError:
+            pass
+    return sorted(rates)
+
+
+def query_device_id(ser, timeout_s=1.5):
+    """Ask firmware who it is (ID? -> ID:<role>:<CAP,CAP>). Returns (role, capabilities) or (None, [])."""
+    _write_line(ser, "ID?")
+    reply = _read_reply(ser, ("ID:", "ERR:Unknown command ID"), timeout_s)
+    if not reply or not reply.startswith("ID:"):
+        return None, []
+    parts = reply.split(":", 2)
+    role = parts[1] if len(parts) > 1 else None
+    caps = [c.strip().upper() for c in parts[2].split(",") if c.strip()] if len(parts) > 2 else []
+    return role, caps
+
+
+def switch_baud(ser, baud, timeout_s=1.5):
+    """
+    Request `baud`, switch the host side after the ACK and confirm with PING/PONG.
+    On any failure the host side is put back on its previous rate.
+    """
+    previous = ser.baudrate
+    _write_line(ser, f"BAUD:{baud}")
+    ack = _read_reply(ser, ("ACK:BAUD:", "ERR:"), timeout_s)
+    if ack != f"ACK:BAUD:{baud}":
+        return False
+
+    # Firmware switches right after flushing the ACK; give it a moment.
+    time.sleep(0.05)
+    ser.baudrate = baud
+    ser.reset_input_buffer()
+    _write_line(ser, "PING")
+    if _read_reply(ser, ("PONG",), timeout_s) == "PONG":
+        return True
+
+    print(f"[serial_link] no PONG at {baud}; staying at {previous}")
+    ser.baudrate = previous
+    # wait out the firmware's confirm window so both sides are back on `previous`
+    time.sleep(FIRMWARE_FALLBACK_S)
+    ser.reset_input_buffer()
+    return False
+
+
+def negotiate_baud(ser, store=None, key=None, max_baud=DEFAULT_MAX_BAUD, timeout_s=1.5):
+    """
+    Upgrade an open link from its boot rate to the fastest rate both sides support
+    (capped at `max_baud`). A previously negotiated rate for `key` is tried first so
+    the BAUD? round trip is skipped on later opens. Returns the active baud rate.
+    """
+    if max_baud <= ser.baudrate:
+        return ser.baudrate
+
+    remembered = store.get(key) if (store and key) else None
+    if remembered and remembered <= max_baud and remembered != ser.baudrate:
+        if switch_baud(ser, remembered, timeout_s):
+            return remembered
+        # firmware changed or refused; fall back to a full negotiation
+        store.forget(key)
+
+    candidates = [b for b in query_supported_bauds(ser, timeout_s) if ser.baudrate < b <= max_baud]
+    for baud in reversed(candidates):
+        if switch_baud(ser, baud, timeout_s):
+            if store and key:
+                store.set(key, baud)
+            return baud
+    return ser.baudrate
+
+
+class SerialConnection:
+    """
+    Persistent connection to one Arduino board.
+
+    - open() is idempotent and replaces the old fixed 2s sleep with a wait for the
+      firmware's READY banner (bounded by ready_timeout_s), then negotiates baud.
+    - suppress_dtr_reset keeps DTR low so opening the port does not reboot the
+      board (also needs `stty -F <port> -hupcl` or a reset-disable cap on some
+      boards); the link is then probed with PING, at the remembered rate first
+      since the board keeps its negotiated rate, instead of waiting for READY.
+    - reconnect() retries with capped exponential backoff plus jitter.
+    - every open attempt is traced (cost, READY seen, baud) in open_trace.
+    - readline()/write_line() are safe against a concurrent close(): close()
+      wakes a blocked read and waits for it before releasing the port.
+    """
+
+    READY_TOKEN = "READY"
+
+    def __init__(
+        self,
+        port,
+        baud=BOOT_BAUD,
+        max_baud=DEFAULT_MAX_BAUD,
+        name="SerialConnection",
+        ready_timeout_s=DEFAULT_READY_TIMEOUT_S,
+        suppress_dtr_reset=False,
+        baud_store=None,
+        backoff_base_s=0.5,
+        backoff_cap_s=10.0,
+    ):
+        self.port = port
+        self.baud = baud
+        self.max_baud = max_baud
+        self.name = name
+        self.ready_timeout_s = ready_timeout_s
+        self.suppress_dtr_reset = suppress_dtr_reset
+        self.baud_store = baud_store if baud_store is not None else BaudStore()
+        self.backoff_base_s = backoff_base_s
+        self.backoff_cap_s = backoff_cap_s
+
+        self.ser = None
+        self.active_baud = baud
+        self.open_count = 0
+        self.open_trace = []  # dicts: {"at", "cost_s", "ok", "ready", "baud", "error"}
+        self._lock = threading.RLock()
+        self._read_lock = threading.RLock()  # held by readline(); close() takes it before closing the port
+
+    @property
+    def is_open(self):
+        return bool(self.ser and self.ser.is_open)
+
+    def open(self):
+        """Open (if needed), wait for READY, negotiate baud. Returns True when usable."""
+        with self._lock:
+            if self.is_open:
+                return True
+
+            import serial  # imported lazily so link helpers work without pyserial
+
+            started = time.monotonic()
+            entry = {"at": time.time(), "cost_s": 0.0, "ok": False, "ready": False, "baud": self.baud, "error": None}
+            ser = None
+            try:
+                ser = serial.Serial()
+                ser.port = self.port
+                ser.baudrate = self.baud
+                ser.timeout = 1
+                if self.suppress_dtr_reset:
+                    ser.dtr = False
+                    ser.rts = False
+                ser.open()
+
+                entry["ready"] = self._wait_ready(ser)
+                self.active_baud = negotiate_baud(ser, self.baud_store, device_key(self.port), self.max_baud)
+                entry["baud"] = self.active_baud
+                entry["ok"] = True
+                self.ser = ser
+            except Exception as e:
+                entry["error"] = str(e)
+                if ser is not None and ser.is_open:
+                    ser.close()
+                self.ser = None
+            finally:
+                entry["cost_s"] = time.monotonic() - started
+                self.open_count += 1
+                self.open_trace.append(entry)
+                del self.open_trace[:-50]  # keep the recent history only
+
+            if entry["ok"]:
+                print(
+                    f"[{self.name}] open #{self.open_count} {self.port}@{self.active_baud} "
+                    f"took {entry['cost_s']:.2f}s (ready={entry['ready']})"
+                )
+            else:
+                print(f"[{self.name}] open #{self.open_count} {self.port} failed after {entry['cost_s']:.2f}s: {entry['error']}")
+            return entry["ok"]
+
+    def _wait_ready(self, ser):
+        """
+        Wait for the READY banner. With DTR suppressed the board was not reset
+        and is still at whatever rate it last negotiated, so PING it at the
+        remembered rate, then at this link's last rate, then at the boot rate,
+        and leave ser at the rate that answered.
+        """
+        if self.suppress_dtr_reset:
+            remembered = self.baud_store.get(device_key(self.port))
+            for baud in dict.fromkeys(b for b in (remembered, self.active_baud, self.baud) if b):
+                ser.baudrate = baud
+                ser.reset_input_buffer()
+                _write_line(ser, "PING")
+                if _read_reply(ser, ("PONG",), 0.5) == "PONG":
+                    return True
+            ser.baudrate = self.baud
+            ser.reset_input_buffer()
+        deadline = time.monotonic() + self.ready_timeout_s
+        while time.monotonic() < deadline:
+            raw = ser.readline()
+            if raw and self.READY_TOKEN in raw.decode("utf-8", errors="ignore").upper():
+                return True
+        print(f"[{self.name}] no {self.READY_TOKEN} within {self.ready_timeout_s:.1f}s; continuing")
+        return False
+
+    def close(self):
+        with self._lock:
+            ser, self.ser = self.ser, None
+            if ser is None:
+                return
+            try:
+                if ser.is_open and hasattr(ser, "cancel_read"):
+                    ser.cancel_read()  # wake a reader blocked in readline()
+            except Exception:
+                pass
+            with self._read_lock:  # the read in progress returns before the handle goes away
+                try:
+                    if ser.is_open:
+                        ser.close()
+                except Exception as e:
+                    print(f"[{self.name}] close error:", e)
+
+    def upgrade_baud(self, max_baud=None):
+        """Negotiate on a link opened at its boot rate (open() does this itself unless max_baud == baud)."""
+        with self._lock:
+            if max_baud is not None:
+                self.max_baud = max_baud
+            if self.is_open:
+                self.active_baud = negotiate_baud(self.ser, self.baud_store, device_key(self.port), self.max_baud)
+            return self.active_baud
+
+    def reconnect(self, should_continue=lambda: True):
+        """Close and reopen with jittered exponential backoff until open or should_continue() is False."""
+        self.close()
+        attempt = 0
+        while should_continue():
+            if self.open():
+                return True
+            wait = min(self.backoff_cap_s, self.backoff_base_s * (2 ** attempt))
+            wait = random.uniform(wait / 2, wait)  # jitter so several links don't retry in lockstep
+            print(f"[{self.name}] reconnect failed, retrying in {wait:.1f}s")
+            time.sleep(wait)
+            attempt += 1
+        return False
+
+    def readline(self):
+        """One line from the board (b"" on timeout, or when the link is closed)."""
+        with self._read_lock:
+            ser = self.ser
+            if ser is None or not ser.is_open:
+                return b""
+            return ser.readline()
+
+    def write_line(self, cmd):
+        with self._lock:
+            if self.ser is None:
+                raise ConnectionError(f"{self.name}: {self.port} is not open")
+            self.ser.write((cmd + "\n").encode("utf-8"))
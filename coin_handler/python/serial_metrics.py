@@ -0,0 +1,256 @@
+# serial_metrics.py
+"""
+Per-command latency tracking for the Arduino link.
+
+Every command the Pi sends opens a pending entry; the matching reply closes it
+and records the round trip in a log-bucketed histogram:
+
+  SORT           SORT:<denom>          -> [OK]
+  DISPENSE_ACK   DISPENSE:<denom>:<q>  -> ACK:DISPENSE:<denom>:<q>
+  DISPENSE_DONE  ACK:DISPENSE          -> DISPENSE_DONE   (hopper run time)
+  ENABLE_COIN    ENABLE_COIN           -> ACK:ENABLE_COIN
+  DISABLE_COIN   DISABLE_COIN          -> ACK:DISABLE_COIN
+
+ERR:/[Error] replies close the newest pending entry as an error; entries
+nobody answered are counted as timeouts. Histograms exist per command and per
+denomination, so one hopper that is getting slower stands out long before it
+starts timing out.
+
+    snap = handler.metrics.snapshot()
+    snap["commands"]["DISPENSE_DONE"]["by_denom"]["5"]["p99_ms"]
+
+CoinHandlerSerial dumps a snapshot to serial_metrics.json (in the working
+directory, next to coin_storage.json) every minute and on shutdown.
+"""
+import json
+import os
+import threading
+import time
+
+DEFAULT_METRICS_FILE = "serial_metrics.json"
+
+# 16 sub-buckets per power of two: every recorded value is within 1/16 (~6%)
+_SUB_BITS = 4
+_SUB_COUNT = 1 << _SUB_BITS
+
+# how long a command may stay unanswered before it counts as a timeout
+DEFAULT_STALE_AFTER_S = {
+    "SORT": 60.0,
+    "DISPENSE_ACK": 5.0,
+    "DISPENSE_DONE": 120.0,
+    "ENABLE_COIN": 5.0,
+    "DISABLE_COIN": 5.0,
+}
+
+
+def _bucket_index(value_us):
+    if value_us < _SUB_COUNT:
+        return value_us
+    shift = value_us.bit_length() - (_SUB_BITS + 1)
+    return (shift + 1) * _SUB_COUNT + ((value_us >> shift) - _SUB_COUNT)
+
+
+def _bucket_upper(index):
+    """Highest value (µs) that lands in bucket `index`."""
+    if index < _SUB_COUNT:
+        return index
+    shift = index // _SUB_COUNT - 1
+    sub = index % _SUB_COUNT + _SUB_COUNT
+    return ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """HDR-style histogram of latencies in microseconds (sparse log-linear buckets)."""
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        idx = _bucket_index(value)
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+        self.count += 1
+        self.total_us += value
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = max(self.max_us, value)
+
+    def percentile(self, p):
+        """Latency in µs at or below which p% of the samples fall."""
+        if not self.count:
+            return 0
+        target = max(1, int(round(self.count * p / 100.0)))
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen >= target:
+                return min(_bucket_upper(idx), self.max_us)
+        return self.max_us
+
+    def as_dict(self):
+        out = {
+            "count": self.count,
+            "min_ms": (self.min_us or 0) / 1000.0,
+            "mean_ms": (self.total_us / self.count / 1000.0) if self.count else 0.0,
+            "max_ms": self.max_us / 1000.0,
+        }
+        for p in self.PERCENTILES:
+            out[f"p{p:g}_ms".replace(".", "")] = self.percentile(p) / 1000.0
+        return out
+
+
+class _CommandStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.timeouts = 0
+        self.errors = 0
+        self.last_error = None
+
+    def as_dict(self):
+        out = self.latency.as_dict()
+        out["timeouts"] = self.timeouts
+        out["errors"] = self.errors
+        if self.last_error:
+            out["last_error"] = self.last_error
+        return out
+
+
+class SerialMetrics:
+    def __init__(self, stale_after_s=None):
+        self.stale_after_s = dict(DEFAULT_STALE_AFTER_S)
+        if stale_after_s:
+            self.stale_after_s.update(stale_after_s)
+        self.started_at = time.time()
+        self.unmatched_errors = 0
+        self._pending = []  # [command, key, sent_at] in send order
+        self._stats = {}    # (command, key) -> _CommandStats; key None is the per-command total
+        self._lock = threading.Lock()
+        self._dump_thread = None
+        self._dump_stop = threading.Event()
+
+    # ----- recording -----
+    def _stats_for(self, command, key):
+        return [
+            self._stats.setdefault((command, None), _CommandStats()),
+            self._stats.setdefault((command, key), _CommandStats()) if key is not None else None,
+        ]
+
+    def begin(self, command, key=None, at=None):
+        """A command went out on the wire."""
+        now = time.monotonic() if at is None else at
+        with self._lock:
+            self._expire(now)
+            self._pending.append([command, key, now])
+
+    def _take(self, command, key):
+        """Pop the oldest pending entry for command (and key, if given)."""
+        for i, (cmd, k, sent_at) in enumerate(self._pending):
+            if cmd == command and (key is None or k == key):
+                del self._pending[i]
+                return k, sent_at
+        return None
+
+    def complete(self, command, key=None, at=None):
+        """The reply for command arrived. Returns the latency in seconds, or None if nothing was pending."""
+        now = time.monotonic() if at is None else at
+        with self._lock:
+            taken = self._take(command, key)
+            if taken is None:
+                return None
+            k, sent_at = taken
+            latency = now - sent_at
+            for stats in self._stats_for(command, k):
+                if stats is not None:
+                    stats.latency.record(latency)
+            return latency
+
+    def timeout(self, command, key=None):
+        """The caller gave up waiting for command."""
+        with self._lock:
+            taken = self._take(command, key)
+            k = taken[0] if taken else key
+            for stats in self._stats_for(command, k):
+                if stats is not None:
+                    stats.timeouts += 1
+
+    def error(self, message, command=None):
+        """An ERR/[Error] reply: charge it to the newest pending command (or `command`)."""
+        with self._lock:
+            for i in range(len(self._pending) - 1, -1, -1):
+                cmd, k, _ = self._pending[i]
+                if command is None or cmd == command:
+                    del self._pending[i]
+                    for stats in self._stats_for(cmd, k):
+                        if stats is not None:
+                            stats.errors += 1
+                            stats.last_error = message
+                    return cmd
+            self.unmatched_errors += 1
+            return None
+
+    def _expire(self, now):
+        keep = []
+        for entry in self._pending:
+            cmd, k, sent_at = entry
+            if now - sent_at > self.stale_after_s.get(cmd, 60.0):
+                for stats in self._stats_for(cmd, k):
+                    if stats is not None:
+                        stats.timeouts += 1
+            else:
+                keep.append(entry)
+        self._pending = keep
+
+    # ----- reporting -----
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            commands = {}
+            for (cmd, key), stats in sorted(self._stats.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+                entry = commands.setdefault(cmd, {"by_denom": {}})
+                if key is None:
+                    entry.update(stats.as_dict())
+                else:
+                    entry["by_denom"][str(key)] = stats.as_dict()
+            return {
+                "at": time.time(),
+                "uptime_s": time.time() - self.started_at,
+                "pending": [{"command": c, "denom": k, "age_s": now - t} for c, k, t in self._pending],
+                "unmatched_errors": self.unmatched_errors,
+                "commands": commands,
+            }
+
+    def dump(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    def start_periodic_dump(self, path, interval_s=60.0):
+        if self._dump_thread and self._dump_thread.is_alive():
+            return
+        self._dump_stop.clear()
+
+        def loop():
+            while not self._dump_stop.wait(interval_s):
+                try:
+                    self.dump(path)
+                except Exception as e:
+                    print("[SerialMetrics] dump failed:", e)
+
+        self._dump_thread = threading.Thread(target=loop, name="SerialMetrics-dump", daemon=True)
+        self._dump_thread.start()
+
+    def stop(self, path=None):
+        """Stop the periodic dump; write one last snapshot to `path` if given."""
+        self._dump_stop.set()
+        if path:
+            try:
+                self.dump(path)
+            except Exception as e:
+                print("[SerialMetrics] dump failed:", e)
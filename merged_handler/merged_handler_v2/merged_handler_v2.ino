@@ -250,6 +250,67 @@ void setup_coin() {
 
 
 
+// ==================== LINK SPEED NEGOTIATION ====================
+// Boots at BOOT_BAUD; the Pi asks BAUD?, requests BAUD:<rate> and confirms
+// with PING at the new rate. Without that PING we fall back to BOOT_BAUD.
+// Protocol: coin_handler/python/serial_link.py
+const long BOOT_BAUD = 9600;
+const long SUPPORTED_BAUDS[] = {9600, 57600, 115200};
+const int NUM_BAUDS = sizeof(SUPPORTED_BAUDS) / sizeof(SUPPORTED_BAUDS[0]);
+const unsigned long BAUD_CONFIRM_MS = 2000;
+bool baudConfirmPending = false;
+unsigned long baudSwitchTime = 0;
+
+// Reported to the Pi's device registry (ID?): role and command capabilities
+const char* DEVICE_ID = "ID:merged_handler:COIN,DISPENSE,SORT,HOME";
+
+bool handle_link_command(String &cmd) {
+  if (cmd.equalsIgnoreCase("ID?")) {
+    Serial.println(DEVICE_ID);
+    return true;
+  }
+  if (cmd.equalsIgnoreCase("PING")) {
+    baudConfirmPending = false;
+    Serial.println("PONG");
+    return true;
+  }
+  if (cmd.equalsIgnoreCase("BAUD?")) {
+    Serial.print("BAUDS:");
+    for (int i = 0; i < NUM_BAUDS; i++) {
+      if (i > 0) Serial.print(",");
+      Serial.print(SUPPORTED_BAUDS[i]);
+    }
+    Serial.println();
+    return true;
+  }
+  if (cmd.startsWith("BAUD:")) {
+    long rate = cmd.substring(5).toInt();
+    for (int i = 0; i < NUM_BAUDS; i++) {
+      if (SUPPORTED_BAUDS[i] == rate) {
+        Serial.print("ACK:BAUD:");
+        Serial.println(rate);
+        Serial.flush();
+        Serial.end();
+        Serial.begin(rate);
+        baudConfirmPending = true;
+        baudSwitchTime = millis();
+        return true;
+      }
+    }
+    Serial.println("ERR:Unsupported baud");
+    return true;
+  }
+  return false;
+}
+
+void check_baud_confirm() {
+  if (baudConfirmPending && millis() - baudSwitchTime > BAUD_CONFIRM_MS) {
+    Serial.end();
+    Serial.begin(BOOT_BAUD);
+    baudConfirmPending = false;
+  }
+}
+
 // ==================== SERIAL COMMAND HANDLER ====================
 
 void handle_serial_commands() {
@@ -257,6 +318,8 @@ void handle_serial_commands() {
     String cmd = Serial.readStringUntil('\n');
     cmd.trim();
 
+    if (handle_link_command(cmd)) return;
+
     if (cmd.equalsIgnoreCase("ENABLE_COIN")) {
       digitalWrite(ENABLE_PIN, HIGH);
       acceptorEnabled = true;
@@ -310,7 +373,7 @@ void handle_serial_commands() {
 // ==================== MAIN SETUP & LOOP ====================
 
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(BOOT_BAUD);
 
   pinMode(LIMIT_X_HOME, INPUT_PULLUP);
 
@@ -342,6 +405,7 @@ void loop() {
     pulseCount = 0;
   }
 
+  check_baud_confirm();
   handle_serial_commands();
   stepperX.run();
   delay(5);
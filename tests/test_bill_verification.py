@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Bill Verification Test
+Runs PiBillHandler's decision logic against stand-in models (no camera, no
+ncnn). A bill the UV model scores 0.65 "genuine" on every frame must be
+rejected, exactly as the single-frame 0.8 rule does. Repeated frames of a
+stationary bill must not add up to a pass, on the two-model path or on the
+fused multi-head path. A fake verdict arriving mid-burst stops the white
+capture, and the denomination inference it abandons neither writes into
+the reported timings nor runs into a model swap. A result-cache hit reuses
+only the denomination; the UV model still judges the reinserted bill.
+"""
+
+import sys
+import os
+import threading
+import time
+
+import numpy as np
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bill_handler.python.pi_bill_handler import PiBillHandler
+from bill_handler.python.result_cache import ResultCache
+
+FRAME = np.zeros((480, 480, 3), dtype=np.uint8)
+
+
+class ConstantModel:
+    """Returns the same probability vector for every frame."""
+
+    def __init__(self, probs, names):
+        self.probs = np.asarray(probs, dtype=np.float32)
+        self.names = names
+        self.calls = 0
+
+    def predict_probs(self, frame):
+        self.calls += 1
+        return self.probs
+
+
+class SlowModel(ConstantModel):
+    """ConstantModel that blocks until released (a denomination pass still running)."""
+
+    def __init__(self, probs, names):
+        super().__init__(probs, names)
+        self.started, self.release = threading.Event(), threading.Event()
+
+    def predict_probs(self, frame):
+        self.started.set()
+        self.release.wait(10)
+        return super().predict_probs(frame)
+
+
+class StubManager:
+    """Just enough of ModelManager for _swap_models_if_idle."""
+
+    def __init__(self):
+        self.swaps = 0
+
+    def has_pending(self):
+        return True
+
+    def swap_pending(self, apply):
+        self.swaps += 1
+        return []
+
+
+class StubMultiHead:
+    """Stands in for MultiHeadClassifier: fixed auth / denom outputs per pass."""
+
+    names_auth = {0: "fake", 1: "genuine"}
+    names_denom = {0: "100", 1: "500"}
+
+    def __init__(self, auth, denoms):
+        self.auth = np.asarray(auth, dtype=np.float32)
+        self.denoms = [np.asarray(d, dtype=np.float32) for d in denoms]
+        self.calls = 0
+
+    def predict_probs(self, uv, white):
+        denom = self.denoms[min(self.calls, len(self.denoms) - 1)]
+        self.calls += 1
+        return self.auth, denom
+
+
+def make_handler():
+    handler = PiBillHandler(use_hardware=False, cascade_file=None, model_config_file="/nonexistent/model_config.json",
+                            model_watch_interval_s=0, result_cache_ttl_s=0)
+    handler.wait_models_ready(30)
+    handler.roi = None
+    return handler
+
+
+def check_sequential_decision(handler):
+    labels = {0: "fake", 1: "genuine"}
+    uv = ConstantModel([0.35, 0.65], labels)
+    label, posterior, used = handler.sequential_decision(uv, labels, [FRAME] * 3, 0.8, 3)
+    print(f"constant 0.65 over 3 frames -> {label} {posterior:.3f} ({used} frames)")
+    assert used == 3, "a marginal bill should use every allowed frame"
+    assert abs(posterior - 0.65) < 1e-6, "identical frames must not raise the confidence"
+    assert posterior < 0.8, "0.65 per frame must stay below the 0.8 bar"
+
+    # a clear frame still decides at once
+    label, posterior, used = handler.sequential_decision(ConstantModel([0.05, 0.95], labels), labels, [FRAME] * 3, 0.8, 3)
+    assert (label, used) == ("genuine", 1) and posterior >= 0.8
+
+
+def check_authenticate(handler):
+    labels = {0: "fake", 1: "genuine"}
+    handler.uv_model, handler.uv_labels = ConstantModel([0.35, 0.65], labels), labels
+    assert handler.authenticate_frame(FRAME) is False, "0.65 genuine must be rejected as fake"
+    assert handler.uv_model.calls == 1, "authenticity is a single-frame decision"
+    handler.uv_model = ConstantModel([0.15, 0.85], labels)
+    assert handler.authenticate_frame(FRAME) is True
+    print("authenticate_frame: 0.65 rejected, 0.85 accepted, one UV pass each")
+
+
+def check_multihead(handler):
+    handler.capture_image = lambda **kw: FRAME
+    handler.capture_white_frames = lambda count, stop=None: [FRAME] * count
+    single_frame_ok = lambda auth: auth[1] >= handler.uv_threshold  # noqa: E731
+
+    marginal = [0.35, 0.65]
+    handler.multihead = StubMultiHead(marginal, [[0.6, 0.4]] * 3)
+    ok, denom, reason = handler.verify_bill()
+    print(f"fused, auth 0.65 on every pass -> {reason}")
+    assert ok == single_frame_ok(marginal) is False and reason == "fake_bill"
+    assert handler.last_verify_confidence["uv"] == np.float32(0.65)
+    assert handler.multihead.calls == 1, "one UV reading must not be counted again"
+
+    clear = [0.1, 0.9]
+    # a marginal first denomination pass (0.4) makes the burst vote: mean (0.4 + 0.8) / 2 = 0.6 on pass 2
+    handler.multihead = StubMultiHead(clear, [[0.4, 0.35, 0.25], [0.8, 0.1, 0.1]])
+    handler.multihead.names_denom = {0: "100", 1: "500", 2: "1000"}
+    ok, denom, reason = handler.verify_bill()
+    print(f"fused, auth 0.9 -> {reason} {denom} after {handler.multihead.calls} passes")
+    assert ok == single_frame_ok(clear) is True and (denom, reason) == (100, "verified")
+    assert handler.multihead.calls == 2
+    assert handler.last_verify_confidence["uv"] == np.float32(0.9)
+    handler.multihead = None
+
+
+def check_early_reject(handler):
+    labels = {0: "fake", 1: "genuine"}
+    handler.capture_image = lambda **kw: FRAME
+    uv_seen = threading.Event()
+    handler.uv_model, handler.uv_labels = ConstantModel([0.9, 0.1], labels), labels
+    grabs = []
+
+    def white_burst(count, stop=None):
+        # first grab lands before the UV verdict, the rest after it
+        uv_seen.wait(5)
+        deadline = time.monotonic() + 5
+        while not (stop and stop()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        grabs.append(1)
+        return [FRAME]
+
+    # 1. the fake verdict stops the burst; no denomination work is started
+    handler.capture_white_frames = white_burst
+    uv_infer = handler._authenticate
+    handler._authenticate = lambda frame: (uv_seen.set(), uv_infer(frame))[1]
+    ok, denom, reason = handler.verify_bill()
+    assert (ok, reason) == (False, "fake_bill") and grabs == [1]
+    handler._authenticate = uv_infer
+
+    # 2. a denomination pass already running when the fake verdict lands is left behind
+    slow = SlowModel([0.1, 0.9], {0: "100", 1: "500"})
+    handler.denom_model, handler.denom_labels = slow, slow.names
+    handler.uv_model = SlowModel([0.9, 0.1], labels)
+    handler.capture_white_frames = lambda count, stop=None: [FRAME] * count
+    verdict = []
+    verify = threading.Thread(target=lambda: verdict.append(handler.verify_bill()))
+    verify.start()
+    slow.started.wait(5)
+    handler.uv_model.release.set()  # UV says fake while the denomination pass is running
+    verify.join(5)
+    assert verdict and verdict[0][2] == "fake_bill"
+    timing = dict(handler.last_verify_timing)
+    handler.model_manager = manager = StubManager()
+    handler._swap_models_if_idle()
+    assert manager.swaps == 0, "no swap while the abandoned inference uses the model"
+    slow.release.set()
+    deadline = time.monotonic() + 5
+    while handler._orphans and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.swaps == 1, "the swap should go through once the abandoned inference ends"
+    assert handler.last_verify_timing == timing and "denom_s" not in timing, "late results must be dropped"
+    assert "denom" not in handler.last_verify_confidence
+    handler.model_manager = None
+    print("early reject: burst stopped after 1 grab; abandoned denom pass dropped, swap deferred until it ended")
+
+
+def check_cache_reauth(handler):
+    labels = {0: "fake", 1: "genuine"}
+    handler.result_cache = ResultCache()
+    handler.capture_image = lambda **kw: FRAME
+    handler.capture_white_frames = lambda count, stop=None: [FRAME] * count
+    handler.uv_model, handler.uv_labels = ConstantModel([0.05, 0.95], labels), labels
+    handler.denom_model = ConstantModel([0.05, 0.95], {0: "100", 1: "500"})
+    handler.denom_labels = handler.denom_model.names
+    assert handler.verify_bill() == (True, 500, "verified")
+
+    # same UV ROI again: the denomination comes from the cache, authenticity does not
+    handler.uv_model = ConstantModel([0.9, 0.1], labels)
+    denom_calls = handler.denom_model.calls
+    ok, denom, reason = handler.verify_bill()
+    assert handler.last_verify_timing.get("cache_hit") == 1 and handler.uv_model.calls == 1
+    assert (ok, reason) == (False, "fake_bill"), "a cache hit must not skip UV authentication"
+    handler.uv_model = ConstantModel([0.05, 0.95], labels)
+    assert handler.verify_bill() == (True, 500, "verified") and handler.uv_model.calls == 1
+    assert handler.denom_model.calls == denom_calls, "a cache hit reuses the denomination"
+    handler.result_cache = None
+    print("cache hit: UV model re-run (fake rejected), denomination reused")
+
+
+def main():
+    print("=" * 60)
+    print("Bill Verification Test")
+    print("=" * 60)
+    handler = make_handler()
+    try:
+        check_sequential_decision(handler)
+        check_authenticate(handler)
+        check_multihead(handler)
+        check_early_reject(handler)
+        check_cache_reauth(handler)
+    finally:
+        handler.cleanup()
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Camera Service Test
+Uses the real camera when OpenCV can open one (pass --camera), otherwise a
+synthetic 30 fps source that, like a V4L2 device, takes 300 ms to open.
+Compares open-read-release per capture (the old capture_image) with the
+long-lived CameraService, and checks frame_after() ordering and that frames
+are handed out without copying. With the synthetic source it also checks that
+wait_settled() waits out a delayed, ramping LED, that frames are stamped
+when their read began rather than when a slow read returned, and that a
+PiBillHandler cleaned up does not stop a camera it was handed.
+"""
+
+import sys
+import os
+import time
+import threading
+
+import numpy as np
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bill_handler.python.camera_service import CameraService
+from bill_handler.python.pi_bill_handler import PiBillHandler
+
+CAPTURES = 10
+
+
+class SyntheticCapture:
+    """VideoCapture-like source: slow open, frames at a fixed rate, stamped with a counter."""
+
+    def __init__(self, open_s=0.3, fps=30, shape=(480, 640, 3)):
+        time.sleep(open_s)
+        self.period = 1.0 / fps
+        self.shape = shape
+        self.count = 0
+        self.next_at = time.monotonic()
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_at = max(self.next_at + self.period, time.monotonic())
+        self.count += 1
+        frame = np.empty(self.shape, dtype=np.uint8)
+        frame[0, 0, 0] = self.count % 256
+        return True, frame
+
+    def release(self):
+        self.opened = False
+
+
+class RampCapture(SyntheticCapture):
+    """Synthetic source lit by an LED that starts rising `delay_s` after `on_at` and takes `ramp_s`."""
+
+    def __init__(self, delay_s=0.1, ramp_s=0.15):
+        super().__init__(open_s=0.0, shape=(120, 160, 3))
+        self.delay_s, self.ramp_s = delay_s, ramp_s
+        self.on_at = None
+
+    def read(self):
+        ok, frame = super().read()
+        level = 60.0
+        if self.on_at is not None:
+            level += 140.0 * min(1.0, max(0.0, time.monotonic() - self.on_at - self.delay_s) / self.ramp_s)
+        frame[:] = int(level)
+        return ok, frame
+
+
+class SlowReadCapture(SyntheticCapture):
+    """Each frame is delivered `deliver_s` after it was exposed."""
+
+    def __init__(self, deliver_s=0.03):
+        super().__init__(open_s=0.0, shape=(120, 160, 3))
+        self.deliver_s = deliver_s
+        self.exposed = {}  # frame marker -> time.monotonic() at exposure
+
+    def read(self):
+        ok, frame = super().read()
+        self.exposed[int(frame[0, 0, 0])] = time.monotonic()
+        time.sleep(self.deliver_s)
+        return ok, frame
+
+
+def check_timestamps():
+    source = SlowReadCapture()
+    camera = CameraService(0, capture_factory=lambda: source)
+    assert camera.start(), "camera service failed to start"
+    try:
+        t = time.monotonic()
+        ts, frame = camera.frame_after(t)
+        exposed = source.exposed[int(frame[0, 0, 0])]
+        assert ts <= exposed, f"stamped {(ts - exposed) * 1000:.1f} ms after the frame was exposed"
+        print(f"timestamps       : stamped {(exposed - ts) * 1000:.1f} ms before exposure, "
+              f"not {source.deliver_s * 1000:.0f} ms after it on delivery")
+    finally:
+        camera.stop()
+
+
+def check_led_settle():
+    source = RampCapture()
+    camera = CameraService(0, capture_factory=lambda: source)
+    assert camera.start(), "camera service failed to start"
+    try:
+        time.sleep(0.1)
+        source.on_at = switched = time.monotonic()
+        ts, frame, settle_s = camera.wait_settled(switched, timeout_s=1.0, min_change=0.05)
+        assert settle_s is not None, "brightness should settle within the timeout"
+        assert int(frame[0, 0, 0]) == 200, f"settled frame still ramping ({frame[0, 0, 0]})"
+        assert settle_s >= source.delay_s + source.ramp_s, "settled before the LED finished rising"
+        print(f"LED settle       : {settle_s * 1000:7.1f} ms (delay {source.delay_s * 1000:.0f} ms "
+              f"+ ramp {source.ramp_s * 1000:.0f} ms), vs fixed 300 ms sleep")
+
+        # nothing changes: min_change is never met and the call gives up at the timeout
+        t = time.monotonic()
+        _, frame, settle_s = camera.wait_settled(t, timeout_s=0.2, min_change=0.05)
+        assert settle_s is None and frame is not None
+    finally:
+        camera.stop()
+
+
+def check_shared_camera():
+    camera = CameraService(0, capture_factory=lambda: SyntheticCapture(open_s=0.0, shape=(120, 160, 3)))
+    assert camera.start(), "camera service failed to start"
+    handlers = [PiBillHandler(use_hardware=False, cascade_file=None, camera=camera,
+                              model_config_file="/nonexistent/model_config.json",
+                              model_watch_interval_s=0, result_cache_ttl_s=0) for _ in range(2)]
+    try:
+        handlers[0].cleanup()
+        assert camera.is_running, "cleanup must not stop a camera the handler did not create"
+        t = time.monotonic()
+        assert camera.frame_after(t)[1] is not None, "the other handler lost its frames"
+        print("shared camera    : still grabbing after one of its two handlers was cleaned up")
+    finally:
+        handlers[1].cleanup()
+        camera.stop()
+
+
+def main():
+    use_camera = "--camera" in sys.argv
+    factory = None if use_camera else SyntheticCapture
+    print("=" * 60)
+    print("Camera Service Test", "(camera 0)" if use_camera else "(synthetic source)")
+    print("=" * 60)
+
+    # old path: open, read one frame, release, for every capture
+    started = time.monotonic()
+    for _ in range(CAPTURES):
+        if use_camera:
+            import cv2
+            cap = cv2.VideoCapture(0)
+        else:
+            cap = SyntheticCapture()
+        ok, frame = cap.read()
+        cap.release()
+        assert ok
+    per_open = (time.monotonic() - started) / CAPTURES
+
+    camera = CameraService(0, buffer_size=4, capture_factory=factory)
+    assert camera.start(), "camera service failed to start"
+    try:
+        waits = []
+        for _ in range(CAPTURES):
+            t = time.monotonic()
+            ts, frame = camera.frame_after(t)
+            assert frame is not None and ts > t, "frame_after returned a stale frame"
+            waits.append(time.monotonic() - t)
+        per_service = sum(waits) / len(waits)
+
+        ts1, f1 = camera.latest()
+        ts2, f2 = camera.latest()
+        if ts1 == ts2:
+            assert f1 is f2, "latest() must hand out the buffered frame, not a copy"
+
+        # concurrent consumers (UV + denomination threads) get frames without blocking the grabber
+        results = []
+        t0 = time.monotonic()
+        threads = [threading.Thread(target=lambda: results.append(camera.frame_after(t0))) for _ in range(4)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        assert all(f is not None for _, f in results)
+        stats = camera.stats()
+    finally:
+        camera.stop()
+
+    print(f"open-per-capture : {per_open * 1000:7.1f} ms/frame")
+    print(f"CameraService    : {per_service * 1000:7.1f} ms/frame (waiting for a frame newer than the call)")
+    print("stats:", stats)
+    assert per_service < per_open / 3, "service should be far cheaper than reopening the device"
+
+    if not use_camera:
+        check_led_settle()
+        check_timestamps()
+        check_shared_camera()
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
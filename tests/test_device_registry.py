@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Device Registry Test - PTY emulators, no hardware needed
+Attaches a coin module and a separate bill sorter, lets DeviceRegistry identify
+them with ID?, then checks that coin events and SORT commands travel on their
+own links. A second pass uses a single legacy board (no ID? support) and checks
+that everything is routed to it as before. Also checks that a port nobody
+answers on is given up quickly and not registered, that probed links get the
+normal READY timeout back, and that registry.close() stops the coin
+handler's threads after writing serial_metrics.json.
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import tty
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bill_handler.python.pi_bill_handler import PiBillHandler
+from coin_handler.python.device_registry import DeviceRegistry
+from coin_handler.python.serial_emulator import ArduinoEmulator
+from coin_handler.python.serial_link import DEFAULT_READY_TIMEOUT_S
+
+
+def split_boards():
+    coin_emu = ArduinoEmulator(device_id="ID:coin_module:COIN,DISPENSE")
+    sorter_emu = ArduinoEmulator(device_id="ID:bill_sorter:SORT,HOME", boot_lines=("[Sorter] Ready",))
+    coin_emu.start()
+    sorter_emu.start()
+
+    registry = DeviceRegistry()
+    registry.discover(ports=[sorter_emu.port, coin_emu.port])
+    roles = {d.role: d.port for d in registry.devices}
+    assert roles == {"coin_module": coin_emu.port, "bill_sorter": sorter_emu.port}, roles
+    assert registry.route("SORT:100").port == sorter_emu.port
+    assert registry.route("DISPENSE:5:2").port == coin_emu.port
+
+    coin_handler = registry.coin_handler()
+    bill_handler = PiBillHandler(use_hardware=False, **registry.bill_handler_kwargs(coin_handler))
+    try:
+        coin_handler.start_accepting(0)
+        time.sleep(0.3)
+        coin_emu.inject_coin(5)
+        assert bill_handler.sort_via_arduino(100, timeout_s=3), "sorter did not acknowledge"
+        time.sleep(0.3)
+        coin_handler.stop_accepting()
+        assert coin_handler.total_value == 5
+        assert any(c.startswith("SORT:") for c in sorter_emu.received), "SORT went to the wrong board"
+        assert not any(c.startswith("SORT:") for c in coin_emu.received)
+        assert "ENABLE_COIN" not in sorter_emu.received
+        # probing opened each board once; the handlers reused those links, upgraded after ID?
+        assert coin_handler.link.open_count == 1
+        assert coin_handler.active_baud == 115200, coin_handler.active_baud
+        assert all(d.link.ready_timeout_s == DEFAULT_READY_TIMEOUT_S for d in registry.devices), \
+            "later reconnects must wait the full READY timeout, not the probe budget"
+        print("split boards: PASS")
+    finally:
+        bill_handler.cleanup()
+        registry.close()
+        coin_emu.stop()
+        sorter_emu.stop()
+    assert not coin_handler.events._thread.is_alive(), "close() must stop the event dispatcher"
+    assert not coin_handler.link.is_open
+    # the registry's coin handler keeps serial metrics without being asked to
+    with open("serial_metrics.json") as f:
+        assert "ENABLE_COIN" in json.load(f)["commands"], "shutdown should write the last metrics snapshot"
+
+
+def legacy_board():
+    emu = ArduinoEmulator(device_id=None)
+    emu.start()
+    registry = DeviceRegistry()
+    registry.discover(ports=[emu.port])
+    assert [d.role for d in registry.devices] == ["merged_handler"]
+    coin_handler = registry.coin_handler()
+    kwargs = registry.bill_handler_kwargs(coin_handler)
+    assert kwargs == {"serial_manager": coin_handler}, kwargs
+    try:
+        assert coin_handler.send_sort_command(50, timeout_s=3), "merged board did not sort"
+        print("legacy board: PASS")
+    finally:
+        coin_handler.shutdown()
+        registry.close()
+        emu.stop()
+
+
+def silent_port():
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    registry = DeviceRegistry(probe_timeout_s=0.5)
+    try:
+        started = time.monotonic()
+        registry.discover(ports=[os.ttyname(slave)])
+        elapsed = time.monotonic() - started
+        print(f"silent port probed in {elapsed:.2f}s")
+        assert elapsed < 3.0, "a port that never answers must not cost the full READY wait"
+        assert registry.devices == [], "a port that never answered must not get routes"
+    finally:
+        registry.close()
+        os.close(master)
+        os.close(slave)
+
+
+def main():
+    print("=" * 60)
+    print("Device Registry Test (PTY emulators)")
+    print("=" * 60)
+    os.chdir(tempfile.mkdtemp(prefix="coinnect_registry_"))
+    split_boards()
+    legacy_board()
+    silent_port()
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
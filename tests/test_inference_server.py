@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Inference Server Test
+Runs an InferenceServer over a temporary Unix socket with stand-in models.
+FakeModel costs a fixed time per frame, like the ncnn exports that run a
+batch frame by frame. BatchModel has a real predict_batch: a fixed
+overhead plus a small per-image time. Several "acceptors" call the server
+concurrently. Checks that every reply reaches the right caller, and that
+the server only waits for batch company when the models can batch. It
+also checks that concurrent requests get batched there, and that the stats
+report queue depth and batch sizes. A client whose frames outgrow its
+shared-memory slot must not leave the server mapping the old segment, and
+one that gave up waiting must not reuse the slot the server is still reading.
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bill_handler.python.inference_server import BATCH_WAIT_MS, InferenceClient, InferenceServer, RemoteClassifier
+
+ACCEPTORS = 4
+REQUESTS_EACH = 10
+BATCH_OVERHEAD_S = 0.02
+PER_IMAGE_S = 0.002
+PER_FRAME_S = 0.005
+
+
+class FakeModel:
+    """Probabilities encode the frame's marker pixel, so misrouted replies are caught. Cost is linear in frames."""
+
+    def __init__(self, classes=4):
+        self.names = {i: f"class{i}" for i in range(classes)}
+
+    def predict_probs(self, frame):
+        time.sleep(PER_FRAME_S)
+        return self.encode(frame)
+
+    def encode(self, frame):
+        probs = np.full(len(self.names), 0.1, dtype=np.float32)
+        probs[int(frame[0, 0, 0]) % len(self.names)] = 0.7
+        return probs
+
+
+class BatchModel(FakeModel):
+    """A backend that really batches: one overhead per call, then a little per image."""
+
+    def predict_batch(self, frames):
+        time.sleep(BATCH_OVERHEAD_S + PER_IMAGE_S * len(frames))
+        return [self.encode(frame) for frame in frames]
+
+
+def run_acceptors(model_cls):
+    """ACCEPTORS threads x REQUESTS_EACH scans against a fresh server; returns (wall, latencies, errors, stats)."""
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="infer_test_"), "infer.sock")
+    server = InferenceServer({"uv": model_cls, "denom": model_cls}, socket_path=socket_path, max_batch=4)
+    server.start()
+    errors = []
+    latencies = []
+
+    def acceptor(idx):
+        client = InferenceClient(socket_path)
+        names = client.models()
+        uv = RemoteClassifier(client, "uv", names["uv"])
+        denom = RemoteClassifier(client, "denom", names["denom"])
+        try:
+            for n in range(REQUESTS_EACH):
+                marker = (idx + n) % 4
+                frame = np.zeros((480, 640, 3), dtype=np.uint8)
+                roi = frame[:, 80:560]  # non-contiguous view, as handed over by crop()
+                roi[0, 0, 0] = marker
+                t = time.monotonic()
+                label, conf = (uv if n % 2 else denom).classify(roi)
+                latencies.append(time.monotonic() - t)
+                if label != f"class{marker}" or abs(conf - 0.7) > 1e-6:
+                    errors.append((idx, n, label, conf))
+        finally:
+            client.close()
+
+    try:
+        started = time.monotonic()
+        threads = [threading.Thread(target=acceptor, args=(i,)) for i in range(ACCEPTORS)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        wall = time.monotonic() - started
+
+        client = InferenceClient(socket_path)
+        stats = client.stats()
+        client.close()
+    finally:
+        server.stop()
+    assert not os.path.exists(socket_path), "socket should be removed on stop"
+    return wall, latencies, errors, stats
+
+
+def report(name, wall, latencies, stats, serial):
+    print(f"{name}: {stats['requests']} requests from {ACCEPTORS} acceptors in {wall * 1000:.0f} ms "
+          f"(one call per request: {serial * 1000:.0f} ms), wait {stats['max_wait_ms']:.1f} ms")
+    print(f"  mean batch {stats['mean_batch']:.2f}, sizes {stats['batch_sizes']}, "
+          f"max queue depth {stats['max_queue_depth']}")
+    print(f"  mean client latency {np.mean(latencies) * 1000:.1f} ms, "
+          f"queue wait p99 {stats['queue_wait']['p99_ms']:.1f} ms")
+
+
+def check_shm_resize():
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="infer_test_"), "infer.sock")
+    server = InferenceServer({"uv": FakeModel}, socket_path=socket_path, max_wait_ms=0)
+    server.start()
+    client = InferenceClient(socket_path, slots=1)
+    try:
+        uv = RemoteClassifier(client, "uv", client.models()["uv"])
+        uv.classify(np.zeros((120, 120, 3), dtype=np.uint8))
+        (conn,) = server._clients
+        (small,) = conn.segments.values()
+        for _ in range(2):  # the first larger frame replaces the slot, the next one lets the old view go
+            uv.classify(np.zeros((480, 480, 3), dtype=np.uint8))
+        assert len(conn.segments) == 1 and not conn.retired, (conn.segments, conn.retired)
+        assert small.buf is None, "the server must close its mapping of the replaced segment"
+        print("slot resized: server unmapped the old segment")
+    finally:
+        client.close()
+        server.stop()
+
+
+class SlowModel(FakeModel):
+    """Reads the frame only after a delay, and records the marker it saw."""
+
+    seen = []
+
+    def predict_probs(self, frame):
+        time.sleep(0.3)
+        SlowModel.seen.append(int(frame[0, 0, 0]))
+        return self.encode(frame)
+
+
+def check_timeout_quarantine():
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="infer_test_"), "infer.sock")
+    server = InferenceServer({"uv": SlowModel}, socket_path=socket_path, max_wait_ms=0)
+    server.start()
+    client = InferenceClient(socket_path, slots=2, timeout_s=0.1)
+    try:
+        names = client.models()["uv"]
+        frame = np.zeros((120, 120, 3), dtype=np.uint8)
+        frame[0, 0, 0] = 1
+        try:
+            client.predict_probs("uv", frame)
+            raise AssertionError("a 0.3 s model should time out a 0.1 s client")
+        except TimeoutError:
+            pass
+        client.timeout_s = 5.0
+        frame[0, 0, 0] = 2  # must go to another slot: the server has not read marker 1 yet
+        probs = client.predict_probs("uv", frame)
+        assert names[int(np.argmax(probs))] == "class2"
+        assert SlowModel.seen[-2:] == [1, 2], f"the timed-out frame was overwritten: server saw {SlowModel.seen}"
+        deadline = time.monotonic() + 2
+        while client._held and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not client._held and len(client._slots._free) == 2, "the late reply should free the slot"
+        print("timed-out request: slot kept until the late reply, next frame used another slot")
+    finally:
+        client.close()
+        server.stop()
+
+
+def main():
+    print("=" * 60)
+    print("Inference Server Test")
+    print("=" * 60)
+    total = ACCEPTORS * REQUESTS_EACH
+
+    # per-frame backend: no waiting for company, since a batch costs what its frames cost
+    wall, latencies, errors, stats = run_acceptors(FakeModel)
+    report("per-frame", wall, latencies, stats, total * PER_FRAME_S)
+    assert not errors, f"misrouted replies: {errors[:5]}"
+    assert stats["requests"] == total and stats["errors"] == 0
+    assert stats["max_wait_ms"] == 0, "a backend that cannot batch must not wait for company"
+
+    # batching backend: concurrent requests share one call
+    serial = total * (BATCH_OVERHEAD_S + PER_IMAGE_S)
+    wall, latencies, errors, stats = run_acceptors(BatchModel)
+    report("batching", wall, latencies, stats, serial)
+    assert not errors, f"misrouted replies: {errors[:5]}"
+    assert stats["requests"] == total and stats["errors"] == 0
+    assert stats["max_wait_ms"] == BATCH_WAIT_MS
+    assert stats["mean_batch"] > 1.2, "concurrent requests should share batches"
+    assert wall < serial, "batching should beat one model call per request"
+
+    check_shm_resize()
+    check_timeout_quarantine()
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Inference Worker Test
+Starts an InferenceWorker whose child process serves stand-in models (this
+script re-run with --serve). Frames travel through shared memory. Checks
+that results come back correctly, then SIGKILLs the worker between scans and
+checks that the supervisor restarts it and the client's next scan succeeds
+after one retry.
+"""
+
+import sys
+import os
+import signal
+import tempfile
+import time
+
+import numpy as np
+
+# Ensure project root is in path
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(TESTS_DIR, "..")))
+sys.path.append(TESTS_DIR)
+
+from bill_handler.python.inference_server import InferenceClient, InferenceServer, RemoteClassifier
+from bill_handler.python.inference_worker import InferenceWorker
+from test_inference_server import PER_FRAME_S, FakeModel
+
+
+def serve(socket_path):
+    server = InferenceServer({"uv": FakeModel, "denom": FakeModel}, socket_path=socket_path, max_wait_ms=0)
+    signal.signal(signal.SIGTERM, lambda *_: server._stopped.set())
+    server.serve_forever()
+
+
+def scan(model, marker):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    roi = frame[:, 80:560]
+    roi[0, 0, 0] = marker
+    label, _ = model.classify(roi)
+    assert label == f"class{marker}", f"expected class{marker}, got {label}"
+
+
+def main():
+    print("=" * 60)
+    print("Inference Worker Test")
+    print("=" * 60)
+
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="infer_worker_"), "worker.sock")
+    worker = InferenceWorker(socket_path, command=[sys.executable, os.path.abspath(__file__), "--serve", socket_path],
+                             ready_timeout_s=20.0)
+    t = time.monotonic()
+    assert worker.start(), "worker did not come up"
+    print(f"worker pid {worker.proc.pid} ready in {(time.monotonic() - t) * 1000:.0f} ms")
+
+    client = InferenceClient(socket_path, timeout_s=5.0, wait_ready=worker.wait_ready)
+    try:
+        assert client._slots is not None, "shared memory transport should be in use"
+        names = client.models()
+        uv = RemoteClassifier(client, "uv", names["uv"])
+        pid = client.ping()
+        assert pid == worker.proc.pid and pid != os.getpid()
+
+        times = []
+        for n in range(10):
+            t = time.monotonic()
+            scan(uv, n % 4)
+            times.append(time.monotonic() - t)
+        print(f"scan via worker: {np.mean(times) * 1000:.1f} ms mean (model itself {PER_FRAME_S * 1000:.0f} ms)")
+
+        # crash between scans
+        os.kill(pid, signal.SIGKILL)
+        t = time.monotonic()
+        scan(uv, 3)
+        recovered = time.monotonic() - t
+        print(f"after SIGKILL: scan succeeded in {recovered * 1000:.0f} ms, "
+              f"worker restarts {worker.restarts}, client reconnects {client.reconnects}")
+        assert worker.restarts == 1 and client.reconnects == 1
+        assert client.ping() == worker.proc.pid != pid
+        assert worker.stats()["last_exit_code"] == -signal.SIGKILL
+    finally:
+        client.close()
+        worker.stop()
+
+    assert worker.proc.poll() is not None, "worker should be gone after stop()"
+    assert not os.path.exists(socket_path)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        serve(sys.argv[sys.argv.index("--serve") + 1])
+    else:
+        main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Model Hot Swap Test
+A PiBillHandler whose UV slot is watched by ModelManager, with stand-in
+models whose "weights" are a version string. Checks that:
+ - a half-written update is not loaded; a settled one is loaded and staged
+ - a staged version is never installed during accept_bill, only once it ends
+ - an idle handler installs a staged version at once
+ - rollback_models() switches back instantly, and the rolled-back files are
+   not reloaded until they change again
+ - a version that fails its warm-up check is never installed
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bill_handler.python.pi_bill_handler import PiBillHandler
+
+
+class FakeModel:
+    names = {0: "fake", 1: "genuine"}
+
+    def __init__(self, path):
+        with open(os.path.join(path, "model.ncnn.bin")) as f:
+            self.version = f.read()
+
+    def predict_probs(self, frame):
+        if self.version == "broken":
+            return np.full(2, np.nan, dtype=np.float32)
+        return np.array([0.1, 0.9], dtype=np.float32)
+
+
+def write_model(path, version):
+    os.makedirs(path, exist_ok=True)
+    for name, content in (("model.ncnn.param", "7767517\n"), ("model.ncnn.bin", version),
+                          ("metadata.yaml", "names:\n  0: fake\n  1: genuine\n")):
+        with open(os.path.join(path, name), "w") as f:
+            f.write(content)
+
+
+def settle(manager):
+    """Two polls: the first sees the change, the second confirms it is stable."""
+    manager.poll_once()
+    return manager.poll_once()
+
+
+def main():
+    print("=" * 60)
+    print("Model Hot Swap Test")
+    print("=" * 60)
+    root = tempfile.mkdtemp(prefix="hot_swap_")
+    uv_dir = os.path.join(root, "uv_cls_v2_ncnn_model")
+    write_model(uv_dir, "v1")
+
+    handler = PiBillHandler(use_hardware=False, cascade_file=None, model_config_file=os.path.join(root, "none.json"),
+                            model_watch_interval_s=3600)
+    try:
+        handler.wait_models_ready(30)
+        handler._load_for_swap = lambda slot, path: FakeModel(path)
+        handler.uv_model, handler.uv_labels = FakeModel(uv_dir), FakeModel.names
+        handler._start_model_manager({"uv": uv_dir}, {"uv": handler.uv_model})
+        manager = handler.model_manager
+
+        # 1. update arrives while a transaction is running
+        in_txn, finish = threading.Event(), threading.Event()
+        seen = []
+
+        def transaction(required_denom, **kwargs):
+            seen.append(handler.uv_model.version)
+            in_txn.set()
+            finish.wait(10)
+            seen.append(handler.uv_model.version)
+            return False, None, "timeout_no_bill"
+
+        handler._accept_bill = transaction
+        txn = threading.Thread(target=handler.accept_bill, args=(100,))
+        txn.start()
+        in_txn.wait(5)
+
+        write_model(uv_dir, "v2")
+        assert manager.poll_once() == [], "an unsettled change must not be loaded"
+        assert manager.poll_once() == ["uv"], "a settled change should be staged"
+        assert handler.uv_model.version == "v1" and manager.has_pending(), "no swap mid-transaction"
+        finish.set()
+        txn.join(5)
+        assert seen == ["v1", "v1"], seen
+        assert handler.uv_model.version == "v2" and not manager.has_pending()
+        print("update staged during a transaction, installed when it ended")
+
+        # 2. rollback while idle is immediate; the rolled-back files are not picked up again
+        assert handler.rollback_models("uv") == ["uv"] and handler.uv_model.version == "v1"
+        assert settle(manager) == [] and handler.uv_model.version == "v1"
+        print("rollback to v1 immediate; v2 on disk left alone")
+
+        # 3. a newer version is loaded and installed at once when idle
+        write_model(uv_dir, "v3")
+        assert settle(manager) == ["uv"] and handler.uv_model.version == "v3"
+        print("idle handler installed v3 right after staging")
+
+        # 4. a version failing its warm-up check never goes live
+        write_model(uv_dir, "broken")
+        assert settle(manager) == [] and handler.uv_model.version == "v3"
+        assert manager.stats["failures"] == 1
+        print("broken version rejected; still on v3")
+        print("versions", manager.versions()["uv"])
+        print("stats", manager.stats)
+    finally:
+        handler.cleanup()
+        shutil.rmtree(root, ignore_errors=True)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
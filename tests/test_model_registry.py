@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Model Registry Test
+Loads stand-in models through ModelRegistry. Checks that:
+ - identical exports in two directories are loaded once (keyed by content hash)
+ - a caller waiting on a load that fails retries it, and a later call loads again
+ - release() drops references and the last release closes the model
+ - non-ncnn models are wrapped so concurrent calls take turns
+ - hot swaps through ModelManager unload replaced versions: memory stays flat
+   over repeated deploys
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bill_handler.python.model_manager import ModelManager
+from bill_handler.python.model_registry import ModelRegistry, SerializedModel
+
+
+class FakeModel:
+    names = {0: "fake", 1: "genuine"}
+
+    def __init__(self):
+        self.closed = False
+        self.active = 0
+        self.max_active = 0
+
+    def predict(self, frame, verbose=False):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)  # long enough for unsynchronised callers to overlap
+        self.active -= 1
+        return [frame]
+
+    def close(self):
+        self.closed = True
+
+
+class BigModel(FakeModel):
+    """FakeModel holding WEIGHT_BYTES of weights, like an ncnn net in memory."""
+
+    WEIGHT_BYTES = 8 << 20
+
+    def __init__(self):
+        super().__init__()
+        self.weights = np.ones(self.WEIGHT_BYTES, dtype=np.uint8)
+
+    def close(self):
+        super().close()
+        self.weights = None
+
+
+def write_model(path, weights):
+    os.makedirs(path, exist_ok=True)
+    for name, content in (("model.ncnn.param", "7767517\n"), ("model.ncnn.bin", weights)):
+        with open(os.path.join(path, name), "w") as f:
+            f.write(content)
+
+
+def check_deploys(root):
+    registry = ModelRegistry()
+    live = os.path.join(root, "live")
+    write_model(live, "deploy-0")
+    load = lambda slot, path: registry.get_or_load(path, "ncnn", BigModel)  # noqa: E731
+    installed = {"uv": load("uv", live)}
+    manager = ModelManager({"uv": live}, load=load, current=dict(installed), release=registry.release, poll_s=3600)
+    apply = installed.__setitem__
+
+    tracemalloc.start()
+    try:
+        usage = []
+        for n in range(1, 5):
+            write_model(live, f"deploy-{n}")
+            manager.poll_once()
+            assert manager.poll_once() == ["uv"] and manager.swap_pending(apply) == ["uv"]
+            usage.append(tracemalloc.get_traced_memory()[0])
+    finally:
+        tracemalloc.stop()
+    models = registry.stats()["models"]
+    mb = [round(u / (1 << 20)) for u in usage]
+    print(f"memory after each deploy (MB above start): {mb}; {len(models)} versions loaded")
+    # current + previous (kept for rollback) only
+    assert len(models) == 2, models
+    assert usage[-1] <= usage[1] + BigModel.WEIGHT_BYTES // 2, "replaced versions must be unloaded"
+    manager.stop()
+
+
+def main():
+    print("=" * 60)
+    print("Model Registry Test")
+    print("=" * 60)
+    root = tempfile.mkdtemp(prefix="model_registry_")
+    try:
+        a, b, other = (os.path.join(root, d) for d in ("a", "b", "other"))
+        write_model(a, "weights-v1")
+        write_model(b, "weights-v1")
+        write_model(other, "weights-v2")
+
+        # 1. dedup by content hash
+        registry = ModelRegistry()
+        first = registry.get_or_load(a, "ncnn", FakeModel)
+        assert registry.get_or_load(b, "ncnn", FakeModel) is first, "same content must share one model"
+        assert registry.get_or_load(other, "ncnn", FakeModel) is not first
+        assert (registry.loads, registry.hits) == (2, 1), registry.stats()
+        print("two copies of one export loaded once; a different export loaded separately")
+
+        # 2. a failed load is retried by the caller waiting on it, and by later callers
+        registry = ModelRegistry()
+        started, fail = threading.Event(), threading.Event()
+
+        def failing_loader():
+            started.set()
+            fail.wait(5)
+            raise RuntimeError("corrupt weights")
+
+        errors, waited = [], []
+
+        def owner():
+            try:
+                registry.get_or_load(a, "ncnn", failing_loader)
+            except RuntimeError as e:
+                errors.append(e)
+
+        t = threading.Thread(target=owner)
+        t.start()
+        started.wait(5)
+        waiter = threading.Thread(target=lambda: waited.append(registry.get_or_load(a, "ncnn", FakeModel)))
+        waiter.start()
+        time.sleep(0.05)  # the waiter is now blocked on the failing load
+        fail.set()
+        t.join(5)
+        waiter.join(5)
+        assert errors and waited and isinstance(waited[0], FakeModel), (errors, waited)
+        assert registry.stats()["models"][0]["refs"] == 1, "the failed caller must not hold a reference"
+        assert registry.get_or_load(a, "ncnn", FakeModel) is waited[0]
+        print("failed load raised for its caller; the waiting caller retried and loaded")
+
+        # 3. the last release closes the model
+        registry = ModelRegistry()
+        m1 = registry.get_or_load(a, "ncnn", FakeModel)
+        m2 = registry.get_or_load(b, "ncnn", FakeModel)
+        kept = registry.get_or_load(other, "ncnn", FakeModel)
+        registry.release(m1)
+        assert not m1.closed and len(registry.stats()["models"]) == 2, "one reference is still held"
+        registry.release(m2)
+        assert m1.closed and not kept.closed and registry.evict_unused() == 0
+        registry.release(None)  # ignored
+        registry.release(m1)  # already gone: ignored
+        assert [e["refs"] for e in registry.stats()["models"]] == [1]
+        print("model closed as soon as its last reference was released")
+
+        # 4. non-ncnn models are serialised
+        registry = ModelRegistry()
+        yolo = registry.get_or_load(a, "ultralytics", FakeModel)
+        assert isinstance(yolo, SerializedModel) and yolo.names == FakeModel.names
+        threads = [threading.Thread(target=yolo.predict, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert yolo.wrapped.max_active == 1, "calls on a shared ultralytics model must not overlap"
+        assert not isinstance(registry.get_or_load(other, "ncnn", FakeModel), SerializedModel)
+        print("ultralytics model wrapped: 8 concurrent predicts ran one at a time")
+
+        # 5. repeated hot swaps do not pile up loaded versions
+        check_deploys(root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
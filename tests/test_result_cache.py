@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Result Cache Test
+Synthetic UV ROIs: the same bill reinserted (shifted a few pixels, sensor
+noise, slight brightness change) must hit. A different design must miss,
+and so must a copy of the same note that glows evenly brighter under UV
+(uniform offset or gain), which leaves the dHash unchanged. Entries expire
+after the TTL, and discard() forgets a bill that went into storage.
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bill_handler.python.result_cache import ResultCache, hamming
+
+SHAPE = (480, 480)
+
+
+def uv_roi(seed=0, shift=(0, 0), gain=1.0, offset=0.0, noise=0.0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:SHAPE[0] + 16, 0:SHAPE[1] + 16].astype(np.float32)
+    # fluorescent fibres/strip of a note: a few blobs and bands whose layout depends on the note
+    img = np.full(x.shape, 30.0, dtype=np.float32)
+    for cy, cx, r, a in rng.uniform((0, 0, 20, 40), (SHAPE[0], SHAPE[1], 90, 120), size=(6, 4)):
+        img += a * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * r * r))
+    img += 25 * np.sin(x / rng.uniform(15, 40)) * np.cos(y / rng.uniform(15, 40))
+    dy, dx = shift
+    img = img[8 + dy:8 + dy + SHAPE[0], 8 + dx:8 + dx + SHAPE[1]] * gain + offset
+    img += np.random.default_rng(seed + 1000).normal(0, noise, img.shape) if noise else 0
+    gray = np.clip(img, 0, 255).astype(np.uint8)
+    return np.repeat(gray[..., None], 3, axis=2)
+
+
+def main():
+    print("=" * 60)
+    print("Result Cache Test")
+    print("=" * 60)
+
+    cache = ResultCache(ttl_s=0.5)
+    original = uv_roi(seed=1)
+    key = cache.key(original)
+    cache.put(key, {"denom": 100, "confidence": {"uv": 0.97, "denom": 0.91}})
+
+    t = time.perf_counter()
+    for _ in range(20):
+        cache.key(original)
+    print(f"hash: {(time.perf_counter() - t) / 20 * 1000:.2f} ms per ROI")
+
+    reinserts = [
+        ("shifted 3px", uv_roi(seed=1, shift=(3, -2))),
+        ("shifted 5px", uv_roi(seed=1, shift=(5, 5))),
+        ("noisy", uv_roi(seed=1, noise=4.0)),
+        ("dimmer", uv_roi(seed=1, gain=0.92, shift=(-1, 2))),
+    ]
+    for name, frame in reinserts:
+        d = hamming(key.bits, cache.key(frame).bits)
+        hit = cache.get(cache.key(frame))
+        print(f"{name:<14} {d:>3} bits -> {'hit' if hit else 'miss'}")
+        assert hit is not None and hit["denom"] == 100 and hit["confidence"]["uv"] == 0.97, name
+
+    others = [
+        ("other note", uv_roi(seed=2)),
+        ("other note", uv_roi(seed=3, shift=(2, 2))),
+        ("glows +40", uv_roi(seed=1, offset=40)),
+        ("glows +80", uv_roi(seed=1, offset=80)),
+        ("glows x1.5", uv_roi(seed=1, gain=1.5)),
+        ("glows x1.3+60", uv_roi(seed=1, gain=1.3, offset=60)),
+    ]
+    for name, frame in others:
+        d = hamming(key.bits, cache.key(frame).bits)
+        hit = cache.get(cache.key(frame))
+        print(f"{name:<14} {d:>3} bits -> {'hit' if hit else 'miss'}")
+        assert hit is None, name
+
+    assert cache.stats["hits"] == 4 and cache.stats["misses"] == 6
+    print(f"hit rate {cache.hit_rate * 100:.0f}%")
+
+    cache.discard(cache.key(reinserts[0][1]))
+    assert len(cache) == 0 and cache.get(key) is None, "discard should drop the near-identical entry"
+
+    cache.put(key, {"denom": 50, "confidence": {}})
+    time.sleep(0.6)
+    assert cache.get(key) is None and cache.stats["expired"] == 1, "entry should expire after the TTL"
+    print("stats", cache.stats)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
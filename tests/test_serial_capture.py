@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Serial Capture Test - PTY emulator, no hardware needed
+Records a short coin session to a binary capture, then replays it through a
+fresh CoinHandlerSerial at 100x and checks that parsing, storage and callbacks
+see the same coins.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from coin_handler.python.coin_handler_serial import CoinHandlerSerial
+from coin_handler.python.coin_storage import CoinStorage
+from coin_handler.python.serial_capture import OUTBOUND, read_capture, replay
+from coin_handler.python.serial_emulator import ArduinoEmulator
+
+COINS = [1, 5, 10, 20, 5, 1]
+
+
+def main():
+    print("=" * 60)
+    print("Serial Capture Test (PTY emulator)")
+    print("=" * 60)
+
+    workdir = tempfile.mkdtemp(prefix="coinnect_capture_")
+    os.chdir(workdir)
+    capture_path = os.path.join(workdir, "capture.bin")
+
+    # --- Record ---
+    emu = ArduinoEmulator()
+    emu.start()
+    handler = CoinHandlerSerial(port=emu.port, capture_path=capture_path)
+    try:
+        handler.start_accepting(0)
+        time.sleep(0.3)
+        for denom in COINS:
+            emu.emit("[Homing] Moving toward HOME...")
+            emu.inject_coin(denom)
+            time.sleep(0.05)
+        time.sleep(0.3)
+        handler.stop_accepting()
+        time.sleep(0.2)
+    finally:
+        handler.shutdown()
+        emu.stop()
+
+    records = list(read_capture(capture_path))
+    size = os.path.getsize(capture_path)
+    print(f"Captured {len(records)} lines in {size} bytes")
+    assert any(d == OUTBOUND and line == "ENABLE_COIN" for _, d, line in records), "outbound ENABLE_COIN missing"
+    assert all(records[i][0] <= records[i + 1][0] for i in range(len(records) - 1)), "timestamps not monotonic"
+
+    # --- Replay at 100x into a scratch storage ---
+    replay_handler = CoinHandlerSerial(port=None, storage=CoinStorage(storage_file=os.path.join(workdir, "replay.json")))
+    seen = []
+    replay_handler.add_callback(lambda denom, count, total: seen.append(denom))
+    summary = replay(capture_path, replay_handler, speed=100)
+    print(f"Replay: {summary['inbound']} inbound lines, capture {summary['capture_s']:.2f}s "
+          f"-> wall {summary['wall_s']:.2f}s, tags {summary['tags']}")
+
+    assert seen == COINS, f"replayed coins {seen} != {COINS}"
+    assert replay_handler.total_value == sum(COINS)
+    assert summary["wall_s"] < summary["capture_s"], "100x replay should be faster than real time"
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Serial Connection Test - PTY emulator, no hardware needed
+Checks that CoinHandlerSerial opens on the firmware's READY line instead of a
+fixed sleep, keeps the link open across several payouts, reconnects after
+the port is dropped (while the reader thread is blocked in a read), that
+shutdown stops the reader, and that session-scoped callbacks do not accumulate.
+A board with DTR reset suppressed keeps its negotiated rate across a reopen
+and a host restart; the link must find it there.
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from coin_handler.python.coin_handler_serial import CoinHandlerSerial
+from coin_handler.python.serial_emulator import ArduinoEmulator
+from coin_handler.python.serial_link import BaudStore, SerialConnection
+
+
+def check_no_reset_reopen():
+    emu = ArduinoEmulator(dtr_reset=False, garble_on_mismatch=True)
+    emu.start()
+    store = BaudStore("no_reset_baud.json")
+    link = SerialConnection(emu.port, suppress_dtr_reset=True, baud_store=store, ready_timeout_s=1.0)
+    restarted = None
+    try:
+        assert link.open() and link.active_baud == emu.baud == 115200, (link.active_baud, emu.baud)
+
+        # reopen: the board was not reset and is still at 115200
+        link.close()
+        time.sleep(0.2)
+        assert link.open(), "reopen failed"
+        entry = link.open_trace[-1]
+        assert entry["ready"] and entry["baud"] == 115200 and entry["cost_s"] < 1.5, entry
+
+        # host restart: a new link knows the rate only from the baud store
+        link.close()
+        time.sleep(0.2)
+        restarted = SerialConnection(emu.port, suppress_dtr_reset=True, baud_store=BaudStore("no_reset_baud.json"),
+                                     ready_timeout_s=1.0)
+        assert restarted.open(), "open after host restart failed"
+        entry = restarted.open_trace[-1]
+        assert entry["ready"] and entry["baud"] == 115200 and entry["cost_s"] < 1.5, entry
+        restarted.write_line("ID?")
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and not restarted.readline().startswith(b"ID:"):
+            pass
+        assert time.monotonic() < deadline, "board does not answer after the restart"
+        print(f"No-reset board kept 115200 across reopen and host restart "
+              f"(resumed in {entry['cost_s']:.2f}s, {emu.garbled} garbled writes): OK")
+    finally:
+        link.close()
+        if restarted is not None:
+            restarted.close()
+        emu.stop()
+
+
+def main():
+    print("=" * 60)
+    print("Serial Connection Test (PTY emulator)")
+    print("=" * 60)
+
+    os.chdir(tempfile.mkdtemp(prefix="coinnect_connection_"))
+
+    emu = ArduinoEmulator()
+    emu.start()
+    handler = CoinHandlerSerial(port=emu.port)
+    done = threading.Event()
+
+    try:
+        assert handler.open(), "open against emulator failed"
+        first = handler.link.open_trace[-1]
+        print(f"First open: {first['cost_s']:.2f}s ready={first['ready']} baud={first['baud']}")
+        assert first["ready"], "READY banner not detected"
+        assert first["cost_s"] < 2.0, "open should not pay the old fixed 2s sleep"
+
+        # several payouts, each in its own callback session, must reuse the same link
+        baseline = handler.subscriber_counts()
+        for denom in (1, 5, 10):
+            with handler.session() as session:
+                session.add_dispense_done_callback(lambda d, q: done.set())
+                done.clear()
+                handler.dispense(denom, 1)
+                assert done.wait(timeout=5), f"no DISPENSE_DONE for {denom}"
+        assert handler.link.open_count == 1, f"expected 1 open, got {handler.link.open_count}"
+        assert handler.subscriber_counts() == baseline, f"callbacks leaked: {handler.subscriber_counts()}"
+        print("Three payouts on one open, no leaked callbacks: OK")
+
+        # drop the port and reconnect (emulator re-announces READY like a reset board)
+        handler.close()
+        time.sleep(0.2)  # let the emulator notice the hang-up
+        start = time.monotonic()
+        assert handler.link.reconnect(), "reconnect failed"
+        print(f"Reconnect took {time.monotonic() - start:.2f}s (open #{handler.link.open_count})")
+
+        handler.shutdown()
+        assert not handler._reader_thread.is_alive(), "shutdown must stop the reader thread"
+        assert handler.link.readline() == b"", "a closed link reads as empty, not as an error"
+        try:
+            handler.link.write_line("PING")
+            raise AssertionError("write on a closed link should fail")
+        except ConnectionError:
+            pass
+        print("Shutdown joined the reader; closed link reads empty and refuses writes: OK")
+
+        check_no_reset_reopen()
+        print("PASS")
+    finally:
+        handler.shutdown()
+        emu.stop()
+
+
+if __name__ == "__main__":
+    main()
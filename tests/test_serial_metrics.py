@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Serial Metrics Test - PTY emulator, no hardware needed
+Runs sorts and payouts against the emulator (with a slow hopper), plus one
+bad sort, one bad payout and one unanswered sort, then checks the per-command
+/ per-denomination latency histograms, error and timeout counts, and the
+periodic JSON dump.
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from coin_handler.python.coin_handler_serial import CoinHandlerSerial
+from coin_handler.python.serial_emulator import ArduinoEmulator
+from coin_handler.python.serial_metrics import LatencyHistogram
+
+
+def check_histogram():
+    hist = LatencyHistogram()
+    for ms in range(1, 1001):
+        hist.record(ms / 1000.0)
+    d = hist.as_dict()
+    # log buckets: every percentile within ~6% of the exact value
+    for key, exact in (("p50_ms", 500), ("p90_ms", 900), ("p99_ms", 990)):
+        assert abs(d[key] - exact) / exact < 0.07, (key, d[key])
+    assert d["count"] == 1000 and d["max_ms"] == 1000.0
+    print("histogram:", {k: round(v, 1) for k, v in d.items()})
+
+
+def main():
+    print("=" * 60)
+    print("Serial Metrics Test (PTY emulator)")
+    print("=" * 60)
+    workdir = tempfile.mkdtemp(prefix="coinnect_metrics_")
+    os.chdir(workdir)
+    check_histogram()
+
+    dump_path = os.path.join(workdir, "serial_metrics.json")
+    emu = ArduinoEmulator(dispense_delay_s=0.15, sort_delay_s=0.05)
+    emu.start()
+    handler = CoinHandlerSerial(port=emu.port, metrics_path=dump_path, metrics_interval_s=0.5)
+    try:
+        handler.start_accepting(0)
+        time.sleep(0.3)
+        handler.stop_accepting()
+
+        for denom in (20, 50, 100, 20):
+            assert handler.send_sort_command(denom, timeout_s=3)
+        assert not handler.send_sort_command(7, timeout_s=3), "unknown bill must fail"
+
+        for denom, qty in ((5, 1), (5, 2), (10, 1)):
+            handler.dispense(denom, qty)
+        handler.dispense(3, 1)  # firmware rejects with ERR
+        time.sleep(1.2)
+
+        emu.sort_delay_s = 1.0
+        assert not handler.send_sort_command(50, timeout_s=0.3), "slow sort should time out"
+        time.sleep(1.0)  # let the late [OK] arrive and periodic dump run
+
+        snap = handler.metrics_snapshot()
+        cmds = snap["commands"]
+        print(json.dumps({c: {k: v for k, v in d.items() if k != "by_denom"} for c, d in cmds.items()}, indent=2))
+
+        assert cmds["SORT"]["count"] == 4, cmds["SORT"]
+        assert cmds["SORT"]["errors"] == 1 and cmds["SORT"]["by_denom"]["7"]["errors"] == 1
+        assert cmds["SORT"]["timeouts"] == 1 and cmds["SORT"]["by_denom"]["50"]["timeouts"] == 1
+        assert cmds["SORT"]["by_denom"]["20"]["count"] == 2
+        assert cmds["DISPENSE_ACK"]["count"] == 3 and cmds["DISPENSE_ACK"]["errors"] == 1
+        done = cmds["DISPENSE_DONE"]["by_denom"]
+        assert done["5"]["count"] == 2 and done["10"]["count"] == 1
+        # hopper run time grows with qty (0.15s per coin in the emulator)
+        assert done["5"]["max_ms"] >= 280, done["5"]
+        assert cmds["ENABLE_COIN"]["count"] == 1 and cmds["DISABLE_COIN"]["count"] == 1
+
+        with open(dump_path) as f:
+            dumped = json.load(f)
+        assert "SORT" in dumped["commands"], "periodic dump missing"
+    finally:
+        handler.shutdown()
+        emu.stop()
+
+    with open(dump_path) as f:
+        final = json.load(f)
+    assert final["commands"]["SORT"]["count"] == 4
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Serial Throughput Test - PTY emulator, no hardware needed
+Measures how fast CoinHandlerSerial ingests a burst of COIN events mixed with
+firmware chatter, once pinned at the 9600 boot rate and once after baud
+negotiation, and checks that old firmware (no BAUD command) stays at 9600.
+A slow-subscriber run shows that ingest no longer waits for callbacks (they
+run on the event bus dispatcher thread). A final run overflows a small event
+queue: the reader must not stall, only coin events are dropped, the last
+delivered one still carries the full total, and the "reached" control event
+is delivered. Subscriber statistics stay at one entry per callback however
+many sessions subscribe.
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from coin_handler.python.coin_handler_serial import CoinHandlerSerial
+from coin_handler.python.event_bus import DROP_OLDEST, EventBus
+from coin_handler.python.serial_emulator import ArduinoEmulator
+
+BURST_COINS = 100
+CHATTER = "[Homing] Moving toward HOME..."
+
+
+def run_burst(max_baud, supported_bauds=(9600, 57600, 115200), slow_callback_s=0.0, queue_size=256, required=0):
+    emu = ArduinoEmulator(supported_bauds=supported_bauds)
+    emu.start()
+    handler = CoinHandlerSerial(port=emu.port, max_baud=max_baud, event_queue_size=queue_size)
+    got_all = threading.Event()
+    received = []
+
+    def on_coin(denom, count, total):
+        received.append(denom)
+        time.sleep(slow_callback_s)  # emulate a UI that is busy repainting
+        if total >= BURST_COINS:  # the newest event is never the one dropped
+            got_all.set()
+
+    handler.add_callback(on_coin)
+    reached = []
+    handler.add_reached_callback(reached.append)
+    try:
+        handler.start_accepting(required)
+        time.sleep(0.5)  # let ENABLE_COIN land
+
+        start = time.monotonic()
+        for _ in range(BURST_COINS):
+            emu.emit(CHATTER)
+            emu.inject_coin(1)
+        # ingest: the reader has parsed and counted every coin
+        while handler.total_value < BURST_COINS and time.monotonic() - start < 60:
+            time.sleep(0.005)
+        ingested = time.monotonic() - start
+        ok = got_all.wait(timeout=60)
+        elapsed = time.monotonic() - start
+        handler.events.flush(5)
+        return handler.active_baud, ok, ingested, elapsed, dict(handler.event_stats(), received=len(received),
+                                                                  reached=reached)
+    finally:
+        handler.shutdown()
+        emu.stop()
+
+
+def check_control_events():
+    bus = EventBus(maxsize=4, overflow=DROP_OLDEST, droppable=("coin",))
+    release, delivered = threading.Event(), []
+    bus.subscribe("coin", lambda total: (release.wait(5), delivered.append(("coin", total))))
+    bus.subscribe("reached", lambda total: delivered.append(("reached", total)))
+    for total in range(1, 6):  # the dispatcher holds the first, the queue fills up
+        bus.publish("coin", total)
+    bus.publish("reached", 5)
+    for total in range(6, 20):  # a coin burst after "reached" must not push it out
+        bus.publish("coin", total)
+    bus.publish("error", "jam")  # queue is all control events and newer coins; still accepted
+    release.set()
+    assert bus.flush(5)
+    bus.stop()
+    assert ("reached", 5) in delivered and delivered[-1] == ("coin", 19), delivered
+    assert bus.stats()["dropped"] > 0
+    print(f"full queue: {bus.stats()['dropped']} coin events dropped, reached kept")
+
+
+def check_stats_bounded():
+    bus = EventBus(droppable=("coin",))
+    for session in range(50):
+        with bus.scope() as scope:
+            scope.subscribe("coin", lambda denom, count, total: None)  # a new closure every session
+            bus.publish("coin", 1, session, session)
+    bus.stop()
+    assert len(bus.stats()["subscribers"]) == 1, bus.stats()["subscribers"]
+    print("50 sessions -> 1 subscriber stats entry")
+
+
+def main():
+    print("=" * 60)
+    print("Serial Throughput Test (PTY emulator)")
+    print("=" * 60)
+
+    # keep coin_storage.json / serial_baud.json out of the project root
+    os.chdir(tempfile.mkdtemp(prefix="coinnect_throughput_"))
+
+    results = []
+    dropped = {}
+    reached = {}
+    for label, max_baud, bauds, slow, queue_size, required in (
+        ("pinned 9600", 9600, (9600, 57600, 115200), 0.0, 256, 0),
+        ("negotiated", 115200, (9600, 57600, 115200), 0.0, 256, 0),
+        ("old firmware", 115200, None, 0.0, 256, 0),
+        ("slow UI", 115200, (9600, 57600, 115200), 0.02, 256, 0),
+        ("overflow", 115200, (9600, 57600, 115200), 0.05, 8, BURST_COINS),
+    ):
+        baud, ok, ingested, elapsed, stats = run_burst(max_baud, bauds, slow, queue_size, required)
+        reached[label] = stats["reached"]
+        rate = BURST_COINS / ingested if ingested > 0 else 0.0
+        lag = max((s["lag_max_ms"] for s in stats["subscribers"].values()), default=0.0)
+        results.append((label, baud, ok, ingested, elapsed, rate, lag))
+        dropped[label] = (stats["dropped"], stats["received"])
+
+    print("\n" + "=" * 76)
+    print(f"{'mode':<14}{'baud':>8}{'complete':>10}{'ingest s':>10}{'deliver s':>11}{'coins/s':>10}{'max lag ms':>12}")
+    for label, baud, ok, ingested, elapsed, rate, lag in results:
+        print(f"{label:<14}{baud:>8}{str(ok):>10}{ingested:>10.2f}{elapsed:>11.2f}{rate:>10.1f}{lag:>12.1f}")
+    print("=" * 76)
+
+    print("dropped / delivered:", dropped)
+
+    pinned, negotiated, old, slow_ui, overflow = results
+    assert pinned[1] == 9600, "pinned link should stay at 9600"
+    assert negotiated[1] == 115200, "firmware advertising 115200 should be upgraded"
+    assert old[1] == 9600, "old firmware must stay at the boot rate"
+    assert all(r[2] for r in results), "every burst must be delivered"
+    assert negotiated[3] < pinned[3], "negotiated link should ingest the burst faster"
+    assert slow_ui[3] < slow_ui[4], "slow subscribers must not hold back ingest"
+    assert dropped["slow UI"][0] == 0, "a queue with room must not drop"
+    assert dropped["overflow"][0] > 0 and sum(dropped["overflow"]) == BURST_COINS, dropped["overflow"]
+    assert overflow[3] < overflow[4], "a full event queue must not stall the reader"
+    assert reached["overflow"] == [BURST_COINS], "a full queue must never drop the reached event"
+    check_control_events()
+    check_stats_bounded()
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Training Capture Test
+Feeds frames to TrainingCapture with a deliberately slow encoder (a stand-in
+for JPEG encode + SD write). Checks that:
+ - submit() never blocks: it drops and counts once the queue is full
+ - the rate limit turns away frames beyond the allowed burst
+ - files land in <light>/<label>/, with captures.jsonl
+ - the disk quota evicts the oldest files, including files from an earlier run
+"""
+
+import sys
+import os
+import io
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bill_handler.python.training_capture import TrainingCapture
+
+
+def slow_encoder(delay_s):
+    def encode(frame):
+        time.sleep(delay_s)
+        buf = io.BytesIO()
+        np.save(buf, frame)
+        return buf.getvalue()
+    return encode
+
+
+def frame(value):
+    return np.full((120, 160, 3), value, dtype=np.uint8)  # ~57 KB as .npy
+
+
+def main():
+    print("=" * 60)
+    print("Training Capture Test")
+    print("=" * 60)
+    out = tempfile.mkdtemp(prefix="train_capture_")
+    try:
+        # 1. queue full -> drop, never block
+        cap = TrainingCapture(out, max_queue=4, max_per_minute=0, encoder=slow_encoder(0.05), ext=".npy")
+        worst = 0.0
+        for i in range(20):
+            t = time.perf_counter()
+            cap.submit(frame(i), "uv", "genuine", {"reason": "verified", "denom": 100})
+            worst = max(worst, time.perf_counter() - t)
+        stats = cap.snapshot()
+        print(f"burst of 20: worst submit {worst * 1000:.2f} ms, dropped {stats['dropped_full']}")
+        assert worst < 0.01, "submit must not wait for the writer"
+        assert stats["dropped_full"] >= 10
+        cap.close()
+        written = cap.snapshot()["written"]
+        assert written == 20 - stats["dropped_full"], cap.snapshot()
+        files = os.listdir(os.path.join(out, "uv", "genuine"))
+        with open(os.path.join(out, "captures.jsonl")) as f:
+            lines = [json.loads(l) for l in f]
+        assert len(files) == written == len(lines) and lines[0]["prediction"]["denom"] == 100
+        print(f"written {written} to uv/genuine/, {len(lines)} lines in captures.jsonl")
+
+        # 2. rate limit: burst of max_queue, then about max_per_minute / 60 per second
+        cap = TrainingCapture(out, max_queue=3, max_per_minute=60, encoder=slow_encoder(0), ext=".npy")
+        accepted = sum(cap.submit(frame(1), "white", "100") for _ in range(10))
+        assert accepted == 3 and cap.stats["rate_limited"] == 7, cap.stats
+        time.sleep(1.1)
+        assert cap.submit(frame(2), "white", "100"), "a token should have refilled after a second"
+        cap.close()
+        print(f"rate limit: accepted {accepted}/10 in a burst, one more after 1 s")
+
+        # 3. quota: existing files count, oldest go first
+        size = len(slow_encoder(0)(frame(0)))
+        before = sorted(os.path.join(r, f) for r, _, fs in os.walk(out) for f in fs if f.endswith(".npy"))
+        quota_mb = 5 * size / (1024 * 1024)
+        cap = TrainingCapture(out, max_queue=8, max_per_minute=0, quota_mb=quota_mb, encoder=slow_encoder(0), ext=".npy")
+        for i in range(3):
+            cap.submit(frame(200 + i), "white", "500")
+        cap.close()
+        remaining = [os.path.join(r, f) for r, _, fs in os.walk(out) for f in fs if f.endswith(".npy")]
+        stats = cap.snapshot()
+        print(f"quota of 5 files: {len(before)} existing + 3 new -> {len(remaining)} kept, evicted {stats['evicted']}")
+        assert len(remaining) == 5 and stats["evicted"] == len(before) + 3 - 5
+        assert len(os.listdir(os.path.join(out, "white", "500"))) == 3, "the newest files must survive"
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
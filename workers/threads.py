@@ -97,10 +97,6 @@ class CoinAcceptorWorker(QThread):
         self.handler = handler
         self._running = True
 
-        # Register callbacks
-        self.handler.add_callback(self._emit_coin_inserted)
-        self.handler.add_reached_callback(self._emit_required_reached)
-
     def _emit_coin_inserted(self, denom, count, total):
         self.coinInserted.emit(denom, count, total)
         if self.required_amount > 0 and total >= self.required_amount:
@@ -110,18 +106,25 @@ class CoinAcceptorWorker(QThread):
         self.coinsProcessed.emit(int(total_value))
 
     def run(self):
+        # Register callbacks for this run only; a worker that is never started holds none
+        session = self.handler.session()
+        session.add_callback(self._emit_coin_inserted)
+        session.add_reached_callback(self._emit_required_reached)
         try:
-            self.handler.start_accepting(self.required_amount)
-        except Exception as e:
-            print("[CoinAcceptorWorker] start_accepting error:", e)
-
-        while self._running:
-            time.sleep(0.1)
-
-        try:
-            self.handler.stop_accepting()
-        except Exception as e:
-            print("[CoinAcceptorWorker] stop_accepting error:", e)
+            try:
+                self.handler.start_accepting(self.required_amount)
+            except Exception as e:
+                print("[CoinAcceptorWorker] start_accepting error:", e)
+
+            while self._running:
+                time.sleep(0.1)
+
+            try:
+                self.handler.stop_accepting()
+            except Exception as e:
+                print("[CoinAcceptorWorker] stop_accepting error:", e)
+        finally:
+            session.close()
 
     def stop(self):
         print("[CoinAcceptorWorker] Stopping...")
@@ -150,11 +153,6 @@ class CoinDispenserWorker(QThread):
         self._done_event = threading.Event()
         self._expected = None
 
-        # Register callbacks
-        self.handler.add_dispense_callback(self._emit_dispense_ack)
-        self.handler.add_dispense_done_callback(self._on_dispense_done)
-        self.handler.add_error_callback(self._emit_dispense_error)
-
     def _emit_dispense_ack(self, denom, qty):
         self.dispenseAck.emit(denom, qty)
 
@@ -168,8 +166,13 @@ class CoinDispenserWorker(QThread):
         self._done_event.set()
 
     def run(self):
+        # Register callbacks for this run only; a worker that is never started holds none
+        session = self.handler.session()
+        session.add_dispense_callback(self._emit_dispense_ack)
+        session.add_dispense_done_callback(self._on_dispense_done)
+        session.add_error_callback(self._emit_dispense_error)
         try:
-            # --- Try to open port with retries ---
+            # --- Try to open port with retries (instant when the link is already up) ---
             connected = False
             for attempt in range(self.reconnect_attempts):
                 if self.handler.open():
@@ -183,11 +186,8 @@ class CoinDispenserWorker(QThread):
                 self.dispenseError.emit("Failed to connect to coin dispenser serial port.")
                 return
 
-            # start reader thread
-            if not getattr(self.handler, "_reader_thread", None) or not self.handler._reader_thread.is_alive():
-                self.handler._reader_running = True
-                self.handler._reader_thread = threading.Thread(target=self.handler._reader_loop, daemon=True)
-                self.handler._reader_thread.start()
+            # start reader thread (no-op if the persistent link already has one)
+            self.handler.ensure_reader()
 
             # --- Sequentially dispense ---
             for denom, qty in self.breakdown.items():
@@ -209,15 +209,13 @@ class CoinDispenserWorker(QThread):
         except Exception as e:
             self.dispenseError.emit(f"Worker exception: {e}")
         finally:
+            # keep the port and reader alive: the next transaction reuses the link
+            # instead of paying the Arduino reset/READY wait again
             self._running = False
-            self.handler._reader_running = False
-            self.handler.close()
-            
+            session.close()
 
     def stop(self):
         print("[CoinDispenserWorker] Stopping...")
         self._running = False
-        self.handler._reader_running = False
-        self.handler.close()
         self.quit()
         self.wait()
\ No newline at end of file